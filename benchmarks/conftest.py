@@ -0,0 +1,129 @@
+"""
+Fixtures of the benchmark suite. The benchmarks are not collected with
+the tests, run them with pytest-benchmark and save the results to
+compare them across commits:
+
+    pytest benchmarks --benchmark-autosave
+    pytest benchmarks --benchmark-compare
+
+The number of points is chosen with --benchmark-scale.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+from qgis.core import QgsUnitTypes, QgsVectorLayer
+from qgis.PyQt.QtCore import QDateTime
+
+from fvh3t.core.area_layer import AreaLayer
+from fvh3t.core.gate_layer import GateLayer
+from fvh3t.core.profiler import Profiler
+from fvh3t.core.trajectory_layer import TrajectoryLayer
+from tests import synthetic
+
+if TYPE_CHECKING:
+    from fvh3t.core.profiler import StageProfile
+
+SCALES: dict[str, int] = {
+    "10k": 10_000,
+    "1M": 1_000_000,
+    "10M": 10_000_000,
+}
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--benchmark-scale",
+        choices=sorted(SCALES),
+        default="10k",
+        help="number of synthetic points to benchmark with",
+    )
+    parser.addoption("--benchmark-seed", type=int, default=0, help="seed of the synthetic traffic")
+
+
+@pytest.fixture(scope="session")
+def scenario(request: pytest.FixtureRequest) -> synthetic.IntersectionScenario:
+    return synthetic.IntersectionScenario(
+        n_points=SCALES[request.config.getoption("--benchmark-scale")],
+        seed=request.config.getoption("--benchmark-seed"),
+    )
+
+
+@pytest.fixture(scope="session")
+def rounds(scenario: synthetic.IntersectionScenario) -> int:
+    # the large scales take long enough to be timed once
+    return 5 if scenario.n_points <= SCALES["10k"] else 1
+
+
+@pytest.fixture(scope="session")
+def point_layer(scenario: synthetic.IntersectionScenario) -> QgsVectorLayer:
+    return synthetic.point_layer(scenario)
+
+
+@pytest.fixture(scope="session")
+def gate_layer(scenario: synthetic.IntersectionScenario) -> GateLayer:
+    return GateLayer(synthetic.gate_layer(scenario), "name", "counts_negative", "counts_positive")
+
+
+@pytest.fixture(scope="session")
+def area_layer(scenario: synthetic.IntersectionScenario) -> AreaLayer:
+    return AreaLayer(synthetic.area_layer(scenario), "fid", "name")
+
+
+@pytest.fixture(scope="session")
+def time_range(scenario: synthetic.IntersectionScenario) -> tuple[QDateTime, QDateTime]:
+    start = QDateTime.fromMSecsSinceEpoch(scenario.start_timestamp_ms)
+
+    return start, start.addMSecs(round(scenario.duration_s * 1000))
+
+
+@pytest.fixture(scope="session")
+def trajectory_layer(point_layer: QgsVectorLayer) -> TrajectoryLayer:
+    return create_trajectory_layer(point_layer)
+
+
+@pytest.fixture(scope="session")
+def area_trajectory_layer(point_layer: QgsVectorLayer, area_layer: AreaLayer) -> TrajectoryLayer:
+    return create_trajectory_layer(point_layer, area_layer.point_groups(point_layer))
+
+
+def create_trajectory_layer(point_layer: QgsVectorLayer, point_groups: dict[int, Any] | None = None) -> TrajectoryLayer:
+    return TrajectoryLayer(
+        point_layer,
+        "id",
+        "timestamp",
+        "size_x",
+        "size_y",
+        "size_z",
+        QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
+        class_field="label",
+        point_groups=point_groups,
+    )
+
+
+@pytest.fixture
+def record_memory(benchmark, scenario: synthetic.IntersectionScenario) -> Callable[..., Any]:
+    """
+    Run the function once with its allocations traced and save the
+    peak memory use to the extra info of the benchmark, which is
+    saved with the timings.
+    """
+
+    def record(function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        profiler = Profiler(trace_memory=True)
+
+        with profiler.stage(function.__name__):
+            result = function(*args, **kwargs)
+
+        stage: StageProfile = profiler.stages()[0]
+
+        benchmark.extra_info["n_points"] = scenario.n_points
+        benchmark.extra_info["seed"] = scenario.seed
+        benchmark.extra_info["peak_traced_bytes"] = stage.peak_traced_bytes
+        benchmark.extra_info["rss_peak_growth_bytes"] = stage.rss_peak_growth_bytes
+
+        return result
+
+    return record
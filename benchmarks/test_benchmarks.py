@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+try:
+    import processing
+except ImportError:
+    from qgis import processing
+
+from typing import TYPE_CHECKING
+
+from benchmarks.conftest import create_trajectory_layer
+from fvh3t.core.trajectory import Trajectory
+from fvh3t.fvh3t_processing.traffic_trajectory_toolkit_provider import TTTProvider
+
+if TYPE_CHECKING:
+    from qgis.core import QgsVectorLayer
+
+    from fvh3t.core.area_layer import AreaLayer
+    from fvh3t.core.gate_layer import GateLayer
+    from fvh3t.core.trajectory_layer import TrajectoryLayer
+
+
+def fresh_trajectories(trajectory_layer: TrajectoryLayer) -> tuple[Trajectory, ...]:
+    """
+    Copy the trajectories without the geometries and statistics
+    cached in them, so every round measures the same work.
+    """
+    return tuple(
+        Trajectory(trajectory.nodes(), trajectory.layer(), trajectory.identifier(), trajectory.traveler_class())
+        for trajectory in trajectory_layer.trajectories()
+    )
+
+
+def test_trajectory_layer_construction(benchmark, record_memory, rounds, point_layer: QgsVectorLayer):
+    trajectory_layer: TrajectoryLayer = record_memory(create_trajectory_layer, point_layer)
+
+    benchmark.pedantic(create_trajectory_layer, args=(point_layer,), rounds=rounds)
+
+    assert trajectory_layer.trajectories()
+
+
+def test_movement_core(benchmark, record_memory, rounds, trajectory_layer: TrajectoryLayer):
+    def movement(trajectories: tuple[Trajectory, ...]) -> None:
+        for trajectory in trajectories:
+            trajectory._movement_core()  # noqa: SLF001
+
+    record_memory(movement, fresh_trajectories(trajectory_layer))
+
+    benchmark.pedantic(movement, setup=lambda: ((fresh_trajectories(trajectory_layer),), {}), rounds=rounds)
+
+
+def test_gate_count_trajectories(
+    benchmark, record_memory, rounds, trajectory_layer: TrajectoryLayer, gate_layer: GateLayer
+):
+    def count(trajectories: tuple[Trajectory, ...]) -> None:
+        for gate in gate_layer.gates():
+            gate.count_trajectories(trajectories)
+
+    record_memory(count, fresh_trajectories(trajectory_layer))
+
+    benchmark.pedantic(count, setup=lambda: ((fresh_trajectories(trajectory_layer),), {}), rounds=rounds)
+
+
+def test_gate_layer_count_trajectories(
+    benchmark, record_memory, rounds, trajectory_layer: TrajectoryLayer, gate_layer: GateLayer
+):
+    results = record_memory(gate_layer.count_trajectories, fresh_trajectories(trajectory_layer))
+
+    benchmark.pedantic(
+        gate_layer.count_trajectories, setup=lambda: ((fresh_trajectories(trajectory_layer),), {}), rounds=rounds
+    )
+
+    assert sum(result.trajectory_count for result in results) > 0
+
+
+def test_area_count_trajectories(
+    benchmark, record_memory, rounds, trajectory_layer: TrajectoryLayer, area_layer: AreaLayer
+):
+    def count(trajectories: tuple[Trajectory, ...]) -> None:
+        for area in area_layer.areas():
+            area.count_trajectories(trajectories)
+
+    record_memory(count, fresh_trajectories(trajectory_layer))
+
+    benchmark.pedantic(count, setup=lambda: ((fresh_trajectories(trajectory_layer),), {}), rounds=rounds)
+
+
+def test_area_layer_count_trajectories(
+    benchmark, record_memory, rounds, area_trajectory_layer: TrajectoryLayer, area_layer: AreaLayer
+):
+    record_memory(area_layer.count_trajectories, fresh_trajectories(area_trajectory_layer))
+
+    benchmark.pedantic(
+        area_layer.count_trajectories, setup=lambda: ((fresh_trajectories(area_trajectory_layer),), {}), rounds=rounds
+    )
+
+
+def test_trajectory_layer_as_line_layer(benchmark, record_memory, rounds, trajectory_layer: TrajectoryLayer):
+    record_memory(trajectory_layer.as_line_layer)
+
+    benchmark.pedantic(trajectory_layer.as_line_layer, rounds=rounds)
+
+
+def test_gate_layer_as_line_layer(
+    benchmark, record_memory, rounds, trajectory_layer: TrajectoryLayer, gate_layer: GateLayer, time_range
+):
+    results = gate_layer.count_trajectories(trajectory_layer.trajectories())
+    args = (results, None, *time_range)
+
+    record_memory(gate_layer.as_line_layer, *args)
+
+    benchmark.pedantic(gate_layer.as_line_layer, args=args, rounds=rounds)
+
+
+def test_export_to_json(
+    benchmark,
+    record_memory,
+    rounds,
+    qgis_app,
+    qgis_processing,  # noqa: ARG001
+    trajectory_layer: TrajectoryLayer,
+    gate_layer: GateLayer,
+    time_range,
+    tmp_path,
+):
+    provider = TTTProvider()
+
+    qgis_app.processingRegistry().addProvider(provider)
+
+    results = gate_layer.count_trajectories(trajectory_layer.trajectories())
+    params = {
+        "INPUT_GATES": gate_layer.as_line_layer(results, None, *time_range),
+        "OUTPUT_JSON": str(tmp_path / "gates.json"),
+    }
+
+    def export() -> None:
+        processing.run("traffic_trajectory_toolkit:export_to_json", params)
+
+    record_memory(export)
+
+    benchmark.pedantic(export, rounds=rounds)
+
+    qgis_app.processingRegistry().removeProvider(provider.id())
@@ -0,0 +1,5 @@
+import sys
+
+from fvh3t.cli import main
+
+sys.exit(main())
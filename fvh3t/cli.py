@@ -0,0 +1,364 @@
+"""
+Headless batch runner for the counting pipelines.
+
+    python -m fvh3t jobs.json --report report.json
+
+QGIS is initialized once and every job of the job file is run in the
+same process. The job file is a JSON object with a list of jobs:
+
+    {
+        "jobs": [
+            {
+                "name": "morning",
+                "points": "points.gpkg",
+                "gates": "gates.gpkg",
+                "areas": "areas.gpkg",
+                "start_time": "2024-05-01T07:00:00Z",
+                "end_time": "2024-05-01T09:00:00Z",
+                "interval": 15,
+                "traveler_class": "car",
+                "split_by_class": false,
+                "outputs": {
+                    "trajectories": "out/trajectories.gpkg",
+                    "gates": "out/gates.gpkg",
+                    "areas": "out/areas.gpkg"
+                }
+            }
+        ]
+    }
+
+Only "points" is required, and gates and areas are counted only if
+given. The layers are given as OGR data sources and must have the
+same fields as the inputs of the processing algorithms. Jobs with
+the same points, filters and areas share the trajectories. The report has
+the status, duration and counts of every job.
+
+Outside of a configured QGIS environment, QGIS_PREFIX_PATH must be set
+to the QGIS installation, e.g. /usr, so that the data providers are
+found.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, NamedTuple
+
+from qgis.core import (
+    QgsApplication,
+    QgsCoordinateTransformContext,
+    QgsProviderRegistry,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QDateTime, Qt
+
+from fvh3t.core.area_layer import AreaLayer
+from fvh3t.core.gate_layer import GateLayer
+from fvh3t.core.trajectory_layer import TrajectoryLayer
+from fvh3t.fvh3t_processing.utils import ProcessingUtils
+
+if TYPE_CHECKING:
+    from qgis.core import QgsCoordinateReferenceSystem, QgsFeature, QgsFields
+
+    from fvh3t.core.trajectory import Trajectory
+
+# the providers the input layers are read and the outputs written with
+REQUIRED_PROVIDERS = ("ogr", "memory")
+
+# how many trajectory layers are kept for the next jobs, e.g. the
+# jobs of one time range counting several gate and area layers
+TRAJECTORY_CACHE_SIZE = 2
+
+
+class Job(NamedTuple):
+    """
+    One counting job of a job file.
+    """
+
+    name: str
+    points: str
+    gates: str | None = None
+    areas: str | None = None
+    start_time: str | None = None
+    end_time: str | None = None
+    interval: int | None = None
+    traveler_class: str | None = None
+    split_by_class: bool = False
+    outputs: dict[str, str] | None = None
+
+    @classmethod
+    def from_dict(cls, job: dict[str, Any], default_name: str) -> Job:
+        if "points" not in job:
+            msg = f'Job "{job.get("name", default_name)}" has no points.'
+            raise ValueError(msg)
+
+        unknown: set[str] = set(job) - set(cls._fields)
+        if unknown:
+            msg = f"Unknown job keys: {', '.join(sorted(unknown))}."
+            raise ValueError(msg)
+
+        return cls(**{"name": default_name, **job})
+
+
+class JobReport(NamedTuple):
+    """
+    Machine-readable result of running one job.
+    """
+
+    name: str
+    status: str
+    duration_s: float
+    error: str | None = None
+    trajectory_count: int = 0
+    trajectories_cached: bool = False
+    gate_count: int = 0
+    area_count: int = 0
+    outputs: dict[str, str] | None = None
+
+
+class BatchRunner:
+    """
+    Runs counting jobs in one QGIS session. The input layers and
+    the created trajectories are cached between the jobs, keyed
+    by the data source and the filter the points were read with.
+    Only the trajectory layers of the trajectory_cache_size most
+    recently used keys are kept, so a job file with a different
+    time range for every job does not keep all of them in memory.
+    """
+
+    def __init__(self, trajectory_cache_size: int = TRAJECTORY_CACHE_SIZE) -> None:
+        self.__trajectory_cache_size: int = trajectory_cache_size
+        self.__layers: dict[str, QgsVectorLayer] = {}
+        # ordered from the least to the most recently used
+        self.__trajectory_layers: dict[tuple[str, str | None, bool, str | None], TrajectoryLayer | None] = {}
+
+    def run(self, jobs: Iterable[Job]) -> list[JobReport]:
+        reports: list[JobReport] = []
+
+        for job in jobs:
+            start: float = time.perf_counter()
+
+            try:
+                reports.append(self.run_job(job, start))
+            except Exception as e:  # noqa: BLE001
+                reports.append(JobReport(job.name, "failed", time.perf_counter() - start, error=str(e)))
+
+        return reports
+
+    def run_job(self, job: Job, start: float) -> JobReport:
+        outputs: dict[str, str] = job.outputs or {}
+        point_layer: QgsVectorLayer = self.layer(job.points)
+
+        filter_expression, start_time, end_time = ProcessingUtils.get_point_filter(
+            point_layer, job.traveler_class, self.datetime(job.start_time), self.datetime(job.end_time)
+        )
+
+        area_layer: AreaLayer | None = AreaLayer(self.layer(job.areas), "fid", "name") if job.areas else None
+
+        # the trajectories are split by area while the points are
+        # read, so only the jobs with the same areas share them
+        trajectory_key = (job.points, filter_expression, job.split_by_class, job.areas)
+        trajectories_cached: bool = trajectory_key in self.__trajectory_layers
+
+        if trajectories_cached:
+            # move the key to the end as the most recently used
+            self.__trajectory_layers[trajectory_key] = self.__trajectory_layers.pop(trajectory_key)
+        else:
+            # drop the least recently used layers before
+            # creating a new one to not hold both at once
+            while self.__trajectory_layers and len(self.__trajectory_layers) >= self.__trajectory_cache_size:
+                del self.__trajectory_layers[next(iter(self.__trajectory_layers))]
+
+            # the gates are counted from the whole trajectories,
+            # which are only needed if the points are split by area
+            self.__trajectory_layers[trajectory_key] = ProcessingUtils.create_trajectory_layer(
+                ProcessingUtils.read_points(point_layer, job.traveler_class, start_time, end_time),
+                area_layer,
+                split_by_class=job.split_by_class,
+                keep_whole_trajectories=area_layer is not None,
+            )
+
+        # None if no points are left after filtering,
+        # then every gate and area is counted as zero
+        trajectory_layer: TrajectoryLayer | None = self.__trajectory_layers[trajectory_key]
+        trajectories: tuple[Trajectory, ...] = ()
+        whole_trajectories: tuple[Trajectory, ...] = ()
+        traveler_classes: tuple[str, ...] | None = None
+
+        if trajectory_layer is not None:
+            trajectories = trajectory_layer.trajectories()
+            whole_trajectories = trajectory_layer.whole_trajectories() if area_layer is not None else trajectories
+            traveler_classes = trajectory_layer.traveler_classes() if job.split_by_class else None
+
+        interval: timedelta | None = timedelta(minutes=job.interval) if job.interval else None
+
+        if "trajectories" in outputs:
+            self.write_output(
+                outputs["trajectories"],
+                TrajectoryLayer.line_layer_fields(),
+                QgsWkbTypes.Type.LineString,
+                point_layer.crs(),
+                trajectory_layer.line_layer_features(whole_trajectories) if trajectory_layer is not None else (),
+            )
+
+        gate_count = 0
+
+        if job.gates:
+            gate_layer = GateLayer(self.layer(job.gates), "name", "counts_negative", "counts_positive")
+            gate_results = gate_layer.count_trajectories(whole_trajectories)
+            gate_count = len(gate_layer.gates())
+
+            if "gates" in outputs:
+                self.write_output(
+                    outputs["gates"],
+                    GateLayer.line_layer_fields(),
+                    QgsWkbTypes.Type.LineString,
+                    gate_layer.crs(),
+                    gate_layer.line_layer_features(
+                        gate_results,
+                        traveler_class=job.traveler_class,
+                        start_time=start_time,
+                        end_time=end_time,
+                        interval=interval,
+                        traveler_classes=traveler_classes,
+                    ),
+                )
+
+        area_count = 0
+
+        if area_layer is not None:
+            area_results = area_layer.count_trajectories(trajectories, split_by_class=job.split_by_class)
+            area_count = len(area_layer.areas())
+
+            if "areas" in outputs:
+                self.write_output(
+                    outputs["areas"],
+                    AreaLayer.polygon_layer_fields(),
+                    QgsWkbTypes.Type.Polygon,
+                    area_layer.crs(),
+                    area_layer.polygon_layer_features(
+                        area_results,
+                        traveler_class=job.traveler_class,
+                        start_time=start_time,
+                        end_time=end_time,
+                        traveler_classes=traveler_classes,
+                    ),
+                )
+
+        return JobReport(
+            job.name,
+            "ok",
+            time.perf_counter() - start,
+            trajectory_count=len(whole_trajectories),
+            trajectories_cached=trajectories_cached,
+            gate_count=gate_count,
+            area_count=area_count,
+            outputs=job.outputs,
+        )
+
+    def layer(self, source: str) -> QgsVectorLayer:
+        if source not in self.__layers:
+            layer = QgsVectorLayer(source, Path(source).stem, "ogr")
+
+            if not layer.isValid():
+                msg = f'Layer "{source}" is not valid.'
+                raise ValueError(msg)
+
+            self.__layers[source] = layer
+
+        return self.__layers[source]
+
+    @staticmethod
+    def datetime(value: str | None) -> QDateTime:
+        """
+        Parse an ISO 8601 date and time. An invalid QDateTime is
+        returned if no value is given, like from an empty parameter.
+        """
+        if not value:
+            return QDateTime()
+
+        date_time: QDateTime = QDateTime.fromString(value, Qt.ISODate)
+
+        if not date_time.isValid():
+            msg = f'Invalid date and time "{value}".'
+            raise ValueError(msg)
+
+        return date_time
+
+    @staticmethod
+    def write_output(
+        path: str,
+        fields: QgsFields,
+        geometry_type: QgsWkbTypes.Type,
+        crs: QgsCoordinateReferenceSystem,
+        features: Iterable[QgsFeature],
+    ) -> None:
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = QgsVectorFileWriter.driverForExtension(Path(path).suffix) or "GPKG"
+
+        writer = QgsVectorFileWriter.create(path, fields, geometry_type, crs, QgsCoordinateTransformContext(), options)
+
+        if writer.hasError() != QgsVectorFileWriter.NoError:
+            msg = f'Could not write "{path}": {writer.errorMessage()}'
+            raise ValueError(msg)
+
+        ProcessingUtils.write_to_sink(writer, features)
+
+        # the file is only completed when the writer is deleted
+        del writer
+
+
+def read_jobs(path: str) -> list[Job]:
+    with open(path, encoding="utf-8") as file:
+        spec: dict[str, Any] = json.load(file)
+
+    return [Job.from_dict(job, f"job{i}") for i, job in enumerate(spec.get("jobs", []), 1)]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m fvh3t", description="Count trajectories without the QGIS desktop.")
+    parser.add_argument("jobs", help="JSON file with the jobs to run")
+    parser.add_argument("--report", help="write the run report to this JSON file instead of stdout")
+    args = parser.parse_args(argv)
+
+    jobs: list[Job] = read_jobs(args.jobs)
+
+    # the prefix path is only guessed from the location of the
+    # qgis module otherwise, which fails outside of QGIS installs
+    prefix_path: str | None = os.environ.get("QGIS_PREFIX_PATH")
+    if prefix_path:
+        QgsApplication.setPrefixPath(prefix_path, True)
+
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    missing: list[str] = [
+        provider for provider in REQUIRED_PROVIDERS if provider not in QgsProviderRegistry.instance().providerList()
+    ]
+
+    if missing:
+        app.exitQgis()
+        msg = f"QGIS data providers not found: {', '.join(missing)}. Set QGIS_PREFIX_PATH to the QGIS installation."
+        sys.stderr.write(msg + "\n")
+        return 1
+
+    try:
+        reports: list[JobReport] = BatchRunner().run(jobs)
+    finally:
+        app.exitQgis()
+
+    report: str = json.dumps({"jobs": [report._asdict() for report in reports]}, indent=2)
+
+    if args.report:
+        Path(args.report).write_text(report, encoding="utf-8")
+    else:
+        sys.stdout.write(report + "\n")
+
+    return 0 if all(report.status == "ok" for report in reports) else 1
@@ -1,17 +1,26 @@
 from __future__ import annotations
 
+from threading import local
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from qgis.core import QgsFeedback
+
     from fvh3t.core.trajectory import Trajectory
     from fvh3t.core.trajectory_layer import TrajectoryLayer
+    from fvh3t.core.trajectory_segment import TrajectorySegment
 
 from qgis.core import (
     QgsGeometry,
+    QgsGeometryEngine,
+    QgsPoint,
+    QgsPointXY,
     QgsWkbTypes,
 )
 
+from fvh3t.core.area_count_result import AreaCountResult
 from fvh3t.core.exceptions import InvalidGeometryTypeException
+from fvh3t.core.progress import ProgressReporter
 
 
 class Area:
@@ -19,6 +28,9 @@ class Area:
     A wrapper class around a QgsGeometry which represents a
     polygon through which trajectories can pass. The geometry
     must be a polygon.
+
+    Like Gate, the area holds no counting state, counting
+    returns an AreaCountResult instead.
     """
 
     def __init__(
@@ -32,8 +44,9 @@ class Area:
 
         self.__geom: QgsGeometry = geom
         self.__name: str = name
-        self.__trajectory_count: int = 0
-        self.__average_speed: float = 0.0
+
+        # prepared lazily per thread, see Gate.geometry_engine()
+        self.__thread_local = local()
 
     def geometry(self) -> QgsGeometry:
         return self.__geom
@@ -41,30 +54,72 @@ class Area:
     def name(self) -> str:
         return self.__name
 
-    def trajectory_count(self) -> int:
-        return self.__trajectory_count
+    def geometry_engine(self) -> QgsGeometryEngine:
+        engine: QgsGeometryEngine | None = getattr(self.__thread_local, "engine", None)
+
+        if engine is None:
+            engine = QgsGeometry.createGeometryEngine(self.__geom.constGet())
+            engine.prepareGeometry()
+            self.__thread_local.engine = engine
+
+        return engine
+
+    def contains_point(self, point: QgsPointXY) -> bool:
+        return self.geometry_engine().contains(QgsPoint(point))
+
+    def boundary_crossing_fraction(self, segment: TrajectorySegment, *, entering: bool) -> float:
+        """
+        Return the fraction along the segment at which it crosses
+        the boundary of the area. When entering the area the last
+        crossing is used and when exiting the first one. If the
+        boundary is not crossed, the middle of the segment is used.
+        """
+        segment_geom: QgsGeometry = segment.as_geometry()
+        segment_length: float = segment_geom.length()
+
+        if segment_length == 0:
+            return 0.0
 
-    def average_speed(self) -> float:
-        return self.__average_speed
+        boundary = QgsGeometry(self.__geom.constGet().boundary())
+        fractions: list[float] = [
+            segment_geom.lineLocatePoint(QgsGeometry(vertex)) / segment_length
+            for vertex in segment_geom.intersection(boundary).vertices()
+        ]
+
+        if not fractions:
+            return 0.5
+
+        return max(fractions) if entering else min(fractions)
 
     def intersects(self, traj: Trajectory) -> bool:
-        return self.__geom.intersects(traj.as_geometry())
+        return self.geometry_engine().intersects(traj.as_geometry().constGet())
 
-    def count_trajectories_from_layer(self, layer: TrajectoryLayer) -> None:
-        self.count_trajectories(layer.trajectories())
+    def count_trajectories_from_layer(
+        self, layer: TrajectoryLayer, feedback: QgsFeedback | None = None
+    ) -> AreaCountResult:
+        trajectories: tuple[Trajectory, ...] = layer.trajectories()
+
+        return self.count_trajectories(trajectories, ProgressReporter(feedback, len(trajectories)))
 
     def count_trajectories(
         self,
         trajectories: tuple[Trajectory, ...],
-    ) -> None:
+        progress: ProgressReporter | None = None,
+    ) -> AreaCountResult:
+        if progress is None:
+            progress = ProgressReporter(None, len(trajectories))
+
+        trajectory_count = 0
         speed = 0.0
 
         for trajectory in trajectories:
-            if self.intersects(trajectory):
-                traj_speed = trajectory.average_speed()
-                speed += traj_speed
+            if progress.is_canceled():
+                break
 
-                self.__trajectory_count += 1
+            progress.advance()
+
+            if self.intersects(trajectory):
+                speed += trajectory.average_speed()
+                trajectory_count += 1
 
-        if self.__trajectory_count > 0:
-            self.__average_speed = speed / self.__trajectory_count
+        return AreaCountResult(trajectory_count, speed)
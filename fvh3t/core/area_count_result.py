@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import NamedTuple
+
+
+class AreaCountResult(NamedTuple):
+    """
+    Immutable result of counting trajectories in an area.
+    Results can be merged in any order.
+    """
+
+    trajectory_count: int = 0
+    speed_sum: float = 0.0
+
+    def merge(self, other: AreaCountResult) -> AreaCountResult:
+        return AreaCountResult(
+            self.trajectory_count + other.trajectory_count,
+            self.speed_sum + other.speed_sum,
+        )
+
+    def average_speed(self) -> float:
+        if self.trajectory_count > 0:
+            return self.speed_sum / self.trajectory_count
+
+        return 0.0
@@ -1,15 +1,41 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
-
-from qgis.core import QgsFeature, QgsFeatureSource, QgsField, QgsVectorLayer, QgsWkbTypes
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Sequence
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFeatureSource,
+    QgsField,
+    QgsFields,
+    QgsPointXY,
+    QgsRectangle,
+    QgsSpatialIndex,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
 from qgis.PyQt.QtCore import QDateTime, QMetaType, QVariant
 
 from fvh3t.core.area import Area
-from fvh3t.core.exceptions import InvalidFeatureException, InvalidLayerException
+from fvh3t.core.area_count_result import AreaCountResult
+from fvh3t.core.area_od_matrix import AreaOdMatrix
+from fvh3t.core.area_traffic_statistics import AreaTrafficStatistics
+from fvh3t.core.area_visit import AreaVisit
+from fvh3t.core.exceptions import InvalidFeatureException, InvalidLayerException, InvalidTrajectoryException
+from fvh3t.core.progress import ProgressReporter
+from fvh3t.core.qgis_layer_utils import QgisLayerUtils
+from fvh3t.core.time_bins import TimeBins
 
 if TYPE_CHECKING:
+    from datetime import datetime, timedelta
+
+    from qgis.core import QgsFeedback
+
+    from fvh3t.core.profiler import Profiler
+    from fvh3t.core.trajectory import Trajectory, TrajectoryNode
     from fvh3t.core.trajectory_layer import TrajectoryLayer
+    from fvh3t.core.trajectory_segment import TrajectorySegment
 
 
 class AreaLayer:
@@ -34,11 +60,15 @@ class AreaLayer:
 
         if self.is_valid():
             self.__areas: tuple[Area, ...] = ()
+            self.__area_ids: tuple[Any, ...] = ()
+            self.__index = QgsSpatialIndex()
             self.create_areas()
 
     def create_areas(self) -> None:
+        id_field_idx: int = self.__layer.fields().indexOf(self.__id_field)
         name_field_idx: int = self.__layer.fields().indexOf(self.__name_field)
         areas: list[Area] = []
+        area_ids: list[Any] = []
 
         for feature in self.__layer.getFeatures():
             name: str = feature[name_field_idx]
@@ -48,46 +78,361 @@ class AreaLayer:
             )
 
             areas.append(area)
+            area_ids.append(feature[id_field_idx])
 
         self.__areas = tuple(areas)
+        self.__area_ids = tuple(area_ids)
+
+        # areas are indexed by their position in the tuple
+        for i, area in enumerate(self.__areas):
+            self.__index.addFeature(i, area.geometry().boundingBox())
+
+    def count_trajectories_from_layer(
+        self,
+        layer: TrajectoryLayer,
+        *,
+        split_by_class: bool = False,
+        feedback: QgsFeedback | None = None,
+        profiler: Profiler | None = None,
+    ) -> dict[tuple[int, str | None], AreaCountResult]:
+        return self.count_trajectories(
+            layer.trajectories(), split_by_class=split_by_class, feedback=feedback, profiler=profiler
+        )
+
+    def count_trajectories(
+        self,
+        trajectories: tuple[Trajectory, ...],
+        *,
+        split_by_class: bool = False,
+        feedback: QgsFeedback | None = None,
+        profiler: Profiler | None = None,
+    ) -> dict[tuple[int, str | None], AreaCountResult]:
+        """
+        Count the trajectories of all areas in a single pass over
+        the trajectories. The trajectories must be split by area and
+        identified by (id, area id), like the ones created with
+        TrajectoryLayer's point_groups, so they are grouped by the
+        area id without testing any geometries. The results are keyed
+        by the index of the area and the traveler class, which is
+        None unless split_by_class is set.
+        """
+        progress = ProgressReporter(feedback, len(trajectories))
+
+        index_by_area_id: dict[Any, int] = {area_id: i for i, area_id in enumerate(self.__area_ids)}
+
+        trajectory_counts: dict[tuple[int, str | None], int] = {}
+        speed_sums: dict[tuple[int, str | None], float] = {}
+        n_outside = 0
+
+        for trajectory in trajectories:
+            if progress.is_canceled():
+                break
 
-    def count_trajectories_from_layer(self, layer: TrajectoryLayer) -> None:
-        for area in self.__areas:
-            area.count_trajectories_from_layer(layer)
+            progress.advance()
+
+            identifier: Any = trajectory.identifier()
+
+            if not isinstance(identifier, tuple):
+                msg = "Trajectories must be split by area to be counted."
+                raise InvalidTrajectoryException(msg)
+
+            area_idx: int | None = index_by_area_id.get(identifier[-1])
+
+            if area_idx is None:
+                n_outside += 1
+                continue
+
+            key = (area_idx, trajectory.traveler_class() if split_by_class else None)
+            trajectory_counts[key] = trajectory_counts.get(key, 0) + 1
+            # the statistics are cached in the trajectory when
+            # first measured, e.g. when exporting the trajectories
+            speed_sums[key] = speed_sums.get(key, 0.0) + trajectory.average_speed()
+
+        if profiler is not None:
+            profiler.count("area trajectories of unknown areas", n_outside)
+
+        return {key: AreaCountResult(count, speed_sums[key]) for key, count in trajectory_counts.items()}
 
     def areas(self) -> tuple[Area, ...]:
         return self.__areas
 
+    def crs(self) -> QgsCoordinateReferenceSystem:
+        return self.__layer.crs()
+
+    def area_ids(self) -> tuple[Any, ...]:
+        return self.__area_ids
+
+    def point_groups(
+        self, layer: QgsVectorLayer, feedback: QgsFeedback | None = None, profiler: Profiler | None = None
+    ) -> dict[int, Any]:
+        """
+        Return the id of the area each point of the layer is within,
+        keyed by the feature id, to be given as the point_groups of
+        a TrajectoryLayer. The points outside of every area are
+        left out.
+        """
+        point_ids: list[int] = []
+        points: list[QgsPointXY] = []
+
+        for feature in layer.getFeatures(QgsFeatureRequest().setNoAttributes()):
+            point_ids.append(feature.id())
+            points.append(feature.geometry().asPoint())
+
+        area_ids: list[Any | None] = self.assign_points(points, feedback, profiler)
+
+        return {point_id: area_id for point_id, area_id in zip(point_ids, area_ids) if area_id is not None}
+
+    def assign_points(
+        self, points: Sequence[QgsPointXY], feedback: QgsFeedback | None = None, profiler: Profiler | None = None
+    ) -> list[Any | None]:
+        """
+        Return the id of the area each point is within, in the same
+        order as the points, or None for points outside of every area.
+        """
+        progress = ProgressReporter(feedback, len(points))
+
+        return [self.__area_ids[i] if i is not None else None for i in self.area_indices(points, progress, profiler)]
+
+    def area_indices(
+        self,
+        points: Iterable[QgsPointXY],
+        progress: ProgressReporter | None = None,
+        profiler: Profiler | None = None,
+    ) -> list[int | None]:
+        """
+        Return the index of the area each point is within, or None.
+        The candidate areas of each point are looked up from the
+        spatial index, and if areas overlap the first one is used.
+        If the progress is canceled, the points assigned so far
+        are returned.
+        """
+        if progress is None:
+            progress = ProgressReporter(None, 0)
+
+        indices: list[int | None] = []
+        n_tests = 0
+
+        for point in points:
+            if progress.is_canceled():
+                break
+
+            progress.advance()
+
+            area_idx: int | None = None
+
+            for i in sorted(self.__index.intersects(QgsRectangle(point, point))):
+                n_tests += 1
+
+                if self.__areas[i].contains_point(point):
+                    area_idx = i
+                    break
+
+            indices.append(area_idx)
+
+        if profiler is not None:
+            profiler.count("area containment tests", n_tests)
+            profiler.count("points outside of the areas", sum(1 for area_idx in indices if area_idx is None))
+
+        return indices
+
+    def visits(
+        self, trajectories: tuple[Trajectory, ...], feedback: QgsFeedback | None = None
+    ) -> tuple[AreaVisit, ...]:
+        """
+        Return the visits of the trajectories to the areas. The group
+        of each node is the id of the area its point was assigned to,
+        as in TrajectoryLayer's whole trajectories, so no node is
+        tested against the areas again. Every run of consecutive nodes
+        in the same area is a visit. The entry and exit times are
+        interpolated at the boundary of the area.
+        """
+        progress = ProgressReporter(feedback, len(trajectories))
+
+        index_by_area_id: dict[Any, int] = {area_id: i for i, area_id in enumerate(self.__area_ids)}
+        visits: list[AreaVisit] = []
+
+        for trajectory in trajectories:
+            if progress.is_canceled():
+                break
+
+            progress.advance()
+
+            nodes: tuple[TrajectoryNode, ...] = trajectory.nodes()
+            segments: tuple[TrajectorySegment, ...] = trajectory.as_segments()
+
+            run_start = 0
+
+            for i in range(1, len(nodes) + 1):
+                if i < len(nodes) and nodes[i].group == nodes[run_start].group:
+                    continue
+
+                area_idx: int | None = index_by_area_id.get(nodes[run_start].group)
+
+                if area_idx is not None:
+                    area: Area = self.__areas[area_idx]
+
+                    entry_time: datetime = nodes[run_start].timestamp
+                    if run_start > 0:
+                        entering: TrajectorySegment = segments[run_start - 1]
+                        _, entry_time = entering.interpolate(area.boundary_crossing_fraction(entering, entering=True))
+
+                    exit_time: datetime = nodes[i - 1].timestamp
+                    if i < len(nodes):
+                        exiting: TrajectorySegment = segments[i - 1]
+                        _, exit_time = exiting.interpolate(area.boundary_crossing_fraction(exiting, entering=False))
+
+                    visits.append(
+                        AreaVisit(
+                            trajectory.identifier(),
+                            self.__area_ids[area_idx],
+                            entry_time,
+                            exit_time,
+                            trajectory.traveler_class(),
+                        )
+                    )
+
+                run_start = i
+
+        return tuple(visits)
+
+    @staticmethod
+    def polygon_layer_fields() -> QgsFields:
+        fields = QgsFields()
+
+        fields.append(QgsField("fid", QVariant.Int))
+        fields.append(QgsField("name", QVariant.String))
+        fields.append(QgsField("class", QVariant.String))
+        fields.append(QgsField("interval_start", QVariant.DateTime))
+        fields.append(QgsField("interval_end", QVariant.DateTime))
+        fields.append(QgsField("vehicle_count", QVariant.Int))
+        fields.append(QgsField("speed_avg (km/h)", QVariant.Double))
+
+        return fields
+
+    def polygon_layer_features(
+        self,
+        results: dict[tuple[int, str | None], AreaCountResult],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        traveler_classes: tuple[str, ...] | None = None,
+    ) -> Iterator[QgsFeature]:
+        """
+        Generate the area features with their counts. If traveler_classes
+        is given, one feature is created for each area and class.
+        """
+        fields = self.polygon_layer_fields()
+
+        classes: tuple[str | None, ...] = traveler_classes or (None,)
+        fid = 1
+
+        for i, area in enumerate(self.__areas):
+            for class_name in classes:
+                result: AreaCountResult = results.get((i, class_name), AreaCountResult())
+                feature = QgsFeature(fields)
+
+                feature.setAttributes(
+                    [
+                        fid,
+                        area.name(),
+                        class_name or traveler_class or "all",
+                        start_time,
+                        end_time,
+                        result.trajectory_count,
+                        round(result.average_speed(), 2),
+                    ]
+                )
+                feature.setGeometry(area.geometry())
+
+                if not feature.isValid():
+                    raise InvalidFeatureException
+
+                yield feature
+                fid += 1
+
     def as_polygon_layer(
-        self, traveler_class: str | None, start_time: QDateTime, end_time: QDateTime
+        self,
+        results: dict[tuple[int, str | None], AreaCountResult],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        traveler_classes: tuple[str, ...] | None = None,
     ) -> QgsVectorLayer | None:
-        polygon_layer = QgsVectorLayer("Polygon", "Polygon Layer", "memory")
-        polygon_layer.setCrs(self.__layer.crs())
+        return QgisLayerUtils.create_memory_layer(
+            "Polygon",
+            "Polygon Layer",
+            self.__layer.crs(),
+            self.polygon_layer_fields(),
+            self.polygon_layer_features(results, traveler_class, start_time, end_time, traveler_classes),
+        )
+
+    @staticmethod
+    def traffic_statistics_fields() -> QgsFields:
+        fields = QgsFields()
+
+        fields.append(QgsField("fid", QVariant.Int))
+        fields.append(QgsField("name", QVariant.String))
+        fields.append(QgsField("class", QVariant.String))
+        fields.append(QgsField("interval_start", QVariant.DateTime))
+        fields.append(QgsField("interval_end", QVariant.DateTime))
+        fields.append(QgsField("entry_count", QVariant.Int))
+        fields.append(QgsField("exit_count", QVariant.Int))
+        fields.append(QgsField("dwell_time_avg (s)", QVariant.Double))
+        fields.append(QgsField("dwell_time_median (s)", QVariant.Double))
+        fields.append(QgsField("dwell_time_max (s)", QVariant.Double))
+        fields.append(QgsField("occupancy_avg", QVariant.Double))
+        fields.append(QgsField("occupancy_max", QVariant.Int))
+
+        return fields
+
+    def traffic_statistics_features(
+        self,
+        visits: tuple[AreaVisit, ...],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        interval: timedelta | None = None,
+    ) -> Iterator[QgsFeature]:
+        """
+        Generate the features with the entry, exit, dwell time and
+        occupancy statistics of the areas with one feature per area
+        and time interval.
+        """
+        bins = TimeBins(start_time, end_time, interval)
 
-        polygon_layer.startEditing()
+        visits_by_area: dict[Any, list[AreaVisit]] = {}
+        for visit in visits:
+            visits_by_area.setdefault(visit.area_id, []).append(visit)
 
-        polygon_layer.addAttribute(QgsField("fid", QVariant.Int))
-        polygon_layer.addAttribute(QgsField("name", QVariant.String))
-        polygon_layer.addAttribute(QgsField("class", QVariant.String))
-        polygon_layer.addAttribute(QgsField("interval_start", QVariant.DateTime))
-        polygon_layer.addAttribute(QgsField("interval_end", QVariant.DateTime))
-        polygon_layer.addAttribute(QgsField("vehicle_count", QVariant.Int))
-        polygon_layer.addAttribute(QgsField("speed_avg (km/h)", QVariant.Double))
+        fields = self.traffic_statistics_fields()
 
-        fields = polygon_layer.fields()
+        rows = (
+            (area, bin_idx, statistics)
+            for area, area_id in zip(self.__areas, self.__area_ids)
+            for bin_idx, statistics in enumerate(
+                AreaTrafficStatistics.from_visits(tuple(visits_by_area.get(area_id, ())), bins)
+            )
+        )
 
-        for i, area in enumerate(self.__areas, 1):
+        for i, (area, bin_idx, statistics) in enumerate(rows, 1):
             feature = QgsFeature(fields)
 
+            interval_start, interval_end = bins.bounds(bin_idx)
+
             feature.setAttributes(
                 [
                     i,
                     area.name(),
                     traveler_class if traveler_class else "all",
-                    start_time,
-                    end_time,
-                    area.trajectory_count(),
-                    round(area.average_speed(), 2),
+                    interval_start,
+                    interval_end,
+                    statistics.entry_count,
+                    statistics.exit_count,
+                    round(statistics.dwell_time_avg, 2) if statistics.dwell_time_avg is not None else None,
+                    round(statistics.dwell_time_median, 2) if statistics.dwell_time_median is not None else None,
+                    round(statistics.dwell_time_max, 2) if statistics.dwell_time_max is not None else None,
+                    round(statistics.occupancy_avg, 2),
+                    statistics.occupancy_max,
                 ]
             )
             feature.setGeometry(area.geometry())
@@ -95,11 +440,95 @@ class AreaLayer:
             if not feature.isValid():
                 raise InvalidFeatureException
 
-            polygon_layer.addFeature(feature)
+            yield feature
+
+    def traffic_statistics_as_polygon_layer(
+        self,
+        visits: tuple[AreaVisit, ...],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        interval: timedelta | None = None,
+    ) -> QgsVectorLayer | None:
+        return QgisLayerUtils.create_memory_layer(
+            "Polygon",
+            "Polygon Layer",
+            self.__layer.crs(),
+            self.traffic_statistics_fields(),
+            self.traffic_statistics_features(visits, traveler_class, start_time, end_time, interval),
+        )
+
+    @staticmethod
+    def od_matrix_fields() -> QgsFields:
+        fields = QgsFields()
+
+        fields.append(QgsField("fid", QVariant.Int))
+        fields.append(QgsField("origin", QVariant.String))
+        fields.append(QgsField("destination", QVariant.String))
+        fields.append(QgsField("class", QVariant.String))
+        fields.append(QgsField("interval_start", QVariant.DateTime))
+        fields.append(QgsField("interval_end", QVariant.DateTime))
+        fields.append(QgsField("vehicle_count", QVariant.Int))
+
+        return fields
+
+    def od_matrix_features(
+        self,
+        visits: tuple[AreaVisit, ...],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        interval: timedelta | None = None,
+    ) -> Iterator[QgsFeature]:
+        """
+        Generate the features without geometries with one feature per
+        origin area, destination area, class and time interval
+        that has at least one transition.
+        """
+        bins = TimeBins(start_time, end_time, interval)
+        matrix = AreaOdMatrix(visits, bins)
+
+        area_names: dict[Any, str] = {area_id: area.name() for area, area_id in zip(self.__areas, self.__area_ids)}
+
+        fields = self.od_matrix_fields()
 
-        polygon_layer.commitChanges()
+        for i, (pair, count) in enumerate(matrix.counts().items(), 1):
+            feature = QgsFeature(fields)
+
+            interval_start, interval_end = bins.bounds(pair.bin_idx)
 
-        return polygon_layer
+            feature.setAttributes(
+                [
+                    i,
+                    area_names[pair.origin],
+                    area_names[pair.destination],
+                    pair.traveler_class or traveler_class or "all",
+                    interval_start,
+                    interval_end,
+                    count,
+                ]
+            )
+
+            if not feature.isValid():
+                raise InvalidFeatureException
+
+            yield feature
+
+    def od_matrix_as_table(
+        self,
+        visits: tuple[AreaVisit, ...],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        interval: timedelta | None = None,
+    ) -> QgsVectorLayer | None:
+        return QgisLayerUtils.create_memory_layer(
+            "None",
+            "OD Matrix",
+            None,
+            self.od_matrix_fields(),
+            self.od_matrix_features(visits, traveler_class, start_time, end_time, interval),
+        )
 
     def is_field_valid(self, field_name: str, *, accepted_types: list[QMetaType.Type]) -> bool:
         """
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from fvh3t.core.gate_od_matrix import OdPair
+
+if TYPE_CHECKING:
+    from fvh3t.core.area_visit import AreaVisit
+    from fvh3t.core.time_bins import TimeBins
+
+
+class AreaOdMatrix:
+    """
+    Area-to-area origin-destination matrix.
+
+    The visits of a trajectory are the run-length encoded
+    sequence of the areas its nodes are in, so each pair of
+    consecutive visits is a transition from one area to the
+    next and no geometries need to be tested. Transitions are
+    binned by the exit time from the origin area.
+    """
+
+    def __init__(self, visits: tuple[AreaVisit, ...], bins: TimeBins) -> None:
+        self.__bins: TimeBins = bins
+        self.__counts: dict[OdPair, int] = {}
+
+        self.create_counts(visits)
+
+    def bins(self) -> TimeBins:
+        return self.__bins
+
+    def counts(self) -> dict[OdPair, int]:
+        return self.__counts
+
+    def create_counts(self, visits: tuple[AreaVisit, ...]) -> None:
+        counts: dict[OdPair, int] = {}
+
+        # the visits of a trajectory are consecutive and in time order
+        for previous_visit, visit in zip(visits, visits[1:]):
+            if visit.trajectory_id != previous_visit.trajectory_id:
+                continue
+
+            bin_idx: int | None = self.__bins.index(previous_visit.exit_time)
+            if bin_idx is None:
+                continue
+
+            pair = OdPair(previous_visit.area_id, visit.area_id, visit.traveler_class, bin_idx)
+            counts[pair] = counts.get(pair, 0) + 1
+
+        self.__counts = dict(
+            sorted(
+                counts.items(),
+                key=lambda item: (
+                    item[0].bin_idx,
+                    str(item[0].origin),
+                    str(item[0].destination),
+                    item[0].traveler_class or "",
+                ),
+            )
+        )
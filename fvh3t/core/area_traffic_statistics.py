@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from statistics import median
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    from fvh3t.core.area_visit import AreaVisit
+    from fvh3t.core.time_bins import TimeBins
+
+
+class AreaTrafficStatistics(NamedTuple):
+    """
+    Entry, exit, dwell time and occupancy statistics of the
+    visits to an area during one time bin. Dwell times are in
+    seconds and belong to the bin of the entry. Occupancy is the
+    number of travelers inside the area, averaged over the bin.
+    """
+
+    entry_count: int = 0
+    exit_count: int = 0
+    dwell_time_avg: float | None = None
+    dwell_time_median: float | None = None
+    dwell_time_max: float | None = None
+    occupancy_avg: float = 0.0
+    occupancy_max: int = 0
+
+    @classmethod
+    def from_visits(cls, visits: tuple[AreaVisit, ...], bins: TimeBins) -> tuple[AreaTrafficStatistics, ...]:
+        """
+        Calculate the statistics for every time bin. The occupancy
+        is resolved with a single sweep over the entry and exit
+        events sorted by time instead of testing every time step.
+        """
+        bin_count: int = bins.count()
+
+        entry_counts: list[int] = [0] * bin_count
+        exit_counts: list[int] = [0] * bin_count
+        dwell_times: list[list[float]] = [[] for _ in range(bin_count)]
+        occupancy_seconds: list[float] = [0.0] * bin_count
+        occupancy_max: list[int] = [0] * bin_count
+
+        events: list[tuple[datetime, int]] = []
+
+        for visit in visits:
+            entry_idx: int | None = bins.index(visit.entry_time)
+            if entry_idx is not None:
+                entry_counts[entry_idx] += 1
+                dwell_times[entry_idx].append(visit.dwell_time().total_seconds())
+
+            exit_idx: int | None = bins.index(visit.exit_time)
+            if exit_idx is not None:
+                exit_counts[exit_idx] += 1
+
+            events.append((visit.entry_time, 1))
+            events.append((visit.exit_time, -1))
+
+        # exits sort before entries at the same time
+        events.sort()
+
+        occupancy = 0
+        previous_time: datetime | None = None
+
+        for time, change in events:
+            if previous_time is not None and occupancy > 0:
+                # spread the occupancy since the previous
+                # event over the bins it overlaps
+                period_start: datetime = max(previous_time, bins.start())
+                period_end: datetime = min(time, bins.end())
+
+                while period_start < period_end:
+                    period_idx: int | None = bins.index(period_start)
+                    if period_idx is None:
+                        break
+
+                    _, bin_end = bins.datetime_bounds(period_idx)
+                    part_end: datetime = min(bin_end, period_end)
+
+                    if part_end <= period_start:
+                        break
+
+                    occupancy_seconds[period_idx] += occupancy * (part_end - period_start).total_seconds()
+                    occupancy_max[period_idx] = max(occupancy_max[period_idx], occupancy)
+
+                    period_start = part_end
+
+            occupancy += change
+
+            event_idx: int | None = bins.index(time)
+            if event_idx is not None:
+                occupancy_max[event_idx] = max(occupancy_max[event_idx], occupancy)
+
+            previous_time = time
+
+        statistics: list[AreaTrafficStatistics] = []
+
+        for bin_idx in range(bin_count):
+            bin_start, bin_end = bins.datetime_bounds(bin_idx)
+            duration: float = (bin_end - bin_start).total_seconds()
+
+            bin_dwell_times: list[float] = dwell_times[bin_idx]
+
+            statistics.append(
+                cls(
+                    entry_counts[bin_idx],
+                    exit_counts[bin_idx],
+                    sum(bin_dwell_times) / len(bin_dwell_times) if bin_dwell_times else None,
+                    median(bin_dwell_times) if bin_dwell_times else None,
+                    max(bin_dwell_times) if bin_dwell_times else None,
+                    occupancy_seconds[bin_idx] / duration if duration > 0 else 0.0,
+                    occupancy_max[bin_idx],
+                )
+            )
+
+        return tuple(statistics)
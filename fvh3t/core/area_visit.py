@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+if TYPE_CHECKING:
+    from datetime import datetime, timedelta
+
+
+class AreaVisit(NamedTuple):
+    """
+    A simple data container representing one stay of a
+    trajectory inside an area. The entry and exit times are
+    interpolated to where the trajectory crosses the boundary
+    of the area, or are the first and last node times if the
+    trajectory starts or ends inside the area.
+    """
+
+    trajectory_id: Any
+    area_id: Any
+    entry_time: datetime
+    exit_time: datetime
+    traveler_class: str | None = None
+
+    def dwell_time(self) -> timedelta:
+        return self.exit_time - self.entry_time
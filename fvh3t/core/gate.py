@@ -1,16 +1,27 @@
 from __future__ import annotations
 
+from datetime import timedelta
+from threading import local
 from typing import TYPE_CHECKING
 
 from fvh3t.core.exceptions import InvalidDirectionException, InvalidGeometryTypeException
 
 if TYPE_CHECKING:
+    from qgis.core import QgsFeedback
+
+    from fvh3t.core.profiler import Profiler
     from fvh3t.core.trajectory import Trajectory, TrajectorySegment
     from fvh3t.core.trajectory_layer import TrajectoryLayer
 
-from qgis.core import QgsCoordinateReferenceSystem, QgsGeometry, QgsPointXY, QgsWkbTypes
+from qgis.core import QgsGeometry, QgsGeometryEngine, QgsPointXY, QgsWkbTypes
 
+from fvh3t.core.gate_count_result import GateCountResult, GateCrossing
 from fvh3t.core.gate_segment import GateSegment, RelativeDirection
+from fvh3t.core.progress import ProgressReporter
+
+# crossings of the same gate by the same trajectory
+# closer in time than this are counted only once
+CROSSING_TIME_TOLERANCE = timedelta(seconds=1)
 
 
 class Gate:
@@ -18,6 +29,10 @@ class Gate:
     A wrapper class around a QgsGeometry which represents a
     gate through which trajectories can pass. The geometry
     must be a line.
+
+    The gate itself holds no counting state, counting returns
+    a GateCountResult instead so the same gate can be counted
+    repeatedly or concurrently.
     """
 
     def __init__(
@@ -33,18 +48,11 @@ class Gate:
             raise InvalidGeometryTypeException(msg)
 
         self.__geom: QgsGeometry = geom
-        self.__trajectory_count: int = 0
-        self.__trajectory_count_negative: int = 0
-        self.__trajectory_count_positive: int = 0
-
         self.__name: str = name
 
         self.__counts_negative: bool = counts_negative
         self.__counts_positive: bool = counts_positive
 
-        self.__average_speed: float = 0.0
-        self.__average_acceleration: float = 0.0
-
         if not counts_negative and not counts_positive:
             msg = "Gate has to count at least one direction!"
             raise InvalidDirectionException(msg)
@@ -52,6 +60,10 @@ class Gate:
         self.__segments: tuple[GateSegment, ...] = ()
         self.create_segments()
 
+        # GEOS prepares geometries lazily on first use, so every
+        # thread counting the gate gets a prepared engine of its own
+        self.__thread_local = local()
+
     def name(self) -> str:
         return self.__name
 
@@ -64,21 +76,6 @@ class Gate:
     def geometry(self) -> QgsGeometry:
         return self.__geom
 
-    def trajectory_count(self) -> int:
-        return self.__trajectory_count
-
-    def trajectory_count_negative(self) -> int:
-        return self.__trajectory_count_negative
-
-    def trajectory_count_positive(self) -> int:
-        return self.__trajectory_count_positive
-
-    def average_speed(self) -> float:
-        return self.__average_speed
-
-    def average_acceleration(self) -> float:
-        return self.__average_acceleration
-
     def counts_negative(self) -> bool:
         return self.__counts_negative
 
@@ -88,8 +85,23 @@ class Gate:
     def segments(self) -> tuple[GateSegment, ...]:
         return self.__segments
 
+    def geometry_engine(self) -> QgsGeometryEngine:
+        """
+        Return a prepared geometry engine of the gate for the
+        calling thread so the gate is not parsed by GEOS again
+        for every trajectory.
+        """
+        engine: QgsGeometryEngine | None = getattr(self.__thread_local, "engine", None)
+
+        if engine is None:
+            engine = QgsGeometry.createGeometryEngine(self.__geom.constGet())
+            engine.prepareGeometry()
+            self.__thread_local.engine = engine
+
+        return engine
+
     def crosses_trajectory(self, traj: Trajectory) -> bool:
-        return self.__geom.crosses(traj.as_geometry())
+        return self.geometry_engine().crosses(traj.as_geometry().constGet())
 
     def create_segments(self) -> None:
         segments: list[GateSegment] = []
@@ -103,55 +115,129 @@ class Gate:
 
         self.__segments = tuple(segments)
 
-    def count_trajectories_from_layer(self, layer: TrajectoryLayer) -> None:
-        self.count_trajectories(layer.trajectories())
+    def count_trajectories_from_layer(
+        self, layer: TrajectoryLayer, feedback: QgsFeedback | None = None
+    ) -> GateCountResult:
+        trajectories: tuple[Trajectory, ...] = layer.trajectories()
+
+        return self.count_trajectories(trajectories, progress=ProgressReporter(feedback, len(trajectories)))
 
     def count_trajectories(
-        self, trajectories: tuple[Trajectory, ...], trajectory_layer: TrajectoryLayer | None = None
-    ) -> None:
-        speed = 0.0
-        acceleration = 0.0
-        crs = trajectory_layer.crs() if trajectory_layer else QgsCoordinateReferenceSystem("EPSG:3067")
+        self,
+        trajectories: tuple[Trajectory, ...],
+        crossing_tolerance: timedelta = CROSSING_TIME_TOLERANCE,
+        progress: ProgressReporter | None = None,
+        profiler: Profiler | None = None,
+    ) -> GateCountResult:
+        """
+        Count the trajectories crossing this gate.
+
+        A trajectory can cross the gate more than once. Crossings of
+        the same trajectory closer in time than crossing_tolerance
+        to the previous counted crossing are considered duplicates
+        (e.g. the trajectory passing through a vertex of the gate or
+        jittering on the gate line) and are not counted. Crossings
+        after that are genuine re-crossings (e.g. U-turns) which are
+        counted normally and additionally in recrossing_count.
+
+        The progress is advanced by one for every trajectory. If it
+        is canceled, the trajectories counted so far are returned.
+        The profiler counts the tests of a trajectory segment against
+        a gate segment made for the trajectories crossing the gate.
+        """
+        if progress is None:
+            progress = ProgressReporter(None, len(trajectories))
+
+        crossings: list[GateCrossing] = []
+
         for trajectory in trajectories:
+            if progress.is_canceled():
+                break
+
+            progress.advance()
+
             # check if geometries cross at all before
             # checking which specific segments cross
             # to save time
-            if self.crosses_trajectory(trajectory):
-                traj_segments: tuple[TrajectorySegment, ...] = trajectory.as_segments()
-                for i in range(len(traj_segments)):
-                    traj_seg: TrajectorySegment = traj_segments[i]
-                    for gate_segment in self.__segments:
-                        # TODO: The case where a trajectory crosses
-                        # the same gate multiple times is not handled
-
-                        previous_traj_seg: TrajectorySegment | None = traj_segments[i - 1] if i > 0 else None
-                        crosses: bool | RelativeDirection = gate_segment.trajectory_segment_crosses(
-                            traj_seg,
-                            previous_traj_seg,
-                            counts_negative=self.__counts_negative,
-                            counts_positive=self.__counts_positive,
-                        )
-                        if isinstance(crosses, RelativeDirection):
-                            if crosses == RelativeDirection.LEFT:
-                                self.__trajectory_count_positive += 1
-                            elif crosses == RelativeDirection.RIGHT:
-                                self.__trajectory_count_negative += 1
-                        if crosses is not False:
-                            self.__trajectory_count += 1
-                            current_speed = traj_seg.speed(crs)
-                            speed += current_speed
-
-                            if previous_traj_seg is not None:
-                                previous_speed = previous_traj_seg.speed(crs)
-
-                                # km/h -> m/s
-                                current_speed /= 3.6
-                                previous_speed /= 3.6
-
-                                acceleration += (current_speed - previous_speed) / (
-                                    traj_seg.node_b.timestamp - previous_traj_seg.node_a.timestamp
-                                ).total_seconds()
-
-        if self.trajectory_count() > 0:
-            self.__average_speed = speed / self.trajectory_count()
-            self.__average_acceleration = acceleration / self.trajectory_count()
+            if not self.crosses_trajectory(trajectory):
+                continue
+
+            previous_crossing: GateCrossing | None = None
+
+            for crossing in self.trajectory_crossings(trajectory, profiler):
+                if previous_crossing is None:
+                    crossings.append(crossing)
+                elif crossing.timestamp - previous_crossing.timestamp > crossing_tolerance:
+                    crossings.append(crossing._replace(recrossing=True))
+                else:
+                    continue
+
+                previous_crossing = crossing
+
+        return GateCountResult.from_crossings(tuple(crossings))
+
+    def trajectory_crossings(self, trajectory: Trajectory, profiler: Profiler | None = None) -> list[GateCrossing]:
+        """
+        Return every crossing of the trajectory through any of the
+        gate's segments ordered by time. No deduplication is done.
+        The profiler counts every segment test as it is made.
+        """
+        crossings: list[GateCrossing] = []
+        n_segment_tests = 0
+
+        traj_segments: tuple[TrajectorySegment, ...] = trajectory.as_segments()
+        # speeds are measured once per trajectory and cached,
+        # so no distances are calculated while counting
+        segment_speeds: tuple[float, ...] = trajectory.segment_speeds()
+
+        for i in range(len(traj_segments)):
+            traj_seg: TrajectorySegment = traj_segments[i]
+            previous_traj_seg: TrajectorySegment | None = traj_segments[i - 1] if i > 0 else None
+
+            for gate_segment in self.__segments:
+                n_segment_tests += 1
+                crosses: bool | RelativeDirection = gate_segment.trajectory_segment_crosses(
+                    traj_seg,
+                    previous_traj_seg,
+                    counts_negative=self.__counts_negative,
+                    counts_positive=self.__counts_positive,
+                )
+
+                if crosses is False:
+                    continue
+
+                current_speed: float = segment_speeds[i]
+                crossing_acceleration: float | None = None
+
+                if previous_traj_seg is not None:
+                    previous_speed: float = segment_speeds[i - 1]
+
+                    # km/h -> m/s
+                    crossing_acceleration = (current_speed / 3.6 - previous_speed / 3.6) / (
+                        traj_seg.node_b.timestamp - previous_traj_seg.node_a.timestamp
+                    ).total_seconds()
+
+                point, timestamp = traj_seg.interpolate(gate_segment.trajectory_segment_intersection(traj_seg))
+
+                crossings.append(
+                    GateCrossing(
+                        trajectory.identifier(),
+                        self.__name,
+                        crosses if isinstance(crosses, RelativeDirection) else None,
+                        timestamp,
+                        point,
+                        current_speed,
+                        crossing_acceleration,
+                        traveler_class=trajectory.traveler_class(),
+                        length=traj_seg.node_a.length,
+                    )
+                )
+
+        if profiler is not None:
+            profiler.count("gate segment tests", n_segment_tests)
+
+        # several gate segments can be crossed by the same
+        # trajectory segment, so order them by time
+        crossings.sort(key=lambda crossing: crossing.timestamp)
+
+        return crossings
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from fvh3t.core.gate_segment import RelativeDirection
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    from qgis.core import QgsPointXY
+
+    from fvh3t.core.time_bins import TimeBins
+
+
+class GateCrossing(NamedTuple):
+    """
+    A simple data container representing one trajectory
+    crossing a gate. The timestamp and point are interpolated
+    to where the trajectory meets the gate.
+    """
+
+    trajectory_id: Any
+    gate_name: str
+    direction: RelativeDirection | None
+    timestamp: datetime
+    point: QgsPointXY
+    speed: float
+    acceleration: float | None
+    recrossing: bool = False
+    traveler_class: str | None = None
+    length: float = 0.0
+
+    def occupancy_time(self) -> float:
+        """
+        Return the time in seconds the traveler occupies the
+        gate, i.e. the time its length takes to pass the gate.
+        """
+        if self.speed > 0:
+            # km/h -> m/s
+            return self.length / (self.speed / 3.6)
+
+        return 0.0
+
+
+class GateCountResult(NamedTuple):
+    """
+    Immutable result of counting trajectories through a gate.
+
+    Results can be merged, and since merging only sums the
+    counts and concatenates the crossings it is associative,
+    i.e. the trajectories can be counted in any partition
+    and the partial results combined afterwards.
+    """
+
+    trajectory_count: int = 0
+    trajectory_count_negative: int = 0
+    trajectory_count_positive: int = 0
+    recrossing_count: int = 0
+    speed_sum: float = 0.0
+    acceleration_sum: float = 0.0
+    crossings: tuple[GateCrossing, ...] = ()
+
+    @classmethod
+    def from_crossings(cls, crossings: tuple[GateCrossing, ...]) -> GateCountResult:
+        """
+        Aggregate already deduplicated crossings into a result.
+        """
+        trajectory_count_negative = 0
+        trajectory_count_positive = 0
+        recrossing_count = 0
+        speed = 0.0
+        acceleration = 0.0
+
+        for crossing in crossings:
+            if crossing.direction == RelativeDirection.LEFT:
+                trajectory_count_positive += 1
+            elif crossing.direction == RelativeDirection.RIGHT:
+                trajectory_count_negative += 1
+
+            if crossing.recrossing:
+                recrossing_count += 1
+
+            speed += crossing.speed
+
+            if crossing.acceleration is not None:
+                acceleration += crossing.acceleration
+
+        return cls(
+            len(crossings),
+            trajectory_count_negative,
+            trajectory_count_positive,
+            recrossing_count,
+            speed,
+            acceleration,
+            crossings,
+        )
+
+    def for_class(self, traveler_class: str) -> GateCountResult:
+        """
+        Return the result of only the crossings by the given
+        class of traveler.
+        """
+        return GateCountResult.from_crossings(
+            tuple(crossing for crossing in self.crossings if crossing.traveler_class == traveler_class)
+        )
+
+    def for_direction(self, direction: RelativeDirection) -> GateCountResult:
+        """
+        Return the result of only the crossings in the given
+        direction.
+        """
+        return GateCountResult.from_crossings(
+            tuple(crossing for crossing in self.crossings if crossing.direction == direction)
+        )
+
+    def binned(self, bins: TimeBins) -> tuple[GateCountResult, ...]:
+        """
+        Split the result into the given time bins by the crossing
+        time of each crossing. Crossings outside of the bins are
+        left out.
+        """
+        if bins.interval is None:
+            return (self,)
+
+        binned_crossings: list[list[GateCrossing]] = [[] for _ in range(bins.count())]
+
+        for crossing in self.crossings:
+            bin_idx: int | None = bins.index(crossing.timestamp)
+            if bin_idx is not None:
+                binned_crossings[bin_idx].append(crossing)
+
+        return tuple(GateCountResult.from_crossings(tuple(crossings)) for crossings in binned_crossings)
+
+    def merge(self, other: GateCountResult) -> GateCountResult:
+        return GateCountResult(
+            self.trajectory_count + other.trajectory_count,
+            self.trajectory_count_negative + other.trajectory_count_negative,
+            self.trajectory_count_positive + other.trajectory_count_positive,
+            self.recrossing_count + other.recrossing_count,
+            self.speed_sum + other.speed_sum,
+            self.acceleration_sum + other.acceleration_sum,
+            self.crossings + other.crossings,
+        )
+
+    def average_speed(self) -> float:
+        if self.trajectory_count > 0:
+            return self.speed_sum / self.trajectory_count
+
+        return 0.0
+
+    def average_acceleration(self) -> float:
+        if self.trajectory_count > 0:
+            return self.acceleration_sum / self.trajectory_count
+
+        return 0.0
@@ -1,10 +1,38 @@
 from __future__ import annotations
 
-from qgis.core import QgsFeature, QgsFeatureSource, QgsField, QgsVectorLayer, QgsWkbTypes
+from typing import TYPE_CHECKING, Iterator
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsFeatureSource,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsSpatialIndex,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
 from qgis.PyQt.QtCore import QDateTime, QMetaType, QVariant
 
 from fvh3t.core.exceptions import InvalidFeatureException, InvalidLayerException
 from fvh3t.core.gate import Gate
+from fvh3t.core.gate_count_result import GateCountResult
+from fvh3t.core.gate_od_matrix import GateOdMatrix
+from fvh3t.core.gate_segment import RelativeDirection
+from fvh3t.core.gate_traffic_statistics import GateTrafficStatistics
+from fvh3t.core.progress import ProgressReporter
+from fvh3t.core.qgis_layer_utils import QgisLayerUtils
+from fvh3t.core.time_bins import TimeBins
+
+if TYPE_CHECKING:
+    from datetime import timedelta
+
+    from qgis.core import QgsFeedback
+
+    from fvh3t.core.profiler import Profiler
+    from fvh3t.core.trajectory import Trajectory
+    from fvh3t.core.trajectory_layer import TrajectoryLayer
 
 
 class GateLayer:
@@ -31,6 +59,7 @@ class GateLayer:
 
         if self.is_valid():
             self.__gates: tuple[Gate, ...] = ()
+            self.__index = QgsSpatialIndex()
             self.create_gates()
 
     def create_gates(self) -> None:
@@ -56,49 +85,324 @@ class GateLayer:
 
         self.__gates = tuple(gates)
 
+        # gates are indexed by their position in the tuple
+        for i, gate in enumerate(self.__gates):
+            self.__index.addFeature(i, gate.geometry().boundingBox())
+
     def gates(self) -> tuple[Gate, ...]:
         return self.__gates
 
+    def crs(self) -> QgsCoordinateReferenceSystem:
+        return self.__layer.crs()
+
+    def count_trajectories_from_layer(
+        self,
+        layer: TrajectoryLayer,
+        feedback: QgsFeedback | None = None,
+        profiler: Profiler | None = None,
+    ) -> tuple[GateCountResult, ...]:
+        return self.count_trajectories(layer.trajectories(), feedback, profiler)
+
+    def count_trajectories(
+        self,
+        trajectories: tuple[Trajectory, ...],
+        feedback: QgsFeedback | None = None,
+        profiler: Profiler | None = None,
+    ) -> tuple[GateCountResult, ...]:
+        """
+        Count the trajectories through every gate. The results are
+        in the same order as the gates. Only the trajectories found
+        as candidates from the spatial index are counted per gate.
+
+        The progress is reported over all (gate, candidate) pairs.
+        If the feedback is canceled, the results counted so far
+        are returned.
+        """
+        candidates: tuple[tuple[Trajectory, ...], ...] = self.candidate_trajectories(trajectories)
+        n_candidates: int = sum(len(gate_candidates) for gate_candidates in candidates)
+
+        if profiler is not None:
+            profiler.count("gate crossing tests", n_candidates)
+            profiler.count(
+                "gate crossing tests skipped by the index", len(self.__gates) * len(trajectories) - n_candidates
+            )
+
+        progress = ProgressReporter(feedback, n_candidates)
+
+        results: list[GateCountResult] = [GateCountResult() for _ in self.__gates]
+
+        for i, (gate, gate_candidates) in enumerate(zip(self.__gates, candidates)):
+            if progress.is_canceled():
+                break
+
+            results[i] = gate.count_trajectories(gate_candidates, progress=progress, profiler=profiler)
+
+        return tuple(results)
+
+    def candidate_trajectories(self, trajectories: tuple[Trajectory, ...]) -> tuple[tuple[Trajectory, ...], ...]:
+        """
+        Return the trajectories whose bounding box intersects the
+        bounding box of each gate, in the same order as the gates.
+        Each trajectory is looked up from the spatial index once
+        instead of testing it against every gate.
+        """
+        candidates: list[list[Trajectory]] = [[] for _ in self.__gates]
+
+        for trajectory in trajectories:
+            for i in self.__index.intersects(trajectory.as_geometry().boundingBox()):
+                candidates[i].append(trajectory)
+
+        return tuple(tuple(gate_candidates) for gate_candidates in candidates)
+
+    @staticmethod
+    def line_layer_fields() -> QgsFields:
+        fields = QgsFields()
+
+        fields.append(QgsField("fid", QVariant.Int))
+        fields.append(QgsField("name", QVariant.String))
+        fields.append(QgsField("class", QVariant.String))
+        fields.append(QgsField("interval_start", QVariant.DateTime))
+        fields.append(QgsField("interval_end", QVariant.DateTime))
+        fields.append(QgsField("counts_negative", QVariant.Bool))
+        fields.append(QgsField("counts_positive", QVariant.Bool))
+        fields.append(QgsField("vehicle_count", QVariant.Int))
+        fields.append(QgsField("vehicle_count_negative", QVariant.Int))
+        fields.append(QgsField("vehicle_count_positive", QVariant.Int))
+        fields.append(QgsField("recrossing_count", QVariant.Int))
+        fields.append(QgsField("speed_avg (km/h)", QVariant.Double))
+        fields.append(QgsField("acceleration_avg (m/s^2)", QVariant.Double))
+
+        return fields
+
+    def line_layer_features(
+        self,
+        results: tuple[GateCountResult, ...],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        interval: timedelta | None = None,
+        traveler_classes: tuple[str, ...] | None = None,
+    ) -> Iterator[QgsFeature]:
+        """
+        Generate the gate features with the counting results. If
+        an interval is given, there is one feature per gate and time
+        interval of that length between start_time and end_time. If
+        traveler classes are given, the results are further split so
+        that there is one feature per gate, class and interval.
+        """
+        bins = TimeBins(start_time, end_time, interval)
+
+        fields = self.line_layer_fields()
+
+        classes: tuple[str | None, ...] = traveler_classes if traveler_classes else (None,)
+
+        rows = (
+            (gate, class_name, bin_idx, bin_result)
+            for gate, result in zip(self.__gates, results)
+            for class_name in classes
+            for bin_idx, bin_result in enumerate(
+                (result.for_class(class_name) if class_name is not None else result).binned(bins)
+            )
+        )
+
+        for i, (gate, class_name, bin_idx, result) in enumerate(rows, 1):
+            feature = QgsFeature(fields)
+
+            interval_start, interval_end = bins.bounds(bin_idx)
+
+            feature.setAttributes(
+                [
+                    i,
+                    gate.name(),
+                    class_name or traveler_class or "all",
+                    interval_start,
+                    interval_end,
+                    gate.counts_negative(),
+                    gate.counts_positive(),
+                    result.trajectory_count,
+                    result.trajectory_count_negative,
+                    result.trajectory_count_positive,
+                    result.recrossing_count,
+                    round(result.average_speed(), 2),
+                    round(result.average_acceleration(), 2),
+                ]
+            )
+            feature.setGeometry(gate.geometry())
+
+            if not feature.isValid():
+                raise InvalidFeatureException
+
+            yield feature
+
     def as_line_layer(
-        self, traveler_class: str | None, start_time: QDateTime, end_time: QDateTime
+        self,
+        results: tuple[GateCountResult, ...],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        interval: timedelta | None = None,
+        traveler_classes: tuple[str, ...] | None = None,
+    ) -> QgsVectorLayer | None:
+        return QgisLayerUtils.create_memory_layer(
+            "LineString",
+            "Line Layer",
+            self.__layer.crs(),
+            self.line_layer_fields(),
+            self.line_layer_features(results, traveler_class, start_time, end_time, interval, traveler_classes),
+        )
+
+    @staticmethod
+    def crossing_fields() -> QgsFields:
+        fields = QgsFields()
+
+        fields.append(QgsField("fid", QVariant.Int))
+        fields.append(QgsField("trajectory_id", QVariant.String))
+        fields.append(QgsField("gate", QVariant.String))
+        fields.append(QgsField("direction", QVariant.String))
+        fields.append(QgsField("class", QVariant.String))
+        fields.append(QgsField("timestamp", QVariant.DateTime))
+        fields.append(QgsField("speed (km/h)", QVariant.Double))
+        fields.append(QgsField("acceleration (m/s^2)", QVariant.Double))
+
+        return fields
+
+    def crossing_features(
+        self, results: tuple[GateCountResult, ...], traveler_class: str | None
+    ) -> Iterator[QgsFeature]:
+        """
+        Generate one point feature per crossing, located at the
+        interpolated crossing point. Aggregates over the
+        crossings can be computed from this table without creating
+        and counting the trajectories again. The points are in the
+        crs of the trajectories, not of the gates.
+        """
+        fields = self.crossing_fields()
+
+        crossings = (crossing for result in results for crossing in result.crossings)
+
+        for i, crossing in enumerate(crossings, 1):
+            feature = QgsFeature(fields)
+
+            direction: str | None = None
+            if crossing.direction == RelativeDirection.LEFT:
+                direction = "positive"
+            elif crossing.direction == RelativeDirection.RIGHT:
+                direction = "negative"
+
+            feature.setAttributes(
+                [
+                    i,
+                    str(crossing.trajectory_id),
+                    crossing.gate_name,
+                    direction,
+                    crossing.traveler_class or traveler_class or "all",
+                    QDateTime.fromMSecsSinceEpoch(round(crossing.timestamp.timestamp() * 1000)),
+                    crossing.speed,
+                    round(crossing.acceleration, 2) if crossing.acceleration is not None else None,
+                ]
+            )
+            feature.setGeometry(QgsGeometry.fromPointXY(crossing.point))
+
+            if not feature.isValid():
+                raise InvalidFeatureException
+
+            yield feature
+
+    def crossings_as_point_layer(
+        self,
+        results: tuple[GateCountResult, ...],
+        traveler_class: str | None,
+        crs: QgsCoordinateReferenceSystem,
     ) -> QgsVectorLayer | None:
-        line_layer = QgsVectorLayer("LineString", "Line Layer", "memory")
-        line_layer.setCrs(self.__layer.crs())
-
-        line_layer.startEditing()
-
-        line_layer.addAttribute(QgsField("fid", QVariant.Int))
-        line_layer.addAttribute(QgsField("name", QVariant.String))
-        line_layer.addAttribute(QgsField("class", QVariant.String))
-        line_layer.addAttribute(QgsField("interval_start", QVariant.DateTime))
-        line_layer.addAttribute(QgsField("interval_end", QVariant.DateTime))
-        line_layer.addAttribute(QgsField("counts_negative", QVariant.Bool))
-        line_layer.addAttribute(QgsField("counts_positive", QVariant.Bool))
-        line_layer.addAttribute(QgsField("vehicle_count", QVariant.Int))
-        line_layer.addAttribute(QgsField("vehicle_count_negative", QVariant.Int))
-        line_layer.addAttribute(QgsField("vehicle_count_positive", QVariant.Int))
-        line_layer.addAttribute(QgsField("speed_avg (km/h)", QVariant.Double))
-        line_layer.addAttribute(QgsField("acceleration_avg (m/s^2)", QVariant.Double))
-
-        fields = line_layer.fields()
-
-        for i, gate in enumerate(self.__gates, 1):
+        return QgisLayerUtils.create_memory_layer(
+            "Point",
+            "Point Layer",
+            crs,
+            self.crossing_fields(),
+            self.crossing_features(results, traveler_class),
+        )
+
+    def directed_results(self, gate: Gate, result: GateCountResult) -> list[tuple[str, GateCountResult]]:
+        """
+        Split the result of a gate by the directions it counts.
+        Gates counting both directions also keep the combined result.
+        """
+        directed: list[tuple[str, GateCountResult]] = []
+
+        if gate.counts_negative():
+            directed.append(("negative", result.for_direction(RelativeDirection.RIGHT)))
+        if gate.counts_positive():
+            directed.append(("positive", result.for_direction(RelativeDirection.LEFT)))
+        if gate.counts_negative() and gate.counts_positive():
+            directed.append(("both", result))
+
+        return directed
+
+    @staticmethod
+    def traffic_statistics_fields() -> QgsFields:
+        fields = QgsFields()
+
+        fields.append(QgsField("fid", QVariant.Int))
+        fields.append(QgsField("name", QVariant.String))
+        fields.append(QgsField("direction", QVariant.String))
+        fields.append(QgsField("class", QVariant.String))
+        fields.append(QgsField("interval_start", QVariant.DateTime))
+        fields.append(QgsField("interval_end", QVariant.DateTime))
+        fields.append(QgsField("vehicle_count", QVariant.Int))
+        fields.append(QgsField("flow_rate (veh/h)", QVariant.Double))
+        fields.append(QgsField("headway_min (s)", QVariant.Double))
+        fields.append(QgsField("headway_avg (s)", QVariant.Double))
+        fields.append(QgsField("headway_median (s)", QVariant.Double))
+        fields.append(QgsField("headway_max (s)", QVariant.Double))
+        fields.append(QgsField("occupancy", QVariant.Double))
+
+        return fields
+
+    def traffic_statistics_features(
+        self,
+        results: tuple[GateCountResult, ...],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        interval: timedelta | None = None,
+    ) -> Iterator[QgsFeature]:
+        """
+        Generate the features with the flow, headway and occupancy
+        statistics of the gates with one feature per gate, direction
+        and time interval. Gates counting both directions also get
+        features for both directions combined.
+        """
+        bins = TimeBins(start_time, end_time, interval)
+
+        fields = self.traffic_statistics_fields()
+
+        rows = (
+            (gate, direction, bin_idx, statistics)
+            for gate, result in zip(self.__gates, results)
+            for direction, directed_result in self.directed_results(gate, result)
+            for bin_idx, statistics in enumerate(GateTrafficStatistics.from_crossings(directed_result.crossings, bins))
+        )
+
+        for i, (gate, direction, bin_idx, statistics) in enumerate(rows, 1):
             feature = QgsFeature(fields)
 
+            interval_start, interval_end = bins.bounds(bin_idx)
+
             feature.setAttributes(
                 [
                     i,
                     gate.name(),
+                    direction,
                     traveler_class if traveler_class else "all",
-                    start_time,
-                    end_time,
-                    gate.counts_negative(),
-                    gate.counts_positive(),
-                    gate.trajectory_count(),
-                    gate.trajectory_count_negative(),
-                    gate.trajectory_count_positive(),
-                    round(gate.average_speed(), 2),
-                    round(gate.average_acceleration(), 2),
+                    interval_start,
+                    interval_end,
+                    statistics.vehicle_count,
+                    round(statistics.flow_rate, 2),
+                    round(statistics.headway_min, 2) if statistics.headway_min is not None else None,
+                    round(statistics.headway_avg, 2) if statistics.headway_avg is not None else None,
+                    round(statistics.headway_median, 2) if statistics.headway_median is not None else None,
+                    round(statistics.headway_max, 2) if statistics.headway_max is not None else None,
+                    round(statistics.occupancy, 4),
                 ]
             )
             feature.setGeometry(gate.geometry())
@@ -106,11 +410,93 @@ class GateLayer:
             if not feature.isValid():
                 raise InvalidFeatureException
 
-            line_layer.addFeature(feature)
+            yield feature
+
+    def traffic_statistics_as_line_layer(
+        self,
+        results: tuple[GateCountResult, ...],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        interval: timedelta | None = None,
+    ) -> QgsVectorLayer | None:
+        return QgisLayerUtils.create_memory_layer(
+            "LineString",
+            "Line Layer",
+            self.__layer.crs(),
+            self.traffic_statistics_fields(),
+            self.traffic_statistics_features(results, traveler_class, start_time, end_time, interval),
+        )
+
+    @staticmethod
+    def od_matrix_fields() -> QgsFields:
+        fields = QgsFields()
+
+        fields.append(QgsField("fid", QVariant.Int))
+        fields.append(QgsField("origin", QVariant.String))
+        fields.append(QgsField("destination", QVariant.String))
+        fields.append(QgsField("class", QVariant.String))
+        fields.append(QgsField("interval_start", QVariant.DateTime))
+        fields.append(QgsField("interval_end", QVariant.DateTime))
+        fields.append(QgsField("vehicle_count", QVariant.Int))
+
+        return fields
+
+    def od_matrix_features(
+        self,
+        results: tuple[GateCountResult, ...],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        interval: timedelta | None = None,
+    ) -> Iterator[QgsFeature]:
+        """
+        Generate the features without geometries with one feature per
+        origin gate, destination gate, class and time interval
+        that has at least one trajectory.
+        """
+        bins = TimeBins(start_time, end_time, interval)
+        matrix = GateOdMatrix(results, bins)
+
+        fields = self.od_matrix_fields()
+
+        for i, (pair, count) in enumerate(matrix.counts().items(), 1):
+            feature = QgsFeature(fields)
+
+            interval_start, interval_end = bins.bounds(pair.bin_idx)
+
+            feature.setAttributes(
+                [
+                    i,
+                    pair.origin,
+                    pair.destination,
+                    pair.traveler_class or traveler_class or "all",
+                    interval_start,
+                    interval_end,
+                    count,
+                ]
+            )
+
+            if not feature.isValid():
+                raise InvalidFeatureException
 
-        line_layer.commitChanges()
+            yield feature
 
-        return line_layer
+    def od_matrix_as_table(
+        self,
+        results: tuple[GateCountResult, ...],
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        interval: timedelta | None = None,
+    ) -> QgsVectorLayer | None:
+        return QgisLayerUtils.create_memory_layer(
+            "None",
+            "OD Matrix",
+            None,
+            self.od_matrix_fields(),
+            self.od_matrix_features(results, traveler_class, start_time, end_time, interval),
+        )
 
     def is_field_valid(self, field_name: str, *, accepted_types: list[QMetaType.Type]) -> bool:
         """
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+if TYPE_CHECKING:
+    from fvh3t.core.gate_count_result import GateCountResult, GateCrossing
+    from fvh3t.core.time_bins import TimeBins
+
+# an origin and a destination
+N_CROSSINGS_MIN = 2
+
+
+class OdPair(NamedTuple):
+    """
+    Key of one cell of an origin-destination matrix. The
+    origin and destination are gate names or area ids.
+    """
+
+    origin: Any
+    destination: Any
+    traveler_class: str | None
+    bin_idx: int
+
+
+class GateOdMatrix:
+    """
+    Gate-to-gate origin-destination (turning movement) matrix.
+
+    The matrix is built from the crossings already recorded while
+    counting the gates, so no geometries are intersected again.
+    The crossings of each trajectory are ordered by time, the first
+    gate crossed is the origin and the last one the destination.
+    A trajectory crossing only one gate once has no destination and
+    is left out, so that it is not mixed with the U-turns crossing
+    the same gate twice. Trajectories are binned by their first
+    crossing.
+    """
+
+    def __init__(self, results: tuple[GateCountResult, ...], bins: TimeBins) -> None:
+        self.__bins: TimeBins = bins
+        self.__sequences: dict[Any, tuple[GateCrossing, ...]] = {}
+        self.__counts: dict[OdPair, int] = {}
+
+        self.create_sequences(results)
+        self.create_counts()
+
+    def bins(self) -> TimeBins:
+        return self.__bins
+
+    def sequences(self) -> dict[Any, tuple[GateCrossing, ...]]:
+        return self.__sequences
+
+    def counts(self) -> dict[OdPair, int]:
+        return self.__counts
+
+    def create_sequences(self, results: tuple[GateCountResult, ...]) -> None:
+        crossings_by_trajectory: dict[Any, list[GateCrossing]] = {}
+
+        for result in results:
+            for crossing in result.crossings:
+                crossings_by_trajectory.setdefault(crossing.trajectory_id, []).append(crossing)
+
+        self.__sequences = {
+            trajectory_id: tuple(sorted(crossings, key=lambda crossing: crossing.timestamp))
+            for trajectory_id, crossings in crossings_by_trajectory.items()
+        }
+
+    def create_counts(self) -> None:
+        counts: dict[OdPair, int] = {}
+
+        for sequence in self.__sequences.values():
+            if len(sequence) < N_CROSSINGS_MIN:
+                continue
+
+            first: GateCrossing = sequence[0]
+            last: GateCrossing = sequence[-1]
+
+            bin_idx: int | None = self.__bins.index(first.timestamp)
+            if bin_idx is None:
+                continue
+
+            pair = OdPair(first.gate_name, last.gate_name, first.traveler_class, bin_idx)
+            counts[pair] = counts.get(pair, 0) + 1
+
+        self.__counts = dict(
+            sorted(
+                counts.items(),
+                key=lambda item: (item[0].bin_idx, item[0].origin, item[0].destination, item[0].traveler_class or ""),
+            )
+        )
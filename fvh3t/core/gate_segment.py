@@ -69,6 +69,31 @@ class GateSegment:
 
         return bool(counts_negative and counts_positive)
 
+    def trajectory_segment_intersection(self, segment: TrajectorySegment) -> float:
+        """
+        Return the fraction along the trajectory segment, 0 at
+        node A and 1 at node B, at which it meets this gate
+        segment. Used to interpolate the time and location of a
+        crossing. Parallel segments are considered to meet at
+        node A.
+        """
+        ax: float = segment.node_a.point.x()
+        ay: float = segment.node_a.point.y()
+        dx: float = segment.node_b.point.x() - ax
+        dy: float = segment.node_b.point.y() - ay
+
+        gate_dx: float = self.__point_b.x() - self.__point_a.x()
+        gate_dy: float = self.__point_b.y() - self.__point_a.y()
+
+        denominator: float = dx * gate_dy - dy * gate_dx
+
+        if denominator == 0:
+            return 0.0
+
+        fraction: float = ((self.__point_a.x() - ax) * gate_dy - (self.__point_a.y() - ay) * gate_dx) / denominator
+
+        return min(max(fraction, 0.0), 1.0)
+
     def trajectory_segment_crosses_from(self, segment: TrajectorySegment) -> RelativeDirection:
         """
         Check which relative direction a trajectory
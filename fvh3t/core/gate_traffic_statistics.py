@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from statistics import median
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from fvh3t.core.gate_count_result import GateCrossing
+    from fvh3t.core.time_bins import TimeBins
+
+
+class GateTrafficStatistics(NamedTuple):
+    """
+    Flow, headway and occupancy statistics of the crossings
+    of a gate during one time bin. Headways are the times in
+    seconds between successive crossings and occupancy is the
+    share of the bin the gate was occupied by travelers.
+    """
+
+    vehicle_count: int = 0
+    flow_rate: float = 0.0  # vehicles per hour
+    headway_min: float | None = None
+    headway_avg: float | None = None
+    headway_median: float | None = None
+    headway_max: float | None = None
+    occupancy: float = 0.0
+
+    @classmethod
+    def from_crossings(cls, crossings: tuple[GateCrossing, ...], bins: TimeBins) -> tuple[GateTrafficStatistics, ...]:
+        """
+        Calculate the statistics for every time bin. The crossings
+        are sorted by time once, after which the headways and the
+        bins are resolved in a single sweep.
+        """
+        bin_count: int = bins.count()
+
+        vehicle_counts: list[int] = [0] * bin_count
+        occupancy_times: list[float] = [0.0] * bin_count
+        headways: list[list[float]] = [[] for _ in range(bin_count)]
+
+        previous_crossing: GateCrossing | None = None
+
+        for crossing in sorted(crossings, key=lambda crossing: crossing.timestamp):
+            bin_idx: int | None = bins.index(crossing.timestamp)
+
+            if bin_idx is not None:
+                vehicle_counts[bin_idx] += 1
+                occupancy_times[bin_idx] += crossing.occupancy_time()
+
+                # a headway belongs to the bin of the later crossing
+                if previous_crossing is not None:
+                    headways[bin_idx].append((crossing.timestamp - previous_crossing.timestamp).total_seconds())
+
+            previous_crossing = crossing
+
+        statistics: list[GateTrafficStatistics] = []
+
+        for bin_idx in range(bin_count):
+            bin_start, bin_end = bins.bounds(bin_idx)
+            duration: float = bin_start.msecsTo(bin_end) / 1000
+
+            bin_headways: list[float] = headways[bin_idx]
+
+            statistics.append(
+                cls(
+                    vehicle_counts[bin_idx],
+                    vehicle_counts[bin_idx] * 3600 / duration if duration > 0 else 0.0,
+                    min(bin_headways) if bin_headways else None,
+                    sum(bin_headways) / len(bin_headways) if bin_headways else None,
+                    median(bin_headways) if bin_headways else None,
+                    max(bin_headways) if bin_headways else None,
+                    occupancy_times[bin_idx] / duration if duration > 0 else 0.0,
+                )
+            )
+
+        return tuple(statistics)
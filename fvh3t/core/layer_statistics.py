@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from threading import Lock
+from typing import Any, NamedTuple
+
+from qgis.core import QgsAggregateCalculator, QgsExpression, QgsRectangle, QgsVectorLayer
+
+
+class LayerStatistics(NamedTuple):
+    """
+    Statistics of a point layer needed before the trajectories
+    are created. They are aggregated by the provider where it
+    can, e.g. as SQL queries of a GeoPackage or PostGIS layer.
+    """
+
+    feature_count: int
+    extent: QgsRectangle
+    min_timestamp: Any
+    max_timestamp: Any
+    id_count: int
+    class_values: tuple[str, ...]
+
+    @classmethod
+    def from_layer(
+        cls, layer: QgsVectorLayer, id_field: str, timestamp_field: str, class_field: str | None = None
+    ) -> LayerStatistics:
+        """
+        Read the statistics of the layer. The fields missing
+        from the layer are left out of the statistics, and null
+        values are not counted.
+        """
+        timestamp_field_idx: int = layer.fields().indexOf(timestamp_field)
+
+        min_timestamp: Any = None
+        max_timestamp: Any = None
+
+        if timestamp_field_idx >= 0:
+            min_value, max_value = layer.minimumAndMaximumValue(timestamp_field_idx)
+
+            # null values are read as None or as a null QVariant
+            if isinstance(min_value, (int, float)) and isinstance(max_value, (int, float)):
+                min_timestamp, max_timestamp = min_value, max_value
+
+        id_count = 0
+
+        if layer.fields().indexOf(id_field) >= 0:
+            parameters = QgsAggregateCalculator.AggregateParameters()
+            parameters.filter = f"{QgsExpression.quotedColumnRef(id_field)} IS NOT NULL"
+
+            value, ok = layer.aggregate(QgsAggregateCalculator.CountDistinct, id_field, parameters)
+
+            if ok and isinstance(value, int):
+                id_count = value
+
+        return cls(
+            layer.featureCount(),
+            layer.extent(),
+            min_timestamp,
+            max_timestamp,
+            id_count,
+            cls.class_values_of(layer, class_field) if class_field else (),
+        )
+
+    @staticmethod
+    def class_values_of(layer: QgsVectorLayer, class_field: str) -> tuple[str, ...]:
+        """
+        Return the distinct non-null values of the class
+        field in alphabetical order.
+        """
+        class_field_idx: int = layer.fields().indexOf(class_field)
+
+        if class_field_idx < 0:
+            return ()
+
+        return tuple(sorted(value for value in layer.uniqueValues(class_field_idx) if isinstance(value, str)))
+
+
+class LayerStatisticsCache:
+    """
+    Keeps the statistics of the layers between the runs of the
+    algorithms. The statistics of a layer are dropped when its
+    data changes or it is deleted. The cache can be used from
+    several threads, like the processing algorithms run in the
+    background.
+
+    The class values are cached separately from the rest of the
+    statistics, so the statistics read with and without a class
+    field share the same entry.
+    """
+
+    def __init__(self) -> None:
+        self.__statistics: dict[tuple[str, str, str], LayerStatistics] = {}
+        self.__class_values: dict[tuple[str, str], tuple[str, ...]] = {}
+        self.__connected_layers: set[str] = set()
+        self.__lock = Lock()
+
+    def statistics(
+        self, layer: QgsVectorLayer, id_field: str, timestamp_field: str, class_field: str | None = None
+    ) -> LayerStatistics:
+        key = (layer.id(), id_field, timestamp_field)
+
+        with self.__lock:
+            cached: LayerStatistics | None = self.__statistics.get(key)
+
+        if cached is None:
+            self.watch(layer)
+
+            # read without holding the lock, another thread
+            # computing the same statistics only wastes time
+            cached = LayerStatistics.from_layer(layer, id_field, timestamp_field)
+
+            with self.__lock:
+                self.__statistics[key] = cached
+
+        if not class_field:
+            return cached
+
+        return cached._replace(class_values=self.class_values(layer, class_field))
+
+    def class_values(self, layer: QgsVectorLayer, class_field: str) -> tuple[str, ...]:
+        key = (layer.id(), class_field)
+
+        with self.__lock:
+            cached: tuple[str, ...] | None = self.__class_values.get(key)
+
+        if cached is not None:
+            return cached
+
+        self.watch(layer)
+
+        class_values: tuple[str, ...] = LayerStatistics.class_values_of(layer, class_field)
+
+        with self.__lock:
+            self.__class_values[key] = class_values
+
+        return class_values
+
+    def watch(self, layer: QgsVectorLayer) -> None:
+        layer_id: str = layer.id()
+
+        with self.__lock:
+            if layer_id in self.__connected_layers:
+                return
+
+            self.__connected_layers.add(layer_id)
+
+        layer.dataChanged.connect(lambda: self.invalidate(layer_id))
+        layer.subsetStringChanged.connect(lambda: self.invalidate(layer_id))
+        layer.willBeDeleted.connect(lambda: self.invalidate(layer_id, forget=True))
+
+    def invalidate(self, layer_id: str, *, forget: bool = False) -> None:
+        with self.__lock:
+            for key in [key for key in self.__statistics if key[0] == layer_id]:
+                del self.__statistics[key]
+
+            for class_key in [class_key for class_key in self.__class_values if class_key[0] == layer_id]:
+                del self.__class_values[class_key]
+
+            if forget:
+                self.__connected_layers.discard(layer_id)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__statistics.clear()
+            self.__class_values.clear()
+
+
+# shared by the processing algorithms, the plugin and the batch runner
+LAYER_STATISTICS = LayerStatisticsCache()
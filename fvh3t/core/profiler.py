@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Iterator, NamedTuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+if TYPE_CHECKING:
+    from qgis.core import QgsFeedback
+
+
+def peak_rss_bytes() -> int | None:
+    """
+    Return the peak resident set size of the process so
+    far, or None if the platform does not report it.
+    """
+    if resource is None:
+        return None
+
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageProfile(NamedTuple):
+    """
+    Time and memory used by one stage of a run. The traced
+    memory is the peak of the Python allocations made during
+    the stage, and is only measured if requested.
+
+    The peak RSS of a process only grows, so a stage records how
+    much it raised the peak instead. A stage staying below the
+    peak of an earlier stage raises it by 0.
+    """
+
+    name: str
+    duration_s: float
+    rss_peak_growth_bytes: int | None = None
+    peak_traced_bytes: int | None = None
+
+    def describe(self) -> str:
+        description: str = f"{self.name}: {self.duration_s:.3f} s"
+
+        if self.peak_traced_bytes is not None:
+            description += f", {self.peak_traced_bytes / 2**20:.1f} MiB allocated at peak"
+        if self.rss_peak_growth_bytes is not None:
+            description += f", peak RSS raised by {self.rss_peak_growth_bytes / 2**20:.1f} MiB"
+
+        return description
+
+
+class Profiler:
+    """
+    Collects the duration of the stages of a run and counters
+    of the work done, like the number of points read or the
+    number of exact geometry tests made. Counting is safe from
+    several threads at once.
+
+    Tracing the Python allocations with tracemalloc slows down
+    the run, so it is only done if trace_memory is set.
+    """
+
+    def __init__(self, *, trace_memory: bool = False) -> None:
+        self.__trace_memory: bool = trace_memory
+        self.__stages: list[StageProfile] = []
+        self.__counters: dict[str, int] = {}
+        self.__lock = Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        # another profiler might be tracing already,
+        # then its allocations would be mixed in
+        tracing: bool = self.__trace_memory and not tracemalloc.is_tracing()
+
+        if tracing:
+            tracemalloc.start()
+
+        rss_peak_before: int | None = peak_rss_bytes()
+        start: float = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            duration: float = time.perf_counter() - start
+            rss_peak_after: int | None = peak_rss_bytes()
+            rss_peak_growth: int | None = (
+                rss_peak_after - rss_peak_before if rss_peak_after is not None and rss_peak_before is not None else None
+            )
+            peak_traced: int | None = None
+
+            if tracing:
+                _, peak_traced = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+            with self.__lock:
+                self.__stages.append(StageProfile(name, duration, rss_peak_growth, peak_traced))
+
+    def count(self, counter: str, n: int = 1) -> None:
+        with self.__lock:
+            self.__counters[counter] = self.__counters.get(counter, 0) + n
+
+    def stages(self) -> tuple[StageProfile, ...]:
+        return tuple(self.__stages)
+
+    def counters(self) -> dict[str, int]:
+        return dict(self.__counters)
+
+    def report(self, feedback: QgsFeedback, path: str | None = None) -> None:
+        """
+        Push the breakdown of the stages and the counters to the
+        feedback, e.g. to the log of a processing algorithm, and
+        write them to a JSON file if a path is given.
+        """
+        total: float = sum(stage.duration_s for stage in self.__stages)
+
+        feedback.pushInfo(f"Profile ({total:.3f} s in total):")
+
+        for stage in self.__stages:
+            feedback.pushInfo(f"  {stage.describe()}")
+
+        for counter, n in self.__counters.items():
+            feedback.pushInfo(f"  {counter}: {n}")
+
+        peak_rss: int | None = peak_rss_bytes()
+
+        if peak_rss is not None:
+            feedback.pushInfo(f"  peak RSS of the process: {peak_rss / 2**20:.1f} MiB")
+
+        if path:
+            self.write_json(path)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "stages": [stage._asdict() for stage in self.__stages],
+            "counters": self.counters(),
+            "total_duration_s": sum(stage.duration_s for stage in self.__stages),
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.as_dict(), file, indent=2)
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from qgis.core import QgsFeedback
+
+
+class ProgressReporter:
+    """
+    Reports the progress of a loop over a known number of steps
+    to a QgsFeedback and tells whether the loop should be stopped.
+
+    The progress is only set when the whole percentage changes,
+    so the feedback is not flooded with updates.
+    """
+
+    def __init__(self, feedback: QgsFeedback | None, total: int) -> None:
+        self.__feedback: QgsFeedback | None = feedback
+        self.__total: int = total
+        self.__done: int = 0
+        self.__percentage: int = -1
+
+    def is_canceled(self) -> bool:
+        return self.__feedback is not None and self.__feedback.isCanceled()
+
+    def advance(self, steps: int = 1) -> None:
+        if self.__feedback is None or self.__total <= 0:
+            return
+
+        self.__done += steps
+        percentage: int = min(100, self.__done * 100 // self.__total)
+
+        if percentage != self.__percentage:
+            self.__percentage = percentage
+            self.__feedback.setProgress(percentage)
@@ -1,9 +1,15 @@
+from __future__ import annotations
+
+from typing import Any, Iterable
+
 from qgis.core import (
     QgsCoordinateReferenceSystem,
     QgsDefaultValue,
+    QgsFeature,
     QgsFeatureRenderer,
     QgsField,
     QgsFieldConstraints,
+    QgsFields,
     QgsReadWriteContext,
     QgsVectorLayer,
     edit,
@@ -15,6 +21,15 @@ from fvh3t.qgis_plugin_tools.tools.resources import resources_path
 
 
 class QgisLayerUtils:
+    @staticmethod
+    def is_null(value: Any) -> bool:
+        """
+        Tell whether an attribute value is null. Depending on the
+        QGIS version nulls are read as None or as a null QVariant,
+        which is converted to the string "NULL".
+        """
+        return value is None or (isinstance(value, QVariant) and value.isNull())
+
     @staticmethod
     def set_area_style(layer: QgsVectorLayer) -> None:
         doc = QDomDocument()
@@ -79,3 +94,29 @@ class QgisLayerUtils:
         QgisLayerUtils.set_area_style(layer)
 
         return layer
+
+    @staticmethod
+    def create_memory_layer(
+        geometry_type: str,
+        name: str,
+        crs: QgsCoordinateReferenceSystem | None,
+        fields: QgsFields,
+        features: Iterable[QgsFeature],
+    ) -> QgsVectorLayer:
+        """
+        Create a memory layer with the given fields and add the
+        features straight to its data provider, without an edit
+        session.
+        """
+        layer = QgsVectorLayer(geometry_type, name, "memory")
+        if crs is not None:
+            layer.setCrs(crs)
+
+        provider = layer.dataProvider()
+        provider.addAttributes(fields.toList())
+        layer.updateFields()
+
+        provider.addFeatures(list(features))
+        layer.updateExtents()
+
+        return layer
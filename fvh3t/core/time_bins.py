@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from math import ceil
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from qgis.PyQt.QtCore import QDateTime
+
+
+class TimeBins(NamedTuple):
+    """
+    Consecutive, equally long time intervals beginning at
+    start_time. The last bin is cut short at end_time. If
+    interval is None there is only one bin covering the
+    whole time range.
+    """
+
+    start_time: QDateTime
+    end_time: QDateTime
+    interval: timedelta | None = None
+
+    def start(self) -> datetime:
+        return datetime.fromtimestamp(self.start_time.toMSecsSinceEpoch() / 1000, tz=timezone.utc)
+
+    def end(self) -> datetime:
+        return datetime.fromtimestamp(self.end_time.toMSecsSinceEpoch() / 1000, tz=timezone.utc)
+
+    def count(self) -> int:
+        if self.interval is None:
+            return 1
+
+        return max(1, ceil((self.end() - self.start()) / self.interval))
+
+    def index(self, timestamp: datetime) -> int | None:
+        """
+        Return the index of the bin the timestamp falls in. A
+        timestamp at the very end is put in the last bin and
+        timestamps outside of the bins return None.
+        """
+        start: datetime = self.start()
+
+        if timestamp < start or timestamp > self.end():
+            return None
+
+        if self.interval is None:
+            return 0
+
+        return min((timestamp - start) // self.interval, self.count() - 1)
+
+    def bounds(self, bin_idx: int) -> tuple[QDateTime, QDateTime]:
+        """
+        Return the start and end of a bin.
+        """
+        if self.interval is None:
+            return self.start_time, self.end_time
+
+        interval_ms: int = round(self.interval / timedelta(milliseconds=1))
+
+        bin_start: QDateTime = self.start_time.addMSecs(bin_idx * interval_ms)
+        bin_end: QDateTime = self.start_time.addMSecs((bin_idx + 1) * interval_ms)
+
+        if bin_end > self.end_time:
+            bin_end = self.end_time
+
+        return bin_start, bin_end
+
+    def datetime_bounds(self, bin_idx: int) -> tuple[datetime, datetime]:
+        """
+        Return the start and end of a bin as UTC datetimes.
+        """
+        if self.interval is None:
+            return self.start(), self.end()
+
+        bin_start: datetime = self.start() + bin_idx * self.interval
+
+        return bin_start, min(bin_start + self.interval, self.end())
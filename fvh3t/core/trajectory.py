@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
-from typing import TYPE_CHECKING, NamedTuple
+from typing import TYPE_CHECKING, Any, NamedTuple
 
 from qgis.core import (
     QgsCoordinateReferenceSystem,
@@ -12,7 +12,7 @@ from qgis.core import (
     QgsUnitTypes,
 )
 
-from fvh3t.core.exceptions import InvalidTrajectoryException
+from fvh3t.core.exceptions import InvalidSegmentException, InvalidTrajectoryException
 from fvh3t.core.trajectory_segment import TrajectorySegment
 
 if TYPE_CHECKING:
@@ -24,7 +24,8 @@ N_NODES_MIN = 2
 class TrajectoryNode(NamedTuple):
     """
     A simple data container representing one node in a
-    trajectory.
+    trajectory. The group is the group of the point the
+    node was created from, e.g. the area it is in.
     """
 
     point: QgsPointXY
@@ -32,6 +33,7 @@ class TrajectoryNode(NamedTuple):
     width: float
     length: float
     height: float
+    group: Any = None
 
     @classmethod
     def from_coordinates(
@@ -58,19 +60,49 @@ class Trajectory:
     and a timestamp
     """
 
-    def __init__(self, nodes: tuple[TrajectoryNode, ...], layer: TrajectoryLayer | None = None) -> None:
+    def __init__(
+        self,
+        nodes: tuple[TrajectoryNode, ...],
+        layer: TrajectoryLayer | None = None,
+        identifier: Any = None,
+        traveler_class: str | None = None,
+    ) -> None:
         if len(nodes) < N_NODES_MIN:
             msg = "Trajectory must consist of at least two nodes."
             raise InvalidTrajectoryException(msg)
 
         self.__nodes: tuple[TrajectoryNode, ...] = nodes
         self.__layer: TrajectoryLayer | None = layer
+        self.__identifier: Any = identifier
+        self.__traveler_class: str | None = traveler_class
+
+        # created lazily and only once, see as_geometry()
+        self.__geometry: QgsGeometry | None = None
+
+        # measured lazily and only once, see _segment_distances()
+        self.__segment_distances: tuple[float, ...] | None = None
+        self.__segment_speeds: tuple[float, ...] | None = None
+        self.__movement: tuple[float, timedelta, float] | None = None
 
     def nodes(self) -> tuple[TrajectoryNode, ...]:
         return self.__nodes
 
+    def layer(self) -> TrajectoryLayer | None:
+        return self.__layer
+
+    def identifier(self) -> Any:
+        return self.__identifier
+
+    def traveler_class(self) -> str | None:
+        return self.__traveler_class
+
     def as_geometry(self) -> QgsGeometry:
-        return QgsGeometry.fromPolylineXY([node.point for node in self.__nodes])
+        # the geometry is tested against every gate and area,
+        # so build it only once
+        if self.__geometry is None:
+            self.__geometry = QgsGeometry.fromPolylineXY([node.point for node in self.__nodes])
+
+        return self.__geometry
 
     def as_segments(self) -> tuple[TrajectorySegment, ...]:
         segments: list[TrajectorySegment] = []
@@ -82,10 +114,14 @@ class Trajectory:
 
         return tuple(segments)
 
-    def _movement_core(self) -> tuple[float, timedelta, float]:
-        total_distance_m = 0.0
-        total_time_s = timedelta(0)
-        max_speed_m_per_s = 0.0
+    def _segment_distances(self) -> tuple[float, ...]:
+        """
+        Length of each segment between consecutive nodes in
+        meters. The segments are measured only on the first call,
+        after that the cached distances are returned.
+        """
+        if self.__segment_distances is not None:
+            return self.__segment_distances
 
         da = QgsDistanceArea()
 
@@ -96,14 +132,65 @@ class Trajectory:
 
         convert: bool = da.lengthUnits() != QgsUnitTypes.DistanceUnit.DistanceMeters
 
-        for i in range(1, len(self.__nodes)):
-            current_node: TrajectoryNode = self.__nodes[i]
-            previous_node: TrajectoryNode = self.__nodes[i - 1]
+        distances: list[float] = []
 
-            distance_m: float = da.measureLine(current_node.point, previous_node.point)
+        for i in range(1, len(self.__nodes)):
+            distance_m: float = da.measureLine(self.__nodes[i].point, self.__nodes[i - 1].point)
             if convert:
                 distance_m = da.convertLengthMeasurement(distance_m, QgsUnitTypes.DistanceUnit.DistanceMeters)
 
+            distances.append(distance_m)
+
+        self.__segment_distances = tuple(distances)
+
+        return self.__segment_distances
+
+    def segment_speeds(self) -> tuple[float, ...]:
+        """
+        Speed of each segment in km/h, in the same order as
+        the segments returned by as_segments(). Calculated
+        from the cached segment distances so calling this
+        repeatedly does no further measuring.
+        """
+        if self.__segment_speeds is not None:
+            return self.__segment_speeds
+
+        speeds: list[float] = []
+
+        for i, distance_m in enumerate(self._segment_distances(), 1):
+            time_difference: timedelta = self.__nodes[i].timestamp - self.__nodes[i - 1].timestamp
+            seconds: float = time_difference.total_seconds()
+
+            if seconds < 0:
+                msg = "Node A must be earlier than node B, timewise!"
+                raise InvalidSegmentException(msg)
+
+            if seconds > 0:
+                speeds.append(round(distance_m / seconds * 3.6, 2))
+            else:
+                speeds.append(0.0)
+
+        self.__segment_speeds = tuple(speeds)
+
+        return self.__segment_speeds
+
+    def _movement_core(self) -> tuple[float, timedelta, float]:
+        """
+        Total distance in meters, total duration and maximum speed
+        in m/s. Calculated on the first call only, so the statistics
+        exported with the trajectory are reused when counting.
+        """
+        if self.__movement is not None:
+            return self.__movement
+
+        total_distance_m = 0.0
+        total_time_s = timedelta(0)
+        max_speed_m_per_s = 0.0
+
+        for i, distance_m in enumerate(self._segment_distances(), 1):
+            current_node: TrajectoryNode = self.__nodes[i]
+            previous_node: TrajectoryNode = self.__nodes[i - 1]
+
             time_difference: timedelta = current_node.timestamp - previous_node.timestamp
             speed_s: float = distance_m / time_difference.total_seconds()
 
@@ -113,7 +200,9 @@ class Trajectory:
             total_distance_m += distance_m
             total_time_s += time_difference
 
-        return total_distance_m, total_time_s, max_speed_m_per_s
+        self.__movement = (total_distance_m, total_time_s, max_speed_m_per_s)
+
+        return self.__movement
 
     def maximum_speed(self) -> float:
         # here the max speed is in meters / second
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+from collections import Counter
 from datetime import datetime, timezone
 from logging import getLogger
 from math import log10
-from typing import Any
+from typing import TYPE_CHECKING, Any, Iterator
 
 from qgis.core import (
     QgsCoordinateReferenceSystem,
@@ -12,7 +13,9 @@ from qgis.core import (
     QgsFeatureIterator,
     QgsFeatureRequest,
     QgsFeatureSource,
+    QgsFeedback,
     QgsField,
+    QgsFields,
     QgsPointXY,
     QgsUnitTypes,
     QgsVectorLayer,
@@ -21,9 +24,15 @@ from qgis.core import (
 from qgis.PyQt.QtCore import QDateTime, QMetaType, QVariant
 
 from fvh3t.core.exceptions import InvalidFeatureException, InvalidLayerException
+from fvh3t.core.layer_statistics import LAYER_STATISTICS
+from fvh3t.core.progress import ProgressReporter
+from fvh3t.core.qgis_layer_utils import QgisLayerUtils
 from fvh3t.core.trajectory import Trajectory, TrajectoryNode
 from fvh3t.qgis_plugin_tools.tools.resources import plugin_name
 
+if TYPE_CHECKING:
+    from fvh3t.core.profiler import Profiler
+
 UNIX_TIMESTAMP_UNIT_THRESHOLD = 13
 N_NODES_MIN = 2
 QT_NUMERIC_TYPES = [
@@ -71,9 +80,16 @@ class TrajectoryLayer:
         height_field: str,
         timestamp_unit: QgsUnitTypes.TemporalUnit = QgsUnitTypes.TemporalUnit.TemporalUnknownUnit,
         extra_filter_expression: str | None = None,
+        class_field: str | None = None,
+        point_groups: dict[int, Any] | None = None,
+        feedback: QgsFeedback | None = None,
+        profiler: Profiler | None = None,
+        *,
+        keep_whole_trajectories: bool = False,
     ) -> None:
         self.__layer: QgsVectorLayer = layer
         self.__id_field: str = id_field
+        self.__class_field: str | None = class_field
         self.__timestamp_field: str = timestamp_field
         self.__width_field: str = width_field
         self.__length_field: str = length_field
@@ -86,21 +102,30 @@ class TrajectoryLayer:
             self.__map_units = self.__layer.crs().mapUnits()
 
             if self.__timestamp_units == QgsUnitTypes.TemporalUnit.TemporalUnknownUnit:
-                first_feature = self.__layer.getFeature(1)
-
-                timestamp: float = first_feature.attribute(self.__timestamp_field)
+                # the statistics are cached, so a layer is only read
+                # once for detecting the unit until it is changed
+                timestamp: float | None = LAYER_STATISTICS.statistics(
+                    self.__layer, self.__id_field, self.__timestamp_field
+                ).max_timestamp
 
                 # if a unix timestamp is in seconds and
                 # has 13 or more digits it is in year >= 33658
                 # so in this case let's assume that the
                 # timestamp is actually in milliseconds
-                if digits_in_timestamp_int(int(timestamp)) >= UNIX_TIMESTAMP_UNIT_THRESHOLD:
+                if timestamp and digits_in_timestamp_int(int(timestamp)) >= UNIX_TIMESTAMP_UNIT_THRESHOLD:
                     self.__timestamp_units = QgsUnitTypes.TemporalUnit.TemporalMilliseconds
                 else:
                     self.__timestamp_units = QgsUnitTypes.TemporalUnit.TemporalSeconds
 
         self.__trajectories: tuple[Trajectory, ...] = ()
-        self.create_trajectories(extra_filter_expression)
+        self.__whole_trajectories: tuple[Trajectory, ...] = ()
+        self.create_trajectories(
+            extra_filter_expression,
+            point_groups,
+            feedback,
+            profiler,
+            keep_whole_trajectories=keep_whole_trajectories,
+        )
 
     def layer(self) -> QgsVectorLayer:
         return self.__layer
@@ -126,93 +151,209 @@ class TrajectoryLayer:
     def height_field(self) -> str:
         return self.__height_field
 
+    def class_field(self) -> str | None:
+        return self.__class_field
+
     def trajectories(self) -> tuple[Trajectory, ...]:
         return self.__trajectories
 
+    def whole_trajectories(self) -> tuple[Trajectory, ...]:
+        """
+        Return the trajectories grouped by id only, including the
+        points without a group. Empty unless keep_whole_trajectories
+        was set.
+        """
+        return self.__whole_trajectories
+
+    def traveler_classes(self) -> tuple[str, ...]:
+        """
+        Return the distinct traveler classes of the trajectories,
+        including the whole trajectories, in alphabetical order.
+        Empty if no class field was given.
+        """
+        return tuple(
+            sorted(
+                {
+                    trajectory.traveler_class()
+                    for trajectory in self.__trajectories + self.__whole_trajectories
+                    if trajectory.traveler_class()
+                }
+            )
+        )
+
     def crs(self) -> QgsCoordinateReferenceSystem:
         return self.__layer.crs()
 
-    def create_trajectories(self, extra_filter_expression: str | None) -> None:
+    def create_trajectories(
+        self,
+        extra_filter_expression: str | None,
+        point_groups: dict[int, Any] | None,
+        feedback: QgsFeedback | None = None,
+        profiler: Profiler | None = None,
+        *,
+        keep_whole_trajectories: bool = False,
+    ) -> None:
+        """
+        Create the trajectories in a single pass over the points ordered
+        by id and time. If point_groups is given, it maps feature ids to
+        a group (e.g. the area a point is in) and the points are grouped
+        by the composite key (id, group) instead. Points without a group
+        are left out.
+
+        If keep_whole_trajectories is set, the trajectories of all the
+        points grouped by id only are created in the same pass. Their
+        nodes hold the group of their point, or None.
+
+        The progress is reported per point read. If the feedback is
+        canceled, no trajectories are created. The profiler counts the
+        requests made to the layer and the points read from them.
+        """
         id_field_idx: int = self.__layer.fields().indexOf(self.__id_field)
         timestamp_field_idx: int = self.__layer.fields().indexOf(self.__timestamp_field)
         width_field_idx: int = self.__layer.fields().indexOf(self.__width_field)
         length_field_idx: int = self.__layer.fields().indexOf(self.__length_field)
         height_field_idx: int = self.__layer.fields().indexOf(self.__height_field)
+        class_field_idx: int = self.__layer.fields().indexOf(self.__class_field) if self.__class_field else -1
 
-        id_is_string: bool = self.__layer.fields().field(id_field_idx).type() == QMetaType.Type.QString
+        expression_str = f'("{self.__id_field}" IS NOT NULL)'
 
-        unique_ids: set[Any] = self.__layer.uniqueValues(id_field_idx)
+        if extra_filter_expression:
+            expression_str += f" and ({extra_filter_expression})"
 
-        trajectories: list[Trajectory] = []
+        request = QgsFeatureRequest(QgsExpression(expression_str))
+
+        order_by = QgsFeatureRequest.OrderBy(
+            [
+                QgsFeatureRequest.OrderByClause(self.__id_field, ascending=True),
+                QgsFeatureRequest.OrderByClause(self.__timestamp_field, ascending=True),
+            ]
+        )
+
+        request.setOrderBy(order_by)
+
+        features: QgsFeatureIterator = self.__layer.getFeatures(request)
+
+        if profiler is not None:
+            profiler.count("point requests")
+
+        # the filtered feature count is not known beforehand,
+        # so the progress is measured against the whole layer
+        progress = ProgressReporter(feedback, self.__layer.featureCount())
 
-        for identifier in unique_ids:
-            if id_is_string:
-                expression_str = f"(\"{self.__id_field}\" = '{identifier}')"
-            else:
-                expression_str = f'("{self.__id_field}" = {identifier})'
+        nodes_by_identifier: dict[Any, list[TrajectoryNode]] = {}
+        classes_by_identifier: dict[Any, Counter[str]] = {}
+        whole_nodes_by_identifier: dict[Any, list[TrajectoryNode]] = {}
+        whole_classes_by_identifier: dict[Any, Counter[str]] = {}
+        n_scanned = 0
 
-            if extra_filter_expression:
-                expression_str += f" and ({extra_filter_expression})"
+        for feature in features:
+            if progress.is_canceled():
+                return
 
-            expression = QgsExpression(expression_str)
-            request = QgsFeatureRequest(expression)
+            progress.advance()
+            n_scanned += 1
 
-            order_clause = QgsFeatureRequest.OrderByClause(self.__timestamp_field, ascending=True)
-            order_by = QgsFeatureRequest.OrderBy([order_clause])
+            traj_id: Any = feature[id_field_idx]
+            identifier: Any = traj_id
+            group: Any | None = None
 
-            request.setOrderBy(order_by)
+            if point_groups is not None:
+                group = point_groups.get(feature.id())
 
-            features: QgsFeatureIterator = self.__layer.getFeatures(request)
+                if group is None and not keep_whole_trajectories:
+                    continue
 
-            nodes: list[TrajectoryNode] = []
+                identifier = (traj_id, group)
 
-            for feature in features:
-                point: QgsPointXY = feature.geometry().asPoint()
-                timestamp: float = feature[timestamp_field_idx]
-                width: float = feature[width_field_idx]
-                length: float = feature[length_field_idx]
-                height: float = feature[height_field_idx]
+            point: QgsPointXY = feature.geometry().asPoint()
+            timestamp: float = feature[timestamp_field_idx]
+            width: float = feature[width_field_idx]
+            length: float = feature[length_field_idx]
+            height: float = feature[height_field_idx]
 
-                if self.__timestamp_units == QgsUnitTypes.TemporalUnit.TemporalMilliseconds:
-                    timestamp = timestamp / 1000
+            if self.__timestamp_units == QgsUnitTypes.TemporalUnit.TemporalMilliseconds:
+                timestamp = timestamp / 1000
 
-                nodes.append(
-                    TrajectoryNode(point, datetime.fromtimestamp(timestamp, tz=timezone.utc), width, length, height)
-                )
+            node = TrajectoryNode(
+                point, datetime.fromtimestamp(timestamp, tz=timezone.utc), width, length, height, group
+            )
+            # points without a class leave the class to the other points
+            # of the trajectory or to the unsplit counts
+            class_value: Any = feature[class_field_idx] if class_field_idx != -1 else None
+            traveler_class: str | None = (
+                str(class_value) if not QgisLayerUtils.is_null(class_value) and class_value != "" else None
+            )
+
+            if keep_whole_trajectories:
+                whole_nodes_by_identifier.setdefault(traj_id, []).append(node)
+
+                if traveler_class is not None:
+                    whole_classes_by_identifier.setdefault(traj_id, Counter())[traveler_class] += 1
+
+            if point_groups is not None and group is None:
+                continue
+
+            nodes_by_identifier.setdefault(identifier, []).append(node)
+
+            if traveler_class is not None:
+                classes_by_identifier.setdefault(identifier, Counter())[traveler_class] += 1
+
+        if profiler is not None:
+            profiler.count("points scanned", n_scanned)
+
+        self.__trajectories = self.__build_trajectories(nodes_by_identifier, classes_by_identifier)
+        self.__whole_trajectories = self.__build_trajectories(whole_nodes_by_identifier, whole_classes_by_identifier)
 
+    def __build_trajectories(
+        self, nodes_by_identifier: dict[Any, list[TrajectoryNode]], classes_by_identifier: dict[Any, Counter[str]]
+    ) -> tuple[Trajectory, ...]:
+        trajectories: list[Trajectory] = []
+
+        for identifier, nodes in nodes_by_identifier.items():
             if len(nodes) < N_NODES_MIN:
                 LOGGER.info('Trajectory with id "%s" has only one node, skipping...', str(identifier))
                 continue
 
-            trajectories.append(Trajectory(tuple(nodes), self))
-
-        self.__trajectories = tuple(trajectories)
+            # the class of a traveler might change along the
+            # trajectory so use the most common one
+            class_counter: Counter[str] | None = classes_by_identifier.get(identifier)
+            traveler_class: str | None = class_counter.most_common(1)[0][0] if class_counter else None
+
+            trajectories.append(Trajectory(tuple(nodes), self, identifier, traveler_class))
+
+        return tuple(trajectories)
+
+    @staticmethod
+    def line_layer_fields() -> QgsFields:
+        fields = QgsFields()
+
+        fields.append(QgsField("fid", QVariant.Int))
+        fields.append(QgsField("average_speed (km/h)", QVariant.Double))
+        fields.append(QgsField("maximum_speed (km/h)", QVariant.Double))
+        fields.append(QgsField("length (m)", QVariant.Double))
+        fields.append(QgsField("start", QVariant.DateTime))
+        fields.append(QgsField("duration (s)", QVariant.Double))
+        fields.append(QgsField("minimum_size_x (m)", QVariant.Double))
+        fields.append(QgsField("minimum_size_y (m)", QVariant.Double))
+        fields.append(QgsField("minimum_size_z (m)", QVariant.Double))
+        fields.append(QgsField("maximum_size_x (m)", QVariant.Double))
+        fields.append(QgsField("maximum_size_y (m)", QVariant.Double))
+        fields.append(QgsField("maximum_size_z (m)", QVariant.Double))
+        fields.append(QgsField("average_size_x (m)", QVariant.Double))
+        fields.append(QgsField("average_size_y (m)", QVariant.Double))
+        fields.append(QgsField("average_size_z (m)", QVariant.Double))
+
+        return fields
+
+    def line_layer_features(self, trajectories: tuple[Trajectory, ...] | None = None) -> Iterator[QgsFeature]:
+        """
+        Yield the trajectories as line features, by default the
+        trajectories of the layer, e.g. the whole trajectories if
+        given instead.
+        """
+        fields = self.line_layer_fields()
 
-    def as_line_layer(self) -> QgsVectorLayer | None:
-        line_layer = QgsVectorLayer("LineString", "Line Layer", "memory")
-        line_layer.setCrs(self.__layer.crs())
-
-        line_layer.startEditing()
-
-        line_layer.addAttribute(QgsField("fid", QVariant.Int))
-        line_layer.addAttribute(QgsField("average_speed (km/h)", QVariant.Double))
-        line_layer.addAttribute(QgsField("maximum_speed (km/h)", QVariant.Double))
-        line_layer.addAttribute(QgsField("length (m)", QVariant.Double))
-        line_layer.addAttribute(QgsField("start", QVariant.DateTime))
-        line_layer.addAttribute(QgsField("duration (s)", QVariant.Double))
-        line_layer.addAttribute(QgsField("minimum_size_x (m)", QVariant.Double))
-        line_layer.addAttribute(QgsField("minimum_size_y (m)", QVariant.Double))
-        line_layer.addAttribute(QgsField("minimum_size_z (m)", QVariant.Double))
-        line_layer.addAttribute(QgsField("maximum_size_x (m)", QVariant.Double))
-        line_layer.addAttribute(QgsField("maximum_size_y (m)", QVariant.Double))
-        line_layer.addAttribute(QgsField("maximum_size_z (m)", QVariant.Double))
-        line_layer.addAttribute(QgsField("average_size_x (m)", QVariant.Double))
-        line_layer.addAttribute(QgsField("average_size_y (m)", QVariant.Double))
-        line_layer.addAttribute(QgsField("average_size_z (m)", QVariant.Double))
-
-        fields = line_layer.fields()
-
-        for i, trajectory in enumerate(self.__trajectories, 1):
+        for i, trajectory in enumerate(self.__trajectories if trajectories is None else trajectories, 1):
             feature = QgsFeature(fields)
 
             first_traj_node = trajectory.nodes()[0]
@@ -246,11 +387,12 @@ class TrajectoryLayer:
             if not feature.isValid():
                 raise InvalidFeatureException
 
-            line_layer.addFeature(feature)
-
-        line_layer.commitChanges()
+            yield feature
 
-        return line_layer
+    def as_line_layer(self) -> QgsVectorLayer | None:
+        return QgisLayerUtils.create_memory_layer(
+            "LineString", "Line Layer", self.__layer.crs(), self.line_layer_fields(), self.line_layer_features()
+        )
 
     def is_field_valid(self, field_name: str, *, accepted_types: list[QMetaType.Type]) -> bool:
         """
@@ -307,4 +449,8 @@ class TrajectoryLayer:
             msg = "Height field either not found or of incorrect type."
             raise InvalidLayerException(msg)
 
+        if self.__class_field and not self.is_field_valid(self.__class_field, accepted_types=[]):
+            msg = "Class field not found."
+            raise InvalidLayerException(msg)
+
         return True
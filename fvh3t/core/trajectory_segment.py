@@ -7,13 +7,14 @@ from qgis.core import (
     QgsCoordinateTransformContext,
     QgsDistanceArea,
     QgsGeometry,
+    QgsPointXY,
     QgsUnitTypes,
 )
 
 from fvh3t.core.exceptions import InvalidSegmentException
 
 if TYPE_CHECKING:
-    from datetime import timedelta
+    from datetime import datetime, timedelta
 
     from fvh3t.core.gate import Gate
     from fvh3t.core.trajectory import TrajectoryNode
@@ -56,5 +57,18 @@ class TrajectorySegment:
     def as_geometry(self) -> QgsGeometry:
         return QgsGeometry.fromPolylineXY([self.node_a.point, self.node_b.point])
 
+    def interpolate(self, fraction: float) -> tuple[QgsPointXY, datetime]:
+        """
+        Return the location and time at the given fraction
+        of the segment, 0 being node A and 1 node B.
+        """
+        point = QgsPointXY(
+            self.node_a.point.x() + fraction * (self.node_b.point.x() - self.node_a.point.x()),
+            self.node_a.point.y() + fraction * (self.node_b.point.y() - self.node_a.point.y()),
+        )
+        timestamp: datetime = self.node_a.timestamp + fraction * (self.node_b.timestamp - self.node_a.timestamp)
+
+        return point, timestamp
+
     def intersects_gate(self, gate: Gate) -> bool:
         return self.as_geometry().intersects(gate.geometry())
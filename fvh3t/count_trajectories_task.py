@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from typing import Any
+
+from qgis.core import (
+    QgsApplication,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingAlgRunnerTask,
+    QgsProcessingContext,
+    QgsProcessingFeedback,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterFeatureSink,
+    QgsProject,
+)
+
+
+class CountTrajectoriesTask(QgsProcessingAlgRunnerTask):
+    """
+    Runs a counting algorithm on the task manager so the UI is not
+    blocked, with the progress of the algorithm shown in the task bar.
+
+    The layers of the project are only read on the main thread. The
+    task runs the prepareAlgorithm of the algorithm when it is created,
+    and the counting algorithms copy the points they need, near the
+    gates or areas and within the time range, to a memory layer there.
+    Only the copies are used in the worker thread. The outputs are
+    added to the project when the task has finished.
+    """
+
+    def __init__(self, algorithm_id: str, parameters: dict[str, Any]) -> None:
+        algorithm: QgsProcessingAlgorithm | None = QgsApplication.processingRegistry().createAlgorithmById(algorithm_id)
+
+        if algorithm is None:
+            msg = f'Algorithm "{algorithm_id}" not found.'
+            raise ValueError(msg)
+
+        context = QgsProcessingContext()
+        context.setProject(QgsProject.instance())
+        feedback = QgsProcessingFeedback()
+
+        sinks: list[QgsProcessingParameterFeatureSink] = [
+            definition
+            for definition in algorithm.parameterDefinitions()
+            if isinstance(definition, QgsProcessingParameterFeatureSink)
+        ]
+
+        outputs: dict[str, str] = {
+            definition.name(): QgsProcessing.TEMPORARY_OUTPUT
+            for definition in sinks
+            if not definition.flags() & QgsProcessingParameterDefinition.FlagOptional
+        }
+
+        super().__init__(algorithm, {**outputs, **parameters}, context, feedback)
+
+        self.__context: QgsProcessingContext = context
+        self.__feedback: QgsProcessingFeedback = feedback
+        self.__sinks: list[QgsProcessingParameterFeatureSink] = sinks
+
+        self.executed.connect(self.add_results_to_project)
+
+    def feedback(self) -> QgsProcessingFeedback:
+        return self.__feedback
+
+    def add_results_to_project(self, successful: bool, results: dict[str, Any]) -> None:  # noqa: FBT001
+        """
+        Move the output layers from the temporary layer store
+        of the processing context to the project.
+        """
+        if not successful:
+            return
+
+        for definition in self.__sinks:
+            layer_id: Any | None = results.get(definition.name())
+
+            if not isinstance(layer_id, str):
+                continue
+
+            layer = self.__context.takeResultLayer(layer_id)
+
+            if layer is not None:
+                layer.setName(definition.description())
+                QgsProject.instance().addMapLayer(layer)
@@ -1,35 +1,38 @@
 from __future__ import annotations
 
-try:
-    import processing
-except ImportError:
-    from qgis import processing
-
-from typing import Any
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
 
 from qgis.core import (
-    QgsFeatureRequest,
-    QgsFeatureSink,
-    QgsField,
+    QgsCoordinateReferenceSystem,
     QgsProcessing,
     QgsProcessingAlgorithm,
     QgsProcessingContext,
     QgsProcessingFeedback,
+    QgsProcessingMultiStepFeedback,
+    QgsProcessingParameterBoolean,
     QgsProcessingParameterDateTime,
     QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterNumber,
     QgsProcessingParameterString,
     QgsProcessingParameterVectorLayer,
     QgsProcessingUtils,
-    QgsUnitTypes,
-    QgsVectorLayer,
-    edit,
+    QgsRectangle,
+    QgsWkbTypes,
 )
-from qgis.PyQt.QtCore import QCoreApplication, QDateTime, QVariant
+from qgis.PyQt.QtCore import QCoreApplication
 
 from fvh3t.core.area_layer import AreaLayer
+from fvh3t.core.profiler import Profiler
 from fvh3t.core.qgis_layer_utils import QgisLayerUtils
 from fvh3t.core.trajectory_layer import TrajectoryLayer
-from fvh3t.fvh3t_processing.utils import ProcessingUtils
+from fvh3t.fvh3t_processing.utils import PointInput, ProcessingUtils
+
+if TYPE_CHECKING:
+    from qgis.PyQt.QtCore import QDateTime
+
+    from fvh3t.core.trajectory import Trajectory
 
 
 class CountTrajectoriesArea(QgsProcessingAlgorithm):
@@ -38,11 +41,23 @@ class CountTrajectoriesArea(QgsProcessingAlgorithm):
     TRAVELER_CLASS = "TRAVELER_CLASS"
     START_TIME = "START_TIME"
     END_TIME = "END_TIME"
+    SPLIT_BY_CLASS = "SPLIT_BY_CLASS"
+    PROFILE = "PROFILE"
+    INTERVAL = "INTERVAL"
     OUTPUT_AREAS = "OUTPUT_AREAS"
     OUTPUT_TRAJECTORIES = "OUTPUT_TRAJECTORIES"
+    OUTPUT_DWELL_TIMES = "OUTPUT_DWELL_TIMES"
+    OUTPUT_OD_MATRIX = "OUTPUT_OD_MATRIX"
 
     area_dest_id: str | None = None
     traj_dest_id: str | None = None
+    dwell_time_dest_id: str | None = None
+    od_matrix_dest_id: str | None = None
+
+    # the inputs read in prepareAlgorithm
+    profiler: Profiler | None = None
+    area_layer: AreaLayer | None = None
+    points: PointInput | None = None
 
     def __init__(self) -> None:
         super().__init__()
@@ -103,6 +118,24 @@ class CountTrajectoriesArea(QgsProcessingAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                name=self.SPLIT_BY_CLASS,
+                description="Split counts by traveler class",
+                defaultValue=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.INTERVAL,
+                description="Interval length for dwell times and OD matrix (minutes)",
+                type=QgsProcessingParameterNumber.Integer,
+                optional=True,
+                minValue=1,
+            )
+        )
+
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 name=self.OUTPUT_AREAS,
@@ -119,20 +152,55 @@ class CountTrajectoriesArea(QgsProcessingAlgorithm):
             )
         )
 
-    def processAlgorithm(  # noqa N802
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                name=self.OUTPUT_DWELL_TIMES,
+                description="Dwell times - Areas",
+                type=QgsProcessing.SourceType.TypeVectorPolygon,
+                optional=True,
+                createByDefault=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                name=self.OUTPUT_OD_MATRIX,
+                description="OD matrix - Areas",
+                type=QgsProcessing.SourceType.TypeVector,
+                optional=True,
+                createByDefault=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                name=self.PROFILE,
+                description="Profile",
+                fileFilter="JSON files (*.json)",
+                optional=True,
+                createByDefault=False,
+            )
+        )
+
+    def prepareAlgorithm(  # noqa N802
         self,
         parameters: dict[str, Any],
         context: QgsProcessingContext,
         feedback: QgsProcessingFeedback,
-    ) -> dict:
+    ) -> bool:
         """
-        Here is where the processing itself takes place.
+        Reads the input layers on the main thread, so that only
+        copies of them are used when run in a background task.
         """
 
         # Initialize feedback if it is None
         if feedback is None:
             feedback = QgsProcessingFeedback()
 
+        # the allocations are only traced when a profile is written
+        profile_path: str = self.parameterAsFileOutput(parameters, self.PROFILE, context)
+        self.profiler = Profiler(trace_memory=bool(profile_path))
+
         point_layer = self.parameterAsVectorLayer(parameters, self.INPUT_POINTS, context)
         area_vector_layer = self.parameterAsVectorLayer(parameters, self.INPUT_AREAS, context)
         traveler_class = self.parameterAsString(parameters, self.TRAVELER_CLASS, context)
@@ -145,142 +213,196 @@ class CountTrajectoriesArea(QgsProcessingAlgorithm):
         area_layer_fid_field = "fid"
 
         feedback.pushInfo(f"Area layer has {area_vector_layer.featureCount()} features.")
-        area_layer = AreaLayer(area_vector_layer, area_layer_fid_field, "name")
+        self.area_layer = AreaLayer(area_vector_layer, area_layer_fid_field, "name")
 
         # the datetime widget doesn't allow the user to set the seconds and they
         # are being set seemingly randomly leading to odd results...
         # so set 0 seconds manually
         ProcessingUtils.normalize_datetimes(start_time, end_time)
 
-        ## CREATE TRAJECTORIES
-
-        total_features: int = point_layer.featureCount()
-        feedback.pushInfo(f"Original point layer has {total_features} features.")
+        # only the trajectories passing through the areas are read
+        extent: QgsRectangle = ProcessingUtils.get_extent([area_vector_layer], point_layer.crs())
 
-        # Get min and max timestamps from the data
-        min_timestamp, max_timestamp = ProcessingUtils.get_min_and_max_timestamps(point_layer, "timestamp")
-        start_time_unix, end_time_unix = ProcessingUtils.get_start_and_end_timestamps(
-            start_time, end_time, min_timestamp, max_timestamp
+        self.points = ProcessingUtils.read_points(
+            point_layer, traveler_class, start_time, end_time, extent, feedback, self.profiler
         )
 
-        filter_expression: str | None = ProcessingUtils.get_filter_expression_time_and_class(
-            start_time_unix,
-            end_time_unix,
-            traveler_class,
-            min_timestamp,
-            max_timestamp,
-        )
+        return not feedback.isCanceled()
 
-        if filter_expression is None:
-            filter_expression = ""
-        else:
-            filter_expression += " AND "
-
-        filter_expression += f"(overlay_within('{area_vector_layer.id()}'))"
-
-        req = QgsFeatureRequest().setFilterExpression(filter_expression)
-        filtered_points = point_layer.materialize(req)
-
-        total_filtered_points: int = filtered_points.featureCount()
-        feedback.pushInfo(f"Filtered {total_features - total_filtered_points} features out.")
-        feedback.pushInfo(f"Creating trajectories for {total_filtered_points} points out of {total_features}.")
-
-        # add area id to points to enable grouping them by area
-        join_result = processing.run(
-            "native:joinattributesbylocation",
-            {
-                "INPUT": filtered_points,
-                "PREDICATE": [0],
-                "JOIN": area_vector_layer,
-                "JOIN_FIELDS": ["fid"],
-                "METHOD": 1,
-                "DISCARD_NONMATCHING": False,
-                "PREFIX": "area_",
-                "OUTPUT": "TEMPORARY_OUTPUT",
-            },
+    def processAlgorithm(  # noqa N802
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict:
+        """
+        Here is where the processing itself takes place.
+        """
+
+        # Initialize feedback if it is None
+        if feedback is None:
+            feedback = QgsProcessingFeedback()
+
+        profile_path: str = self.parameterAsFileOutput(parameters, self.PROFILE, context)
+        profiler: Profiler = self.profiler
+        area_layer: AreaLayer = self.area_layer
+        points: PointInput = self.points
+
+        traveler_class = self.parameterAsString(parameters, self.TRAVELER_CLASS, context)
+        split_by_class: bool = self.parameterAsBoolean(parameters, self.SPLIT_BY_CLASS, context)
+        interval_minutes: int = self.parameterAsInt(parameters, self.INTERVAL, context)
+        start_time, end_time = points.start_time, points.end_time
+
+        interval: timedelta | None = timedelta(minutes=interval_minutes) if interval_minutes > 0 else None
+
+        ## CREATE TRAJECTORIES
+
+        # the progress is reported per stage: creating the trajectories,
+        # counting the areas and finding the visits for the optional outputs
+        steps = QgsProcessingMultiStepFeedback(3, feedback)
+
+        trajectory_layer: TrajectoryLayer | None = ProcessingUtils.create_trajectory_layer(
+            points,
+            area_layer,
+            steps,
+            profiler,
+            split_by_class=split_by_class,
+            # the visits need the whole trajectories including the
+            # points outside of the areas to find the entries and exits
+            keep_whole_trajectories=bool(
+                parameters.get(self.OUTPUT_DWELL_TIMES) or parameters.get(self.OUTPUT_OD_MATRIX)
+            ),
         )
 
-        filtered_and_grouped_points: QgsVectorLayer = join_result["OUTPUT"]
+        if feedback.isCanceled():
+            return {}
+
+        # if no points were left, e.g. no trajectory passes through
+        # the areas, the outputs are written with every area counted
+        # as zero
+        trajectories: tuple[Trajectory, ...] = trajectory_layer.trajectories() if trajectory_layer is not None else ()
+
+        with profiler.stage("write trajectories"):
+            (sink, self.traj_dest_id) = self.parameterAsSink(
+                parameters,
+                self.OUTPUT_TRAJECTORIES,
+                context,
+                TrajectoryLayer.line_layer_fields(),
+                QgsWkbTypes.Type.LineString,
+                points.layer.crs(),
+            )
 
-        # convert id to string and concatenate the area_fid to it
-        # to group the points by id AND the area they're in
-        grouped_id_field = QgsField("grouped_id", QVariant.String)
+            if trajectory_layer is not None:
+                ProcessingUtils.write_to_sink(sink, trajectory_layer.line_layer_features(), feedback)
 
-        with edit(filtered_and_grouped_points):
-            filtered_and_grouped_points.addAttribute(grouped_id_field)
-            id_field_idx: int = filtered_and_grouped_points.fields().indexOf("id")
-            area_id_field_idx: int = filtered_and_grouped_points.fields().indexOf("area_fid")
-            grouped_id_field_idx: int = filtered_and_grouped_points.fields().indexOf("grouped_id")
+        # CREATE AREAS
 
-            for feature in filtered_and_grouped_points.getFeatures():
-                idx: int = feature[id_field_idx]
-                area_id: int = feature[area_id_field_idx]
+        steps.setCurrentStep(1)
 
-                grouped_id = f"{area_id}_{idx}"
+        with profiler.stage("count areas"):
+            results = area_layer.count_trajectories(
+                trajectories, split_by_class=split_by_class, feedback=steps, profiler=profiler
+            )
 
-                filtered_and_grouped_points.changeAttributeValue(
-                    feature.id(),
-                    grouped_id_field_idx,
-                    grouped_id,
-                )
+        if feedback.isCanceled():
+            return {}
+
+        with profiler.stage("write areas"):
+            (sink, self.area_dest_id) = self.parameterAsSink(
+                parameters,
+                self.OUTPUT_AREAS,
+                context,
+                AreaLayer.polygon_layer_fields(),
+                QgsWkbTypes.Type.Polygon,
+                area_layer.crs(),
+            )
 
-        trajectory_layer = TrajectoryLayer(
-            filtered_and_grouped_points,
-            "grouped_id",
-            "timestamp",
-            "size_x",
-            "size_y",
-            "size_z",
-            QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
-        )
+            ProcessingUtils.write_to_sink(
+                sink,
+                area_layer.polygon_layer_features(
+                    results,
+                    traveler_class=traveler_class,
+                    start_time=start_time,
+                    end_time=end_time,
+                    traveler_classes=(
+                        trajectory_layer.traveler_classes() if split_by_class and trajectory_layer is not None else None
+                    ),
+                ),
+                feedback,
+            )
 
-        exported_traj_layer = trajectory_layer.as_line_layer()
+        outputs = {self.OUTPUT_TRAJECTORIES: self.traj_dest_id, self.OUTPUT_AREAS: self.area_dest_id}
 
-        if exported_traj_layer is None:
-            msg = "Trajectory layer is None."
-            raise ValueError(msg)
+        if profile_path:
+            outputs[self.PROFILE] = profile_path
 
-        (sink, self.traj_dest_id) = self.parameterAsSink(
-            parameters,
-            self.OUTPUT_TRAJECTORIES,
-            context,
-            exported_traj_layer.fields(),
-            exported_traj_layer.wkbType(),
-            exported_traj_layer.sourceCrs(),
-        )
+        if not parameters.get(self.OUTPUT_DWELL_TIMES) and not parameters.get(self.OUTPUT_OD_MATRIX):
+            profiler.report(feedback, profile_path)
+            return outputs
 
-        for feature in exported_traj_layer.getFeatures():
-            sink.addFeature(feature, QgsFeatureSink.Flag.FastInsert)
+        steps.setCurrentStep(2)
 
-        # CREATE AREAS
+        with profiler.stage("find visits"):
+            visits = area_layer.visits(
+                trajectory_layer.whole_trajectories() if trajectory_layer is not None else (), steps
+            )
 
-        area_layer.count_trajectories_from_layer(trajectory_layer)
+        if feedback.isCanceled():
+            return {}
+
+        with profiler.stage("write visits"):
+            if parameters.get(self.OUTPUT_DWELL_TIMES):
+                (sink, self.dwell_time_dest_id) = self.parameterAsSink(
+                    parameters,
+                    self.OUTPUT_DWELL_TIMES,
+                    context,
+                    AreaLayer.traffic_statistics_fields(),
+                    QgsWkbTypes.Type.Polygon,
+                    area_layer.crs(),
+                )
 
-        if not start_time:
-            start_time = QDateTime.fromMSecsSinceEpoch(int(min_timestamp))
-        if not end_time:
-            end_time = QDateTime.fromMSecsSinceEpoch(int(max_timestamp))
-        exported_area_layer = area_layer.as_polygon_layer(
-            traveler_class=traveler_class, start_time=start_time, end_time=end_time
-        )
+                ProcessingUtils.write_to_sink(
+                    sink,
+                    area_layer.traffic_statistics_features(
+                        visits,
+                        traveler_class=traveler_class,
+                        start_time=start_time,
+                        end_time=end_time,
+                        interval=interval,
+                    ),
+                    feedback,
+                )
 
-        if exported_area_layer is None:
-            msg = "Polygon layer is None"
-            raise ValueError(msg)
-
-        (sink, self.area_dest_id) = self.parameterAsSink(
-            parameters,
-            self.OUTPUT_AREAS,
-            context,
-            exported_area_layer.fields(),
-            exported_area_layer.wkbType(),
-            exported_area_layer.sourceCrs(),
-        )
+                outputs[self.OUTPUT_DWELL_TIMES] = self.dwell_time_dest_id
+
+            # the od matrix is derived from the same visits
+            if parameters.get(self.OUTPUT_OD_MATRIX):
+                (sink, self.od_matrix_dest_id) = self.parameterAsSink(
+                    parameters,
+                    self.OUTPUT_OD_MATRIX,
+                    context,
+                    AreaLayer.od_matrix_fields(),
+                    QgsWkbTypes.Type.NoGeometry,
+                    QgsCoordinateReferenceSystem(),
+                )
+
+                ProcessingUtils.write_to_sink(
+                    sink,
+                    area_layer.od_matrix_features(
+                        visits,
+                        traveler_class=traveler_class,
+                        start_time=start_time,
+                        end_time=end_time,
+                        interval=interval,
+                    ),
+                    feedback,
+                )
+
+                outputs[self.OUTPUT_OD_MATRIX] = self.od_matrix_dest_id
 
-        for feature in exported_area_layer.getFeatures():
-            sink.addFeature(feature, QgsFeatureSink.Flag.FastInsert)
+        profiler.report(feedback, profile_path)
 
-        return {self.OUTPUT_TRAJECTORIES: self.traj_dest_id, self.OUTPUT_AREAS: self.area_dest_id}
+        return outputs
 
     def postProcessAlgorithm(self, context: QgsProcessingContext, feedback: QgsProcessingFeedback) -> dict[str, Any]:  # noqa: N802
         if self.area_dest_id:
@@ -1,27 +1,38 @@
 from __future__ import annotations
 
-from typing import Any
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
 
 from qgis.core import (
-    QgsFeatureRequest,
-    QgsFeatureSink,
+    QgsCoordinateReferenceSystem,
     QgsProcessing,
     QgsProcessingAlgorithm,
     QgsProcessingContext,
     QgsProcessingFeedback,
+    QgsProcessingMultiStepFeedback,
+    QgsProcessingParameterBoolean,
     QgsProcessingParameterDateTime,
     QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterNumber,
     QgsProcessingParameterString,
     QgsProcessingParameterVectorLayer,
     QgsProcessingUtils,
-    QgsUnitTypes,
+    QgsRectangle,
+    QgsWkbTypes,
 )
-from qgis.PyQt.QtCore import QCoreApplication, QDateTime
+from qgis.PyQt.QtCore import QCoreApplication
 
 from fvh3t.core.gate_layer import GateLayer
+from fvh3t.core.profiler import Profiler
 from fvh3t.core.qgis_layer_utils import QgisLayerUtils
 from fvh3t.core.trajectory_layer import TrajectoryLayer
-from fvh3t.fvh3t_processing.utils import ProcessingUtils
+from fvh3t.fvh3t_processing.utils import DEFAULT_EXTENT_BUFFER, PointInput, ProcessingUtils
+
+if TYPE_CHECKING:
+    from qgis.PyQt.QtCore import QDateTime
+
+    from fvh3t.core.trajectory import Trajectory
 
 
 class CountTrajectoriesGate(QgsProcessingAlgorithm):
@@ -30,11 +41,26 @@ class CountTrajectoriesGate(QgsProcessingAlgorithm):
     TRAVELER_CLASS = "TRAVELER_CLASS"
     START_TIME = "START_TIME"
     END_TIME = "END_TIME"
+    INTERVAL = "INTERVAL"
+    SPLIT_BY_CLASS = "SPLIT_BY_CLASS"
+    EXTENT_BUFFER = "EXTENT_BUFFER"
+    PROFILE = "PROFILE"
     OUTPUT_GATES = "OUTPUT_GATES"
     OUTPUT_TRAJECTORIES = "OUTPUT_TRAJECTORIES"
+    OUTPUT_CROSSINGS = "OUTPUT_CROSSINGS"
+    OUTPUT_OD_MATRIX = "OUTPUT_OD_MATRIX"
+    OUTPUT_HEADWAYS = "OUTPUT_HEADWAYS"
 
     gate_dest_id: str | None = None
     traj_dest_id: str | None = None
+    crossing_dest_id: str | None = None
+    od_matrix_dest_id: str | None = None
+    headway_dest_id: str | None = None
+
+    # the inputs read in prepareAlgorithm
+    profiler: Profiler | None = None
+    gate_layer: GateLayer | None = None
+    points: PointInput | None = None
 
     def __init__(self) -> None:
         super().__init__()
@@ -95,6 +121,34 @@ class CountTrajectoriesGate(QgsProcessingAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.INTERVAL,
+                description="Interval length (minutes)",
+                type=QgsProcessingParameterNumber.Integer,
+                optional=True,
+                minValue=1,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.EXTENT_BUFFER,
+                description="Search distance around the gates (m)",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=DEFAULT_EXTENT_BUFFER,
+                minValue=0,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                name=self.SPLIT_BY_CLASS,
+                description="Split counts by traveler class",
+                defaultValue=False,
+            )
+        )
+
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 name=self.OUTPUT_GATES,
@@ -111,123 +165,264 @@ class CountTrajectoriesGate(QgsProcessingAlgorithm):
             )
         )
 
-    def processAlgorithm(  # noqa N802
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                name=self.OUTPUT_CROSSINGS,
+                description="Crossings - Gates",
+                type=QgsProcessing.TypeVectorPoint,
+                optional=True,
+                createByDefault=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                name=self.OUTPUT_OD_MATRIX,
+                description="OD matrix - Gates",
+                type=QgsProcessing.TypeVector,
+                optional=True,
+                createByDefault=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                name=self.OUTPUT_HEADWAYS,
+                description="Headways - Gates",
+                type=QgsProcessing.TypeVectorLine,
+                optional=True,
+                createByDefault=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                name=self.PROFILE,
+                description="Profile",
+                fileFilter="JSON files (*.json)",
+                optional=True,
+                createByDefault=False,
+            )
+        )
+
+    def prepareAlgorithm(  # noqa N802
         self,
         parameters: dict[str, Any],
         context: QgsProcessingContext,
         feedback: QgsProcessingFeedback,
-    ) -> dict:
+    ) -> bool:
         """
-        Here is where the processing itself takes place.
+        Reads the input layers on the main thread, so that only
+        copies of them are used when run in a background task.
         """
 
         # Initialize feedback if it is None
         if feedback is None:
             feedback = QgsProcessingFeedback()
 
+        # the allocations are only traced when a profile is written
+        profile_path: str = self.parameterAsFileOutput(parameters, self.PROFILE, context)
+        self.profiler = Profiler(trace_memory=bool(profile_path))
+
         point_layer = self.parameterAsVectorLayer(parameters, self.INPUT_POINTS, context)
         traveler_class: str | None = self.parameterAsString(parameters, self.TRAVELER_CLASS, context)
         start_time: QDateTime = self.parameterAsDateTime(parameters, self.START_TIME, context)
         end_time: QDateTime = self.parameterAsDateTime(parameters, self.END_TIME, context)
+        extent_buffer: float = self.parameterAsDouble(parameters, self.EXTENT_BUFFER, context)
 
         # create gate layer already, so we check that it's valid
         line_layer = self.parameterAsVectorLayer(parameters, self.INPUT_LINES, context)
         feedback.pushInfo(f"Line layer has {line_layer.featureCount()} features.")
-        gate_layer = GateLayer(line_layer, "name", "counts_negative", "counts_positive")
+        self.gate_layer = GateLayer(line_layer, "name", "counts_negative", "counts_positive")
 
         # the datetime widget doesn't allow the user to set the seconds and they
         # are being set seemingly randomly leading to odd results...
         # so set 0 seconds manually
         ProcessingUtils.normalize_datetimes(start_time, end_time)
 
-        ## CREATE TRAJECTORIES
-
-        total_features: int = point_layer.featureCount()
-        feedback.pushInfo(f"Original point layer has {total_features} features.")
+        # only the trajectories passing near the gates are read
+        extent: QgsRectangle = ProcessingUtils.get_extent([line_layer], point_layer.crs(), extent_buffer)
 
-        # Get min and max timestamps from the data
-        min_timestamp, max_timestamp = ProcessingUtils.get_min_and_max_timestamps(point_layer, "timestamp")
-        start_time_unix, end_time_unix = ProcessingUtils.get_start_and_end_timestamps(
-            start_time, end_time, min_timestamp, max_timestamp
+        self.points = ProcessingUtils.read_points(
+            point_layer, traveler_class, start_time, end_time, extent, feedback, self.profiler
         )
 
-        filter_expression: str | None = ProcessingUtils.get_filter_expression_time_and_class(
-            start_time_unix,
-            end_time_unix,
-            traveler_class,
-            min_timestamp,
-            max_timestamp,
-        )
+        return not feedback.isCanceled()
 
-        req = QgsFeatureRequest()
-        if filter_expression:
-            req.setFilterExpression(filter_expression)
+    def processAlgorithm(  # noqa N802
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict:
+        """
+        Here is where the processing itself takes place.
+        """
 
-        filtered_layer = point_layer.materialize(req)
+        # Initialize feedback if it is None
+        if feedback is None:
+            feedback = QgsProcessingFeedback()
 
-        total_filtered_points: int = filtered_layer.featureCount()
-        feedback.pushInfo(f"Filtered {total_features - total_filtered_points} features out.")
-        feedback.pushInfo(f"Creating trajectories for {total_filtered_points} points out of {total_features}.")
+        profile_path: str = self.parameterAsFileOutput(parameters, self.PROFILE, context)
+        profiler: Profiler = self.profiler
+        gate_layer: GateLayer = self.gate_layer
+        points: PointInput = self.points
 
-        trajectory_layer = TrajectoryLayer(
-            filtered_layer,
-            "id",
-            "timestamp",
-            "size_x",
-            "size_y",
-            "size_z",
-            QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
-        )
+        traveler_class: str | None = self.parameterAsString(parameters, self.TRAVELER_CLASS, context)
+        interval_minutes: int = self.parameterAsInt(parameters, self.INTERVAL, context)
+        split_by_class: bool = self.parameterAsBoolean(parameters, self.SPLIT_BY_CLASS, context)
+        start_time, end_time = points.start_time, points.end_time
 
-        exported_traj_layer = trajectory_layer.as_line_layer()
+        # the counts are split to intervals by the crossing times
+        # so every interval is counted from the same trajectories
+        interval: timedelta | None = timedelta(minutes=interval_minutes) if interval_minutes > 0 else None
 
-        if exported_traj_layer is None:
-            msg = "Trajectory layer is None."
-            raise ValueError(msg)
+        ## CREATE TRAJECTORIES
 
-        (sink, self.traj_dest_id) = self.parameterAsSink(
-            parameters,
-            self.OUTPUT_TRAJECTORIES,
-            context,
-            exported_traj_layer.fields(),
-            exported_traj_layer.wkbType(),
-            exported_traj_layer.sourceCrs(),
+        # the progress is reported per stage: creating the
+        # trajectories, counting and writing the outputs
+        steps = QgsProcessingMultiStepFeedback(3, feedback)
+
+        trajectory_layer: TrajectoryLayer | None = ProcessingUtils.create_trajectory_layer(
+            points, feedback=steps, profiler=profiler, split_by_class=split_by_class
         )
 
-        for feature in exported_traj_layer.getFeatures():
-            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+        if feedback.isCanceled():
+            return {}
+
+        # if no points were left, e.g. no trajectory passes near the
+        # gates, the outputs are written with every gate counted as zero
+        trajectories: tuple[Trajectory, ...] = trajectory_layer.trajectories() if trajectory_layer is not None else ()
+
+        with profiler.stage("write trajectories"):
+            (sink, self.traj_dest_id) = self.parameterAsSink(
+                parameters,
+                self.OUTPUT_TRAJECTORIES,
+                context,
+                TrajectoryLayer.line_layer_fields(),
+                QgsWkbTypes.Type.LineString,
+                points.layer.crs(),
+            )
+
+            if trajectory_layer is not None:
+                ProcessingUtils.write_to_sink(sink, trajectory_layer.line_layer_features(), feedback)
 
         # CREATE GATES
-        gates = gate_layer.gates()
 
-        for gate in gates:
-            gate.count_trajectories_from_layer(trajectory_layer)
+        steps.setCurrentStep(1)
 
-        if not start_time:
-            start_time = QDateTime.fromMSecsSinceEpoch(int(min_timestamp))
-        if not end_time:
-            end_time = QDateTime.fromMSecsSinceEpoch(int(max_timestamp))
-        exported_gate_layer = gate_layer.as_line_layer(
-            traveler_class=traveler_class, start_time=start_time, end_time=end_time
-        )
+        with profiler.stage("count gates"):
+            results = gate_layer.count_trajectories(trajectories, steps, profiler)
 
-        if exported_gate_layer is None:
-            msg = "Gate layer is None"
-            raise ValueError(msg)
+        if feedback.isCanceled():
+            return {}
 
-        (sink, self.gate_dest_id) = self.parameterAsSink(
-            parameters,
-            self.OUTPUT_GATES,
-            context,
-            exported_gate_layer.fields(),
-            exported_gate_layer.wkbType(),
-            exported_gate_layer.sourceCrs(),
+        steps.setCurrentStep(2)
+
+        # every class is counted in the same pass, only the
+        # output is split into one feature per class
+        traveler_classes: tuple[str, ...] | None = (
+            trajectory_layer.traveler_classes() if split_by_class and trajectory_layer is not None else None
         )
 
-        for feature in exported_gate_layer.getFeatures():
-            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+        with profiler.stage("write outputs"):
+            (sink, self.gate_dest_id) = self.parameterAsSink(
+                parameters,
+                self.OUTPUT_GATES,
+                context,
+                GateLayer.line_layer_fields(),
+                QgsWkbTypes.Type.LineString,
+                gate_layer.crs(),
+            )
+
+            ProcessingUtils.write_to_sink(
+                sink,
+                gate_layer.line_layer_features(
+                    results,
+                    traveler_class=traveler_class,
+                    start_time=start_time,
+                    end_time=end_time,
+                    interval=interval,
+                    traveler_classes=traveler_classes,
+                ),
+                feedback,
+            )
 
-        return {self.OUTPUT_TRAJECTORIES: self.traj_dest_id, self.OUTPUT_GATES: self.gate_dest_id}
+            outputs = {self.OUTPUT_TRAJECTORIES: self.traj_dest_id, self.OUTPUT_GATES: self.gate_dest_id}
+
+            if profile_path:
+                outputs[self.PROFILE] = profile_path
+
+            # the crossing table is optional, only create it if requested
+            if parameters.get(self.OUTPUT_CROSSINGS):
+                (sink, self.crossing_dest_id) = self.parameterAsSink(
+                    parameters,
+                    self.OUTPUT_CROSSINGS,
+                    context,
+                    GateLayer.crossing_fields(),
+                    QgsWkbTypes.Type.Point,
+                    # the crossing points are interpolated on the trajectories
+                    points.layer.crs(),
+                )
+
+                ProcessingUtils.write_to_sink(
+                    sink, gate_layer.crossing_features(results, traveler_class=traveler_class), feedback
+                )
+
+                outputs[self.OUTPUT_CROSSINGS] = self.crossing_dest_id
+
+            # the od matrix is derived from the same crossings
+            if parameters.get(self.OUTPUT_OD_MATRIX):
+                (sink, self.od_matrix_dest_id) = self.parameterAsSink(
+                    parameters,
+                    self.OUTPUT_OD_MATRIX,
+                    context,
+                    GateLayer.od_matrix_fields(),
+                    QgsWkbTypes.Type.NoGeometry,
+                    QgsCoordinateReferenceSystem(),
+                )
+
+                ProcessingUtils.write_to_sink(
+                    sink,
+                    gate_layer.od_matrix_features(
+                        results,
+                        traveler_class=traveler_class,
+                        start_time=start_time,
+                        end_time=end_time,
+                        interval=interval,
+                    ),
+                    feedback,
+                )
+
+                outputs[self.OUTPUT_OD_MATRIX] = self.od_matrix_dest_id
+
+            if parameters.get(self.OUTPUT_HEADWAYS):
+                (sink, self.headway_dest_id) = self.parameterAsSink(
+                    parameters,
+                    self.OUTPUT_HEADWAYS,
+                    context,
+                    GateLayer.traffic_statistics_fields(),
+                    QgsWkbTypes.Type.LineString,
+                    gate_layer.crs(),
+                )
+
+                ProcessingUtils.write_to_sink(
+                    sink,
+                    gate_layer.traffic_statistics_features(
+                        results,
+                        traveler_class=traveler_class,
+                        start_time=start_time,
+                        end_time=end_time,
+                        interval=interval,
+                    ),
+                    feedback,
+                )
+
+                outputs[self.OUTPUT_HEADWAYS] = self.headway_dest_id
+
+        profiler.report(feedback, profile_path)
+
+        return outputs
 
     def postProcessAlgorithm(self, context: QgsProcessingContext, feedback: QgsProcessingFeedback) -> dict[str, Any]:  # noqa: N802
         if self.gate_dest_id:
@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+
+from qgis.core import (
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingContext,
+    QgsProcessingFeedback,
+    QgsProcessingMultiStepFeedback,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterDateTime,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterString,
+    QgsProcessingParameterVectorLayer,
+    QgsProcessingUtils,
+    QgsRectangle,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QCoreApplication
+
+from fvh3t.core.area_layer import AreaLayer
+from fvh3t.core.gate_layer import GateLayer
+from fvh3t.core.profiler import Profiler
+from fvh3t.core.qgis_layer_utils import QgisLayerUtils
+from fvh3t.core.trajectory_layer import TrajectoryLayer
+from fvh3t.fvh3t_processing.utils import DEFAULT_EXTENT_BUFFER, PointInput, ProcessingUtils
+
+if TYPE_CHECKING:
+    from qgis.PyQt.QtCore import QDateTime
+
+    from fvh3t.core.trajectory import Trajectory
+
+
+class CountTrajectoriesGateArea(QgsProcessingAlgorithm):
+    """
+    Counts both gates and areas from the same trajectories. The
+    points are filtered and assigned to the areas only once, and
+    the trajectories split by area are created in the same pass as
+    the whole trajectories the gates are counted from.
+    """
+
+    INPUT_POINTS = "INPUT_POINTS"
+    INPUT_LINES = "INPUT_LINES"
+    INPUT_AREAS = "INPUT_AREAS"
+    TRAVELER_CLASS = "TRAVELER_CLASS"
+    START_TIME = "START_TIME"
+    END_TIME = "END_TIME"
+    INTERVAL = "INTERVAL"
+    SPLIT_BY_CLASS = "SPLIT_BY_CLASS"
+    EXTENT_BUFFER = "EXTENT_BUFFER"
+    PROFILE = "PROFILE"
+    OUTPUT_GATES = "OUTPUT_GATES"
+    OUTPUT_AREAS = "OUTPUT_AREAS"
+    OUTPUT_TRAJECTORIES = "OUTPUT_TRAJECTORIES"
+
+    gate_dest_id: str | None = None
+    area_dest_id: str | None = None
+    traj_dest_id: str | None = None
+
+    # the inputs read in prepareAlgorithm
+    profiler: Profiler | None = None
+    gate_layer: GateLayer | None = None
+    area_layer: AreaLayer | None = None
+    points: PointInput | None = None
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self._name = "count_trajectories_gate_area"
+        self._display_name = "Count trajectories (gates and areas)"
+
+    def tr(self, string) -> str:
+        return QCoreApplication.translate("Processing", string)
+
+    def createInstance(self):  # noqa N802
+        return CountTrajectoriesGateArea()
+
+    def name(self) -> str:
+        return self._name
+
+    def displayName(self) -> str:  # noqa N802
+        return self.tr(self._display_name)
+
+    def initAlgorithm(self, config=None):  # noqa N802
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                name=self.INPUT_POINTS,
+                description="Input point layer",
+                types=[QgsProcessing.TypeVectorPoint],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                name=self.INPUT_LINES,
+                description="Gates",
+                types=[QgsProcessing.TypeVectorLine],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                name=self.INPUT_AREAS,
+                description="Areas",
+                types=[QgsProcessing.TypeVectorPolygon],
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                name=self.TRAVELER_CLASS,
+                description="Class of traveler",
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterDateTime(
+                name=self.START_TIME,
+                description="Start time",
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterDateTime(
+                name=self.END_TIME,
+                description="End time",
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.INTERVAL,
+                description="Interval length for gate counts (minutes)",
+                type=QgsProcessingParameterNumber.Integer,
+                optional=True,
+                minValue=1,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.EXTENT_BUFFER,
+                description="Search distance around the gates (m)",
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=DEFAULT_EXTENT_BUFFER,
+                minValue=0,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                name=self.SPLIT_BY_CLASS,
+                description="Split counts by traveler class",
+                defaultValue=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                name=self.OUTPUT_GATES,
+                description="Gates",
+                type=QgsProcessing.TypeVectorLine,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                name=self.OUTPUT_AREAS,
+                description="Areas",
+                type=QgsProcessing.TypeVectorPolygon,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                name=self.OUTPUT_TRAJECTORIES,
+                description="Trajectories",
+                type=QgsProcessing.TypeVectorLine,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                name=self.PROFILE,
+                description="Profile",
+                fileFilter="JSON files (*.json)",
+                optional=True,
+                createByDefault=False,
+            )
+        )
+
+    def prepareAlgorithm(  # noqa N802
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> bool:
+        """
+        Reads the input layers on the main thread, so that only
+        copies of them are used when run in a background task.
+        """
+
+        # Initialize feedback if it is None
+        if feedback is None:
+            feedback = QgsProcessingFeedback()
+
+        # the allocations are only traced when a profile is written
+        profile_path: str = self.parameterAsFileOutput(parameters, self.PROFILE, context)
+        self.profiler = Profiler(trace_memory=bool(profile_path))
+
+        point_layer = self.parameterAsVectorLayer(parameters, self.INPUT_POINTS, context)
+        traveler_class: str | None = self.parameterAsString(parameters, self.TRAVELER_CLASS, context)
+        start_time: QDateTime = self.parameterAsDateTime(parameters, self.START_TIME, context)
+        end_time: QDateTime = self.parameterAsDateTime(parameters, self.END_TIME, context)
+        extent_buffer: float = self.parameterAsDouble(parameters, self.EXTENT_BUFFER, context)
+
+        # create gate and area layers already, so we check that they're valid
+        line_layer = self.parameterAsVectorLayer(parameters, self.INPUT_LINES, context)
+        feedback.pushInfo(f"Line layer has {line_layer.featureCount()} features.")
+        self.gate_layer = GateLayer(line_layer, "name", "counts_negative", "counts_positive")
+
+        area_vector_layer = self.parameterAsVectorLayer(parameters, self.INPUT_AREAS, context)
+        feedback.pushInfo(f"Area layer has {area_vector_layer.featureCount()} features.")
+        self.area_layer = AreaLayer(area_vector_layer, "fid", "name")
+
+        # the datetime widget doesn't allow the user to set the seconds and they
+        # are being set seemingly randomly leading to odd results...
+        # so set 0 seconds manually
+        ProcessingUtils.normalize_datetimes(start_time, end_time)
+
+        # only the trajectories passing near the gates or through
+        # the areas are read, the areas need no search distance
+        # since only the points inside of them are counted
+        extent: QgsRectangle = ProcessingUtils.get_extent([line_layer], point_layer.crs(), extent_buffer)
+        extent.combineExtentWith(ProcessingUtils.get_extent([area_vector_layer], point_layer.crs()))
+
+        self.points = ProcessingUtils.read_points(
+            point_layer, traveler_class, start_time, end_time, extent, feedback, self.profiler
+        )
+
+        return not feedback.isCanceled()
+
+    def processAlgorithm(  # noqa N802
+        self,
+        parameters: dict[str, Any],
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> dict:
+        """
+        Here is where the processing itself takes place.
+        """
+
+        # Initialize feedback if it is None
+        if feedback is None:
+            feedback = QgsProcessingFeedback()
+
+        profile_path: str = self.parameterAsFileOutput(parameters, self.PROFILE, context)
+        profiler: Profiler = self.profiler
+        gate_layer: GateLayer = self.gate_layer
+        area_layer: AreaLayer = self.area_layer
+        points: PointInput = self.points
+
+        traveler_class: str | None = self.parameterAsString(parameters, self.TRAVELER_CLASS, context)
+        interval_minutes: int = self.parameterAsInt(parameters, self.INTERVAL, context)
+        split_by_class: bool = self.parameterAsBoolean(parameters, self.SPLIT_BY_CLASS, context)
+        start_time, end_time = points.start_time, points.end_time
+
+        interval: timedelta | None = timedelta(minutes=interval_minutes) if interval_minutes > 0 else None
+
+        ## CREATE TRAJECTORIES
+
+        # the progress is reported per stage: creating the
+        # trajectories, counting the gates and the areas
+        steps = QgsProcessingMultiStepFeedback(3, feedback)
+
+        # the points are assigned to the areas while reading them, the
+        # gates are counted from the whole trajectories and the areas
+        # from the trajectories split by area
+        trajectory_layer: TrajectoryLayer | None = ProcessingUtils.create_trajectory_layer(
+            points,
+            area_layer,
+            steps,
+            profiler,
+            split_by_class=split_by_class,
+            keep_whole_trajectories=True,
+        )
+
+        if feedback.isCanceled():
+            return {}
+
+        # if no points were left, e.g. no trajectory passes near the
+        # gates or through the areas, the outputs are written with
+        # every gate and area counted as zero
+        whole_trajectories: tuple[Trajectory, ...] = ()
+        area_trajectories: tuple[Trajectory, ...] = ()
+        traveler_classes: tuple[str, ...] | None = None
+
+        if trajectory_layer is not None:
+            whole_trajectories = trajectory_layer.whole_trajectories()
+            area_trajectories = trajectory_layer.trajectories()
+            traveler_classes = trajectory_layer.traveler_classes() if split_by_class else None
+
+        with profiler.stage("write trajectories"):
+            (sink, self.traj_dest_id) = self.parameterAsSink(
+                parameters,
+                self.OUTPUT_TRAJECTORIES,
+                context,
+                TrajectoryLayer.line_layer_fields(),
+                QgsWkbTypes.Type.LineString,
+                points.layer.crs(),
+            )
+
+            if trajectory_layer is not None:
+                ProcessingUtils.write_to_sink(sink, trajectory_layer.line_layer_features(whole_trajectories), feedback)
+
+        # COUNT GATES
+
+        steps.setCurrentStep(1)
+
+        with profiler.stage("count gates"):
+            gate_results = gate_layer.count_trajectories(whole_trajectories, steps, profiler)
+
+        if feedback.isCanceled():
+            return {}
+
+        with profiler.stage("write gates"):
+            (sink, self.gate_dest_id) = self.parameterAsSink(
+                parameters,
+                self.OUTPUT_GATES,
+                context,
+                GateLayer.line_layer_fields(),
+                QgsWkbTypes.Type.LineString,
+                gate_layer.crs(),
+            )
+
+            ProcessingUtils.write_to_sink(
+                sink,
+                gate_layer.line_layer_features(
+                    gate_results,
+                    traveler_class=traveler_class,
+                    start_time=start_time,
+                    end_time=end_time,
+                    interval=interval,
+                    traveler_classes=traveler_classes,
+                ),
+                feedback,
+            )
+
+        # COUNT AREAS
+
+        steps.setCurrentStep(2)
+
+        with profiler.stage("count areas"):
+            area_results = area_layer.count_trajectories(
+                area_trajectories, split_by_class=split_by_class, feedback=steps, profiler=profiler
+            )
+
+        if feedback.isCanceled():
+            return {}
+
+        with profiler.stage("write areas"):
+            (sink, self.area_dest_id) = self.parameterAsSink(
+                parameters,
+                self.OUTPUT_AREAS,
+                context,
+                AreaLayer.polygon_layer_fields(),
+                QgsWkbTypes.Type.Polygon,
+                area_layer.crs(),
+            )
+
+            ProcessingUtils.write_to_sink(
+                sink,
+                area_layer.polygon_layer_features(
+                    area_results,
+                    traveler_class=traveler_class,
+                    start_time=start_time,
+                    end_time=end_time,
+                    traveler_classes=traveler_classes,
+                ),
+                feedback,
+            )
+
+        outputs = {
+            self.OUTPUT_TRAJECTORIES: self.traj_dest_id,
+            self.OUTPUT_GATES: self.gate_dest_id,
+            self.OUTPUT_AREAS: self.area_dest_id,
+        }
+
+        if profile_path:
+            outputs[self.PROFILE] = profile_path
+
+        profiler.report(feedback, profile_path)
+
+        return outputs
+
+    def postProcessAlgorithm(self, context: QgsProcessingContext, feedback: QgsProcessingFeedback) -> dict[str, Any]:  # noqa: N802
+        if self.gate_dest_id:
+            layer = QgsProcessingUtils.mapLayerFromString(self.gate_dest_id, context)
+            QgisLayerUtils.set_gate_style(layer)
+
+        if self.area_dest_id:
+            layer = QgsProcessingUtils.mapLayerFromString(self.area_dest_id, context)
+            QgisLayerUtils.set_area_style(layer)
+
+        return super().postProcessAlgorithm(context, feedback)
@@ -79,7 +79,7 @@ class ExportToJSON(QgsProcessingAlgorithm):
 
             for field_name, field_value in zip(gate_layer.fields().names(), feature.attributes()):
                 if field_name not in fields_to_exclude:
-                    if field_name in ("vehicle_count_negative", "vehicle_count_positive"):
+                    if field_name in ("vehicle_count_negative", "vehicle_count_positive", "recrossing_count"):
                         continue
 
                     if field_name == "name":
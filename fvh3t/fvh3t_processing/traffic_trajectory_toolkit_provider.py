@@ -2,6 +2,7 @@ from qgis.core import QgsProcessingProvider
 
 from fvh3t.fvh3t_processing.count_trajectories_area import CountTrajectoriesArea
 from fvh3t.fvh3t_processing.count_trajectories_gate import CountTrajectoriesGate
+from fvh3t.fvh3t_processing.count_trajectories_gate_area import CountTrajectoriesGateArea
 from fvh3t.fvh3t_processing.export_to_json import ExportToJSON
 
 
@@ -44,4 +45,5 @@ class TTTProvider(QgsProcessingProvider):
         """
         self.addAlgorithm(CountTrajectoriesGate())
         self.addAlgorithm(CountTrajectoriesArea())
+        self.addAlgorithm(CountTrajectoriesGateArea())
         self.addAlgorithm(ExportToJSON())
@@ -1,13 +1,99 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, NamedTuple
+
+from qgis.core import (
+    QgsCoordinateTransform,
+    QgsExpression,
+    QgsFeatureRequest,
+    QgsFeatureSink,
+    QgsProcessingFeedback,
+    QgsProcessingMultiStepFeedback,
+    QgsProject,
+    QgsRectangle,
+    QgsUnitTypes,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QDateTime
+
+from fvh3t.core.layer_statistics import LAYER_STATISTICS
+from fvh3t.core.profiler import Profiler
+from fvh3t.core.progress import ProgressReporter
+from fvh3t.core.qgis_layer_utils import QgisLayerUtils
+from fvh3t.core.trajectory_layer import TrajectoryLayer
 
 if TYPE_CHECKING:
-    from qgis.core import QgsVectorLayer
-    from qgis.PyQt.QtCore import QDateTime
+    from qgis.core import (
+        QgsCoordinateReferenceSystem,
+        QgsFeature,
+        QgsFeedback,
+        QgsVectorLayer,
+    )
+
+    from fvh3t.core.area_layer import AreaLayer
+    from fvh3t.core.layer_statistics import LayerStatistics
+
+# how many features are added to a sink at once
+SINK_BATCH_SIZE = 1000
+
+# how far around the gates the points are read by default, in
+# metres, so that the trajectories crossing the gates have
+# points in the extent
+DEFAULT_EXTENT_BUFFER = 100.0
+
+
+class PointFilter(NamedTuple):
+    """
+    The filter the points are read with and the time range of
+    the counts, which is the range of the points if not given.
+    """
+
+    expression: str | None
+    start_time: QDateTime
+    end_time: QDateTime
+
+
+class PointInput(NamedTuple):
+    """
+    The filtered points of a counting run copied to a memory
+    layer, and the time range of the counts.
+    """
+
+    layer: QgsVectorLayer
+    total_features: int
+    start_time: QDateTime
+    end_time: QDateTime
 
 
 class ProcessingUtils:
+    @staticmethod
+    def write_to_sink(
+        sink: QgsFeatureSink,
+        features: Iterable[QgsFeature],
+        feedback: QgsFeedback | None = None,
+        batch_size: int = SINK_BATCH_SIZE,
+    ) -> None:
+        """
+        Write the features to the sink in batches as they are
+        generated, without collecting them to a layer first.
+        Writing stops after the batch during which the feedback
+        is canceled.
+        """
+        batch: list[QgsFeature] = []
+
+        for feature in features:
+            batch.append(feature)
+
+            if len(batch) >= batch_size:
+                sink.addFeatures(batch, QgsFeatureSink.FastInsert)
+                batch = []
+
+                if feedback is not None and feedback.isCanceled():
+                    return
+
+        if batch:
+            sink.addFeatures(batch, QgsFeatureSink.FastInsert)
+
     @staticmethod
     def get_start_and_end_timestamps(
         start_time: QDateTime,
@@ -31,10 +117,18 @@ class ProcessingUtils:
 
         return start_time_unix, end_time_unix
 
+    @staticmethod
+    def get_point_layer_statistics(layer: QgsVectorLayer, timestamp_field: str = "timestamp") -> LayerStatistics:
+        """
+        Returns the statistics of the input point layer, which are
+        only read again if the layer has changed since the last run.
+        """
+        return LAYER_STATISTICS.statistics(layer, "id", timestamp_field, "label")
+
     @staticmethod
     def get_min_and_max_timestamps(layer: QgsVectorLayer, timestamp_field: str) -> tuple[int, int]:
-        field_id = layer.fields().indexOf(timestamp_field)
-        min_timestamp, max_timestamp = layer.minimumAndMaximumValue(field_id)
+        statistics: LayerStatistics = ProcessingUtils.get_point_layer_statistics(layer, timestamp_field)
+        min_timestamp, max_timestamp = statistics.min_timestamp, statistics.max_timestamp
 
         if min_timestamp is None or max_timestamp is None:
             msg = "No valid timestamps found in the point layer."
@@ -54,6 +148,48 @@ class ProcessingUtils:
             zero_s_time.setHMS(zero_s_time.hour(), zero_s_time.minute(), 0)
             date_time.setTime(zero_s_time)
 
+    @staticmethod
+    def get_point_filter(
+        point_layer: QgsVectorLayer,
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        feedback: QgsProcessingFeedback | None = None,
+    ) -> PointFilter:
+        """
+        Returns the time and class filter of the points and the
+        time range of the counts. The statistics of the point
+        layer are reported to the feedback.
+        """
+        statistics: LayerStatistics = ProcessingUtils.get_point_layer_statistics(point_layer)
+
+        if feedback is not None:
+            feedback.pushInfo(
+                f"Original point layer has {statistics.feature_count} features of {statistics.id_count} travelers."
+            )
+
+            if traveler_class and traveler_class not in statistics.class_values:
+                feedback.pushInfo(f'No points of class "{traveler_class}" in the point layer.')
+
+        min_timestamp, max_timestamp = ProcessingUtils.get_min_and_max_timestamps(point_layer, "timestamp")
+        start_time_unix, end_time_unix = ProcessingUtils.get_start_and_end_timestamps(
+            start_time, end_time, min_timestamp, max_timestamp
+        )
+
+        expression: str | None = ProcessingUtils.get_filter_expression_time_and_class(
+            start_time_unix,
+            end_time_unix,
+            traveler_class,
+            min_timestamp,
+            max_timestamp,
+        )
+
+        return PointFilter(
+            expression,
+            start_time if start_time.isValid() else QDateTime.fromMSecsSinceEpoch(int(min_timestamp)),
+            end_time if end_time.isValid() else QDateTime.fromMSecsSinceEpoch(int(max_timestamp)),
+        )
+
     @staticmethod
     def get_filter_expression_time_and_class(
         start_timestamp: int,
@@ -67,13 +203,230 @@ class ProcessingUtils:
         time stamps and traveler class, which can be passed
         to TrajectoryLayer.
         """
-        filter_expression: str | None = None
+        # only plain comparisons are used so that the providers
+        # can compile the expression to their own queries
+        filters: list[str] = []
         if start_timestamp != min_timestamp or end_timestamp != max_timestamp:
-            filter_expression = f'"timestamp" BETWEEN {start_timestamp} AND {end_timestamp}'
-        if not filter_expression:
-            if traveler_class:
-                filter_expression = f"\"label\" = '{traveler_class}'"
-        elif traveler_class:
-            filter_expression += f" AND \"label\" = '{traveler_class}'"
-
-        return filter_expression
+            filters.append(f'"timestamp" >= {start_timestamp} AND "timestamp" <= {end_timestamp}')
+        if traveler_class:
+            filters.append(f'"label" = {QgsExpression.quotedValue(traveler_class)}')
+
+        return " AND ".join(filters) or None
+
+    @staticmethod
+    def get_extent(
+        layers: Iterable[QgsVectorLayer], crs: QgsCoordinateReferenceSystem, buffer: float = 0
+    ) -> QgsRectangle:
+        """
+        Returns the combined extent of the layers in the given crs,
+        grown by the buffer given in metres. The buffer is converted
+        to the units of the crs, which is approximate for degrees.
+        """
+        extent = QgsRectangle()
+        extent.setMinimal()
+
+        for layer in layers:
+            layer_extent: QgsRectangle = layer.extent()
+
+            if layer_extent.isNull():
+                continue
+
+            if layer.crs() != crs:
+                layer_extent = QgsCoordinateTransform(layer.crs(), crs, QgsProject.instance()).transformBoundingBox(
+                    layer_extent
+                )
+
+            extent.combineExtentWith(layer_extent)
+
+        if not extent.isEmpty() and buffer > 0:
+            extent.grow(
+                buffer * QgsUnitTypes.fromUnitToUnitFactor(QgsUnitTypes.DistanceUnit.DistanceMeters, crs.mapUnits())
+            )
+
+        return extent
+
+    @staticmethod
+    def get_point_request(filter_expression: str | None, id_field: str = "id") -> QgsFeatureRequest:
+        """
+        Constructs the request reading the points of the trajectories.
+        The time and class filter is passed on to the provider.
+        """
+        # trajectories without an id are never created, the
+        # condition is compiled by the provider so null ids
+        # are not read at all
+        not_null: str = f"{QgsExpression.quotedColumnRef(id_field)} IS NOT NULL"
+
+        return QgsFeatureRequest().setFilterExpression(
+            f"({filter_expression}) AND {not_null}" if filter_expression else not_null
+        )
+
+    @staticmethod
+    def materialize_points(
+        point_layer: QgsVectorLayer,
+        filter_expression: str | None,
+        extent: QgsRectangle | None = None,
+        feedback: QgsFeedback | None = None,
+        id_field: str = "id",
+    ) -> QgsVectorLayer:
+        """
+        Reads the filtered points to a memory layer. If an extent is
+        given, only the trajectories with a point in the extent are
+        read, but with all of their points, so they are not cut at
+        the edge of the extent. The ids of those trajectories are
+        read first with the spatial index of the provider, and their
+        points are then picked in a single pass over the points. If
+        the feedback is canceled, the points read so far are kept.
+        """
+        req: QgsFeatureRequest = ProcessingUtils.get_point_request(filter_expression, id_field)
+        traj_ids: set[Any] | None = None
+
+        if extent is not None:
+            extent_req = QgsFeatureRequest(req)
+            extent_req.setFilterRect(extent)
+            extent_req.setSubsetOfAttributes([id_field], point_layer.fields())
+
+            traj_ids = {feature[id_field] for feature in point_layer.getFeatures(extent_req)}
+
+        # the filtered feature count is not known beforehand,
+        # so the progress is measured against the whole layer
+        progress = ProgressReporter(feedback, point_layer.featureCount())
+
+        def points() -> Iterator[QgsFeature]:
+            # no trajectory passes the extent, so nothing is read
+            if traj_ids is not None and not traj_ids:
+                return
+
+            for feature in point_layer.getFeatures(req):
+                if progress.is_canceled():
+                    return
+
+                progress.advance()
+
+                # the ids are looked up from the set instead of an IN
+                # expression, which most providers evaluate by going
+                # through the whole list for every point
+                if traj_ids is None or feature[id_field] in traj_ids:
+                    yield feature
+
+        return QgisLayerUtils.create_memory_layer(
+            QgsWkbTypes.displayString(point_layer.wkbType()),
+            point_layer.name(),
+            point_layer.crs(),
+            point_layer.fields(),
+            points(),
+        )
+
+    @staticmethod
+    def read_points(
+        point_layer: QgsVectorLayer,
+        traveler_class: str | None,
+        start_time: QDateTime,
+        end_time: QDateTime,
+        extent: QgsRectangle | None = None,
+        feedback: QgsProcessingFeedback | None = None,
+        profiler: Profiler | None = None,
+    ) -> PointInput:
+        """
+        Reads the points filtered by the time range, the traveler
+        class and the extent to a memory layer. The algorithms read
+        the points in prepareAlgorithm, which is run on the main
+        thread, so a background task never reads the layers of the
+        project.
+        """
+        if profiler is None:
+            profiler = Profiler()
+
+        # the statistics are cached between the runs until the layer changes
+        with profiler.stage("read statistics"):
+            filter_expression, start_time, end_time = ProcessingUtils.get_point_filter(
+                point_layer, traveler_class, start_time, end_time, feedback
+            )
+
+        with profiler.stage("materialize"):
+            layer: QgsVectorLayer = ProcessingUtils.materialize_points(point_layer, filter_expression, extent, feedback)
+
+        return PointInput(
+            layer, ProcessingUtils.get_point_layer_statistics(point_layer).feature_count, start_time, end_time
+        )
+
+    @staticmethod
+    def create_trajectory_layer(
+        points: PointInput,
+        area_layer: AreaLayer | None = None,
+        feedback: QgsProcessingFeedback | None = None,
+        profiler: Profiler | None = None,
+        *,
+        split_by_class: bool = False,
+        keep_whole_trajectories: bool = False,
+    ) -> TrajectoryLayer | None:
+        """
+        Creates the trajectories of the counting algorithms from the
+        points read with read_points. If an area layer is given, the
+        points are assigned to the areas in a single pass and the
+        trajectories are split by area, see TrajectoryLayer's
+        point_groups. Returns None if no points are left after
+        filtering, or if the feedback is canceled.
+        """
+        if feedback is None:
+            feedback = QgsProcessingFeedback()
+        if profiler is None:
+            profiler = Profiler()
+
+        filtered_layer: QgsVectorLayer = points.layer
+        total_features: int = points.total_features
+        total_filtered_points: int = filtered_layer.featureCount()
+        profiler.count("points read", total_filtered_points)
+
+        # e.g. no trajectory passes near the gates, which
+        # the algorithms count as zero for every gate
+        if total_filtered_points == 0:
+            profiler.count("points filtered out", total_features)
+            feedback.pushInfo(f"Filtered all {total_features} features out.")
+            return None
+
+        # the progress is reported per stage: finding the
+        # areas of the points and creating the trajectories
+        steps = QgsProcessingMultiStepFeedback(2 if area_layer is not None else 1, feedback)
+
+        point_groups: dict[int, Any] | None = None
+
+        if area_layer is not None:
+            # the points are grouped by id AND the area they're
+            # in, the points outside of all areas have no group
+            with profiler.stage("find areas"):
+                point_groups = area_layer.point_groups(filtered_layer, steps, profiler)
+
+            if feedback.isCanceled():
+                return None
+
+            if not keep_whole_trajectories:
+                total_filtered_points = len(point_groups)
+
+        profiler.count("points filtered out", total_features - total_filtered_points)
+        feedback.pushInfo(f"Filtered {total_features - total_filtered_points} features out.")
+        feedback.pushInfo(f"Creating trajectories for {total_filtered_points} points out of {total_features}.")
+
+        steps.setCurrentStep(1 if area_layer is not None else 0)
+
+        with profiler.stage("build trajectories"):
+            trajectory_layer = TrajectoryLayer(
+                filtered_layer,
+                "id",
+                "timestamp",
+                "size_x",
+                "size_y",
+                "size_z",
+                QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
+                class_field="label" if split_by_class else None,
+                point_groups=point_groups,
+                feedback=steps,
+                profiler=profiler,
+                keep_whole_trajectories=keep_whole_trajectories,
+            )
+
+        if feedback.isCanceled():
+            return None
+
+        profiler.count("trajectories built", len(trajectory_layer.trajectories()))
+
+        return trajectory_layer
@@ -1,14 +1,15 @@
 from __future__ import annotations
 
-from typing import Callable
+from typing import Any, Callable
 
-from qgis.core import QgsApplication, QgsProject, QgsVectorLayer
+from qgis.core import QgsApplication, QgsMapLayer, QgsProject, QgsVectorLayer, QgsWkbTypes
 from qgis.PyQt.QtCore import QCoreApplication, QTranslator
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction, QWidget
 from qgis.utils import iface
 
 from fvh3t.core.qgis_layer_utils import QgisLayerUtils
+from fvh3t.count_trajectories_task import CountTrajectoriesTask
 from fvh3t.fvh3t_processing.traffic_trajectory_toolkit_provider import TTTProvider
 from fvh3t.qgis_plugin_tools.tools.custom_logging import setup_logger, teardown_logger
 from fvh3t.qgis_plugin_tools.tools.i18n import setup_translation, tr
@@ -36,6 +37,10 @@ class Plugin:
         self.actions: list[QAction] = []
         self.menu = Plugin.name
 
+        # python references to the running tasks, the task
+        # manager only owns the underlying C++ objects
+        self.tasks: list[CountTrajectoriesTask] = []
+
     def add_action(
         self,
         icon_path: str,
@@ -124,6 +129,25 @@ class Plugin:
             parent=iface.mainWindow(),
             add_to_toolbar=True,
         )
+
+        self.add_action(
+            "",
+            text=tr("Count trajectories (gates) in background"),
+            callback=self.count_gates_in_background,
+            parent=iface.mainWindow(),
+            add_to_toolbar=False,
+            status_tip=tr("Count the selected point layer through the selected gate layer"),
+        )
+
+        self.add_action(
+            "",
+            text=tr("Count trajectories (areas) in background"),
+            callback=self.count_areas_in_background,
+            parent=iface.mainWindow(),
+            add_to_toolbar=False,
+            status_tip=tr("Count the selected point layer in the selected area layer"),
+        )
+
         self.initProcessing()
 
     def onClosePlugin(self) -> None:  # noqa N802
@@ -146,3 +170,62 @@ class Plugin:
         layer: QgsVectorLayer = QgisLayerUtils.create_area_layer(QgsProject.instance().crs())
 
         QgsProject.instance().addMapLayer(layer)
+
+    def count_gates_in_background(self) -> None:
+        self.count_selected_layers_in_background(
+            "traffic_trajectory_toolkit:count_trajectories_gate",
+            "INPUT_LINES",
+            QgsWkbTypes.GeometryType.LineGeometry,
+        )
+
+    def count_areas_in_background(self) -> None:
+        self.count_selected_layers_in_background(
+            "traffic_trajectory_toolkit:count_trajectories_area",
+            "INPUT_AREAS",
+            QgsWkbTypes.GeometryType.PolygonGeometry,
+        )
+
+    def count_selected_layers_in_background(
+        self, algorithm_id: str, counter_parameter: str, counter_geometry_type: QgsWkbTypes.GeometryType
+    ) -> None:
+        """
+        Count the point layer selected in the layer tree through the
+        selected gate or area layer without filters.
+        """
+        layers: list[QgsMapLayer] = iface.layerTreeView().selectedLayers()
+
+        def selected_layer(geometry_type: QgsWkbTypes.GeometryType) -> QgsVectorLayer | None:
+            return next(
+                (
+                    layer
+                    for layer in layers
+                    if isinstance(layer, QgsVectorLayer) and layer.geometryType() == geometry_type
+                ),
+                None,
+            )
+
+        point_layer: QgsVectorLayer | None = selected_layer(QgsWkbTypes.GeometryType.PointGeometry)
+        counter_layer: QgsVectorLayer | None = selected_layer(counter_geometry_type)
+
+        if point_layer is None or counter_layer is None:
+            iface.messageBar().pushWarning(
+                Plugin.name, tr("Select a point layer and a layer to count it through in the layer tree.")
+            )
+            return
+
+        self.run_in_background(algorithm_id, {"INPUT_POINTS": point_layer, counter_parameter: counter_layer})
+
+    def run_in_background(self, algorithm_id: str, parameters: dict[str, Any]) -> CountTrajectoriesTask:
+        """
+        Run a counting algorithm as a task on the task manager. The
+        outputs are added to the project when the task has finished.
+        """
+        task = CountTrajectoriesTask(algorithm_id, parameters)
+
+        self.tasks.append(task)
+        task.taskCompleted.connect(lambda: self.tasks.remove(task))
+        task.taskTerminated.connect(lambda: self.tasks.remove(task))
+
+        QgsApplication.taskManager().addTask(task)
+
+        return task
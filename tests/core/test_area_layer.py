@@ -1,4 +1,10 @@
+import pytest
+from qgis.core import QgsFeature, QgsGeometry, QgsPointXY, QgsVectorLayer
+
+from fvh3t.core.area import Area
 from fvh3t.core.area_layer import AreaLayer
+from fvh3t.core.exceptions import InvalidTrajectoryException
+from fvh3t.core.trajectory import Trajectory, TrajectoryNode
 
 
 def test_area_layer_create_areas(qgis_area_polygon_layer):
@@ -17,3 +23,149 @@ def test_area_layer_create_areas(qgis_area_polygon_layer):
 
     assert area1.geometry().asWkt() == "Polygon ((1 2, 2 2, 2 2.5, 1 2.5, 1 2))"
     assert area2.geometry().asWkt() == "Polygon ((0 0, 1 0, 1 1, 0 1, 0 0))"
+
+
+def test_area_layer_count_trajectories(qgis_area_polygon_layer, monkeypatch):
+    area_layer = AreaLayer(
+        qgis_area_polygon_layer,
+        "fid",
+        "name",
+    )
+
+    # split by area like the trajectories of grouped points
+    trajectories = (
+        Trajectory(
+            (
+                TrajectoryNode.from_coordinates(0.25, 0.5, 0, 1, 1, 1),
+                TrajectoryNode.from_coordinates(0.75, 0.5, 1000, 1, 1, 1),
+            ),
+            identifier=(1, 2),
+            traveler_class="car",
+        ),
+        Trajectory(
+            (
+                TrajectoryNode.from_coordinates(1.25, 2.25, 3000, 1, 1, 1),
+                TrajectoryNode.from_coordinates(1.75, 2.25, 4000, 1, 1, 1),
+            ),
+            identifier=(1, 1),
+            traveler_class="car",
+        ),
+        Trajectory(
+            (
+                TrajectoryNode.from_coordinates(0.5, 0.25, 0, 1, 1, 1),
+                TrajectoryNode.from_coordinates(0.5, 0.75, 2000, 1, 1, 1),
+            ),
+            identifier=(2, 2),
+            traveler_class="bicycle",
+        ),
+    )
+
+    # the areas are found from the identifiers without
+    # testing the trajectories against the areas
+    def no_geometry_tests(_):
+        raise AssertionError
+
+    monkeypatch.setattr(Area, "geometry_engine", no_geometry_tests)
+
+    results = area_layer.count_trajectories(trajectories)
+
+    assert results.keys() == {(0, None), (1, None)}
+    assert results[(0, None)].trajectory_count == 1
+    assert results[(1, None)].trajectory_count == 2
+    assert results[(1, None)].speed_sum == pytest.approx(
+        trajectories[0].average_speed() + trajectories[2].average_speed()
+    )
+
+    split = area_layer.count_trajectories(trajectories, split_by_class=True)
+
+    assert {key: result.trajectory_count for key, result in split.items()} == {
+        (0, "car"): 1,
+        (1, "car"): 1,
+        (1, "bicycle"): 1,
+    }
+
+
+def test_area_layer_count_trajectories_not_split_by_area(qgis_area_polygon_layer, two_node_trajectory):
+    area_layer = AreaLayer(
+        qgis_area_polygon_layer,
+        "fid",
+        "name",
+    )
+
+    with pytest.raises(InvalidTrajectoryException, match="Trajectories must be split by area to be counted."):
+        area_layer.count_trajectories((two_node_trajectory,))
+
+
+def test_area_layer_point_groups(qgis_area_polygon_layer):
+    area_layer = AreaLayer(
+        qgis_area_polygon_layer,
+        "fid",
+        "name",
+    )
+
+    layer = QgsVectorLayer("Point?crs=EPSG:3857", "Point Layer", "memory")
+
+    layer.startEditing()
+
+    for x, y in [(1.5, 2.25), (0.5, 0.5), (1.5, 0.5)]:
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+        layer.addFeature(feature)
+
+    layer.commitChanges()
+
+    fids = [feature.id() for feature in layer.getFeatures()]
+
+    # the point outside of the areas has no group
+    assert area_layer.point_groups(layer) == {fids[0]: 1, fids[1]: 2}
+
+
+def test_area_layer_assign_points(qgis_area_polygon_layer):
+    area_layer = AreaLayer(
+        qgis_area_polygon_layer,
+        "fid",
+        "name",
+    )
+
+    points = [
+        QgsPointXY(1.5, 2.25),
+        QgsPointXY(0.5, 0.5),
+        QgsPointXY(1.5, 0.5),
+        QgsPointXY(1, 0.5),  # on the edge, not within
+    ]
+
+    assert area_layer.area_ids() == (1, 2)
+    assert area_layer.assign_points(points) == [1, 2, None, None]
+
+
+def test_area_layer_visits(qgis_area_polygon_layer):
+    area_layer = AreaLayer(
+        qgis_area_polygon_layer,
+        "fid",
+        "name",
+    )
+
+    # passes through area2 from left to right, the
+    # nodes hold the areas their points were assigned to
+    trajectory = Trajectory(
+        (
+            TrajectoryNode.from_coordinates(-1, 0.5, 0, 1, 1, 1),
+            TrajectoryNode.from_coordinates(0.5, 0.5, 15000, 1, 1, 1)._replace(group=2),
+            TrajectoryNode.from_coordinates(2, 0.5, 30000, 1, 1, 1),
+        ),
+        identifier=1,
+    )
+
+    visits = area_layer.visits((trajectory,))
+
+    assert len(visits) == 1
+
+    visit = visits[0]
+
+    assert visit.trajectory_id == 1
+    assert visit.area_id == 2
+
+    # interpolated at the boundary
+    assert visit.entry_time.timestamp() == pytest.approx(10)
+    assert visit.exit_time.timestamp() == pytest.approx(20)
+    assert visit.dwell_time().total_seconds() == pytest.approx(10)
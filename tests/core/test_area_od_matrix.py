@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from qgis.PyQt.QtCore import QDateTime
+
+from fvh3t.core.area_od_matrix import AreaOdMatrix
+from fvh3t.core.area_visit import AreaVisit
+from fvh3t.core.gate_od_matrix import OdPair
+from fvh3t.core.time_bins import TimeBins
+
+
+def visit(trajectory_id: int, area_id: int, entry_seconds: int, exit_seconds: int) -> AreaVisit:
+    return AreaVisit(
+        trajectory_id,
+        area_id,
+        datetime.fromtimestamp(entry_seconds, tz=timezone.utc),
+        datetime.fromtimestamp(exit_seconds, tz=timezone.utc),
+        "car",
+    )
+
+
+def test_area_od_matrix():
+    visits = (
+        visit(1, 1, 0, 10),
+        visit(1, 2, 12, 20),
+        visit(1, 3, 25, 40),
+        # not a transition from the last visit of trajectory 1
+        visit(2, 2, 5, 15),
+        visit(2, 3, 50, 55),
+        visit(3, 1, 0, 5),
+    )
+
+    bins = TimeBins(QDateTime.fromSecsSinceEpoch(0), QDateTime.fromSecsSinceEpoch(60), timedelta(seconds=30))
+    matrix = AreaOdMatrix(visits, bins)
+
+    # transitions are binned by the exit time of the origin
+    assert matrix.counts() == {
+        OdPair(1, 2, "car", 0): 1,
+        OdPair(2, 3, "car", 0): 2,
+    }
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from qgis.PyQt.QtCore import QDateTime
+
+from fvh3t.core.area_traffic_statistics import AreaTrafficStatistics
+from fvh3t.core.area_visit import AreaVisit
+from fvh3t.core.time_bins import TimeBins
+
+
+def visit(trajectory_id: int, entry_seconds: int, exit_seconds: int) -> AreaVisit:
+    return AreaVisit(
+        trajectory_id,
+        1,
+        datetime.fromtimestamp(entry_seconds, tz=timezone.utc),
+        datetime.fromtimestamp(exit_seconds, tz=timezone.utc),
+    )
+
+
+def test_area_traffic_statistics():
+    visits = (visit(1, 10, 40), visit(2, 20, 25), visit(3, 50, 70))
+
+    bins = TimeBins(QDateTime.fromSecsSinceEpoch(0), QDateTime.fromSecsSinceEpoch(60), timedelta(seconds=30))
+
+    first, second = AreaTrafficStatistics.from_visits(visits, bins)
+
+    assert first.entry_count == 2
+    assert first.exit_count == 1
+    assert first.dwell_time_avg == 17.5
+    assert first.dwell_time_max == 30.0
+    assert first.occupancy_avg == pytest.approx(25 / 30)
+    assert first.occupancy_max == 2
+
+    # the last visit exits after the bins but
+    # still occupies the area until the end
+    assert second.entry_count == 1
+    assert second.exit_count == 1
+    assert second.dwell_time_median == 20.0
+    assert second.occupancy_avg == pytest.approx(20 / 30)
+    assert second.occupancy_max == 1
@@ -1,6 +1,7 @@
 from qgis.core import QgsGeometry, QgsPointXY, QgsUnitTypes
 
 from fvh3t.core.gate import Gate
+from fvh3t.core.gate_segment import RelativeDirection
 from fvh3t.core.trajectory import Trajectory, TrajectoryNode
 from fvh3t.core.trajectory_layer import TrajectoryLayer
 
@@ -28,25 +29,25 @@ def test_trajectory_count(qgis_point_layer_for_gate_count):
     geom4 = QgsGeometry.fromPolylineXY([QgsPointXY(-1, -0.5), QgsPointXY(1, -0.5)])
     gate4 = Gate(geom4, name="gate4", counts_negative=True, counts_positive=True)
 
-    gate1.count_trajectories_from_layer(traj_layer)
-    assert gate1.trajectory_count() == 1
-    assert gate1.trajectory_count_negative() == 0
-    assert gate1.trajectory_count_positive() == 1
+    gate1_result = gate1.count_trajectories_from_layer(traj_layer)
+    assert gate1_result.trajectory_count == 1
+    assert gate1_result.trajectory_count_negative == 0
+    assert gate1_result.trajectory_count_positive == 1
 
-    gate2.count_trajectories_from_layer(traj_layer)
-    assert gate2.trajectory_count() == 1
-    assert gate2.trajectory_count_negative() == 1
-    assert gate2.trajectory_count_positive() == 0
+    gate2_result = gate2.count_trajectories_from_layer(traj_layer)
+    assert gate2_result.trajectory_count == 1
+    assert gate2_result.trajectory_count_negative == 1
+    assert gate2_result.trajectory_count_positive == 0
 
-    gate3.count_trajectories_from_layer(traj_layer)
-    assert gate3.trajectory_count() == 2
-    assert gate3.trajectory_count_negative() == 1
-    assert gate3.trajectory_count_positive() == 1
+    gate3_result = gate3.count_trajectories_from_layer(traj_layer)
+    assert gate3_result.trajectory_count == 2
+    assert gate3_result.trajectory_count_negative == 1
+    assert gate3_result.trajectory_count_positive == 1
 
-    gate4.count_trajectories_from_layer(traj_layer)
-    assert gate4.trajectory_count() == 0
-    assert gate4.trajectory_count_negative() == 0
-    assert gate4.trajectory_count_positive() == 0
+    gate4_result = gate4.count_trajectories_from_layer(traj_layer)
+    assert gate4_result.trajectory_count == 0
+    assert gate4_result.trajectory_count_negative == 0
+    assert gate4_result.trajectory_count_positive == 0
 
 
 def test_geometry(two_point_gate, three_point_gate):
@@ -102,9 +103,9 @@ def test_trajectory_crosses_topological(two_point_gate):
 
     two_point_gate.set_counts_negative(state=False)
 
-    two_point_gate.count_trajectories([traj1, traj2, traj3, traj4])
+    result = two_point_gate.count_trajectories([traj1, traj2, traj3, traj4])
 
-    assert two_point_gate.trajectory_count() == 2
+    assert result.trajectory_count == 2
 
 
 def test_calculate_two_point_gate_average_speed(two_point_gate):
@@ -121,10 +122,10 @@ def test_calculate_two_point_gate_average_speed(two_point_gate):
         (TrajectoryNode.from_coordinates(0, 0, 0, 0, 0, 0), TrajectoryNode.from_coordinates(0, 1, 200, 0, 0, 0))
     )
 
-    two_point_gate.count_trajectories([traj1, traj2])
+    result = two_point_gate.count_trajectories([traj1, traj2])
 
-    assert two_point_gate.trajectory_count() == 2
-    assert two_point_gate.average_speed() == 27.0
+    assert result.trajectory_count == 2
+    assert result.average_speed() == 27.0
 
 
 def test_calculate_three_point_gate_average_speed(three_point_gate):
@@ -144,10 +145,10 @@ def test_calculate_three_point_gate_average_speed(three_point_gate):
         )
     )
 
-    three_point_gate.count_trajectories([traj1, traj2])
+    result = three_point_gate.count_trajectories([traj1, traj2])
 
-    assert three_point_gate.trajectory_count() == 2
-    assert three_point_gate.average_speed() == 54.0
+    assert result.trajectory_count == 2
+    assert result.average_speed() == 54.0
 
 
 def test_calculate_average_acceleration(two_point_gate):
@@ -169,7 +170,91 @@ def test_calculate_average_acceleration(two_point_gate):
         )
     )
 
-    two_point_gate.count_trajectories([traj1, traj2])
+    result = two_point_gate.count_trajectories([traj1, traj2])
 
-    assert two_point_gate.trajectory_count() == 2
-    assert round(two_point_gate.average_acceleration(), 2) == 20.83
+    assert result.trajectory_count == 2
+    assert round(result.average_acceleration(), 2) == 20.83
+
+
+def test_count_trajectories_is_repeatable_and_mergeable(two_point_gate):
+    traj1 = Trajectory(
+        (
+            TrajectoryNode.from_coordinates(0, 0, 0, 0, 0, 0),
+            TrajectoryNode.from_coordinates(0, 1, 100, 0, 0, 0),
+        )
+    )
+
+    traj2 = Trajectory(
+        (
+            TrajectoryNode.from_coordinates(0, 1, 0, 0, 0, 0),
+            TrajectoryNode.from_coordinates(0, 0, 200, 0, 0, 0),
+        )
+    )
+
+    result = two_point_gate.count_trajectories([traj1, traj2])
+    assert two_point_gate.count_trajectories([traj1, traj2]) == result
+
+    merged = two_point_gate.count_trajectories([traj1]).merge(two_point_gate.count_trajectories([traj2]))
+
+    assert merged.trajectory_count == result.trajectory_count == 2
+    assert merged.trajectory_count_negative == result.trajectory_count_negative == 1
+    assert merged.trajectory_count_positive == result.trajectory_count_positive == 1
+    assert merged.average_speed() == result.average_speed() == 27.0
+    assert len(merged.crossings) == 2
+
+
+def test_count_trajectories_crossings(two_point_gate):
+    traj = Trajectory(
+        (
+            TrajectoryNode.from_coordinates(0, 0, 0, 0, 0, 0),
+            TrajectoryNode.from_coordinates(0, 1, 100, 0, 0, 0),
+        ),
+        identifier=7,
+    )
+
+    result = two_point_gate.count_trajectories([traj])
+
+    assert len(result.crossings) == 1
+
+    crossing = result.crossings[0]
+
+    assert crossing.trajectory_id == 7
+    assert crossing.gate_name == "two_point_gate"
+    assert crossing.direction == RelativeDirection.LEFT
+    assert crossing.point == QgsPointXY(0, 0.5)
+    assert crossing.timestamp.timestamp() == 0.05
+    assert crossing.speed == 36.0
+    assert crossing.acceleration is None
+
+
+def test_count_trajectories_multiple_crossings(two_point_gate):
+    u_turn = Trajectory(
+        (
+            TrajectoryNode.from_coordinates(0, 0, 0, 0, 0, 0),
+            TrajectoryNode.from_coordinates(0, 1, 5000, 0, 0, 0),
+            TrajectoryNode.from_coordinates(0.2, 0, 10000, 0, 0, 0),
+        )
+    )
+
+    result = two_point_gate.count_trajectories([u_turn])
+
+    assert result.trajectory_count == 2
+    assert result.trajectory_count_positive == 1
+    assert result.trajectory_count_negative == 1
+    assert result.recrossing_count == 1
+
+    jitter = Trajectory(
+        (
+            TrajectoryNode.from_coordinates(0, 0, 0, 0, 0, 0),
+            TrajectoryNode.from_coordinates(0, 1, 100, 0, 0, 0),
+            TrajectoryNode.from_coordinates(0.1, 0, 200, 0, 0, 0),
+            TrajectoryNode.from_coordinates(0.2, 1, 300, 0, 0, 0),
+        )
+    )
+
+    result = two_point_gate.count_trajectories([jitter])
+
+    assert result.trajectory_count == 1
+    assert result.trajectory_count_positive == 1
+    assert result.recrossing_count == 0
+    assert len(result.crossings) == 1
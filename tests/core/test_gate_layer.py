@@ -1,9 +1,10 @@
 import pytest
-from qgis.core import QgsCoordinateReferenceSystem, QgsFeature, QgsGeometry, QgsPointXY
+from qgis.core import QgsCoordinateReferenceSystem, QgsFeature, QgsFeedback, QgsGeometry, QgsPointXY, QgsUnitTypes
 
 from fvh3t.core.exceptions import InvalidLayerException
 from fvh3t.core.gate_layer import GateLayer
 from fvh3t.core.qgis_layer_utils import QgisLayerUtils
+from fvh3t.core.trajectory_layer import TrajectoryLayer
 
 
 def test_gate_layer_create_gates(qgis_gate_line_layer):
@@ -95,3 +96,61 @@ def test_create_valid_gate_from_empty_line_layer():
     assert gate.counts_negative()
     assert gate.counts_positive()
     assert len(gate.segments()) == 1
+
+
+def test_gate_layer_candidate_trajectories(qgis_gate_line_layer, qgis_point_layer_for_gate_count):
+    gate_layer = GateLayer(
+        qgis_gate_line_layer,
+        "name",
+        "counts_negative",
+        "counts_positive",
+    )
+
+    traj_layer = TrajectoryLayer(
+        qgis_point_layer_for_gate_count,
+        "id",
+        "timestamp",
+        "width",
+        "length",
+        "height",
+        QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
+    )
+
+    trajectories = traj_layer.trajectories()
+    candidates = gate_layer.candidate_trajectories(trajectories)
+
+    assert len(candidates) == len(gate_layer.gates())
+
+    for gate, gate_candidates in zip(gate_layer.gates(), candidates):
+        # the spatial index never leaves out a crossing trajectory
+        crossing = [trajectory for trajectory in trajectories if gate.crosses_trajectory(trajectory)]
+        assert all(trajectory in gate_candidates for trajectory in crossing)
+
+        assert gate.count_trajectories(gate_candidates) == gate.count_trajectories(trajectories)
+
+
+def test_gate_layer_count_trajectories_canceled(qgis_gate_line_layer, qgis_point_layer_for_gate_count):
+    gate_layer = GateLayer(
+        qgis_gate_line_layer,
+        "name",
+        "counts_negative",
+        "counts_positive",
+    )
+
+    traj_layer = TrajectoryLayer(
+        qgis_point_layer_for_gate_count,
+        "id",
+        "timestamp",
+        "width",
+        "length",
+        "height",
+        QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
+    )
+
+    feedback = QgsFeedback()
+    feedback.cancel()
+
+    results = gate_layer.count_trajectories_from_layer(traj_layer, feedback)
+
+    assert len(results) == len(gate_layer.gates())
+    assert all(result.trajectory_count == 0 for result in results)
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from qgis.core import QgsPointXY
+from qgis.PyQt.QtCore import QDateTime
+
+from fvh3t.core.gate_count_result import GateCountResult, GateCrossing
+from fvh3t.core.gate_od_matrix import GateOdMatrix, OdPair
+from fvh3t.core.time_bins import TimeBins
+
+
+def crossing(trajectory_id: int, gate_name: str, seconds: int, traveler_class: str | None = None) -> GateCrossing:
+    return GateCrossing(
+        trajectory_id,
+        gate_name,
+        None,
+        datetime.fromtimestamp(seconds, tz=timezone.utc),
+        QgsPointXY(0, 0),
+        10.0,
+        None,
+        traveler_class=traveler_class,
+    )
+
+
+def test_gate_od_matrix():
+    # results are per gate, so the crossings of a
+    # trajectory are spread over several results
+    results = (
+        GateCountResult.from_crossings((crossing(1, "north", 10, "car"), crossing(2, "north", 50, "car"))),
+        GateCountResult.from_crossings((crossing(1, "south", 20, "car"), crossing(3, "south", 100, "bicycle"))),
+        GateCountResult.from_crossings((crossing(2, "east", 40, "car"), crossing(1, "east", 30, "car"))),
+        GateCountResult.from_crossings((crossing(4, "west", 70, "car"), crossing(4, "west", 80, "car"))),
+    )
+
+    bins = TimeBins(QDateTime.fromSecsSinceEpoch(0), QDateTime.fromSecsSinceEpoch(120))
+    matrix = GateOdMatrix(results, bins)
+
+    sequence = matrix.sequences()[1]
+    assert [c.gate_name for c in sequence] == ["north", "south", "east"]
+
+    assert matrix.counts() == {
+        OdPair("east", "north", "car", 0): 1,
+        OdPair("north", "east", "car", 0): 1,
+        OdPair("west", "west", "car", 0): 1,
+    }
+
+    # trajectory 3 crossed one gate once, so it has no destination,
+    # while trajectory 4 made a u-turn through the same gate
+    assert len(matrix.sequences()[3]) == 1
+
+    # trajectories are binned by their first crossing
+    binned = GateOdMatrix(results, bins._replace(interval=timedelta(seconds=60)))
+
+    assert binned.counts() == {
+        OdPair("east", "north", "car", 0): 1,
+        OdPair("north", "east", "car", 0): 1,
+        OdPair("west", "west", "car", 1): 1,
+    }
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from qgis.core import QgsPointXY
+from qgis.PyQt.QtCore import QDateTime
+
+from fvh3t.core.gate_count_result import GateCrossing
+from fvh3t.core.gate_traffic_statistics import GateTrafficStatistics
+from fvh3t.core.time_bins import TimeBins
+
+
+def test_gate_traffic_statistics():
+    crossings = tuple(
+        GateCrossing(
+            i,
+            "gate",
+            None,
+            datetime.fromtimestamp(seconds, tz=timezone.utc),
+            QgsPointXY(0, 0),
+            36.0,  # 10 m/s
+            None,
+            length=5.0,
+        )
+        # unordered on purpose
+        for i, seconds in enumerate((40, 0, 30, 10, 50, 70))
+    )
+
+    bins = TimeBins(QDateTime.fromSecsSinceEpoch(0), QDateTime.fromSecsSinceEpoch(60), timedelta(seconds=30))
+
+    first, second = GateTrafficStatistics.from_crossings(crossings, bins)
+
+    assert first.vehicle_count == 2
+    assert first.flow_rate == 240.0
+    assert first.headway_min == first.headway_max == 10.0
+    assert first.occupancy == pytest.approx(1.0 / 30)
+
+    # the headway of the first crossing of the bin is
+    # measured from the last crossing of the previous one
+    assert second.vehicle_count == 3
+    assert second.flow_rate == 360.0
+    assert second.headway_min == 10.0
+    assert second.headway_avg == pytest.approx(40 / 3)
+    assert second.headway_median == 10.0
+    assert second.headway_max == 20.0
+    assert second.occupancy == pytest.approx(1.5 / 30)
+
+
+def test_gate_traffic_statistics_no_crossings():
+    bins = TimeBins(QDateTime.fromSecsSinceEpoch(0), QDateTime.fromSecsSinceEpoch(60))
+
+    assert GateTrafficStatistics.from_crossings((), bins) == (GateTrafficStatistics(),)
@@ -0,0 +1,71 @@
+from qgis.core import QgsFeature, QgsField, QgsGeometry, QgsPointXY, QgsVectorLayer
+from qgis.PyQt.QtCore import QVariant
+
+from fvh3t.core.layer_statistics import LayerStatistics, LayerStatisticsCache
+
+
+def test_layer_statistics(qgis_point_layer: QgsVectorLayer):
+    statistics = LayerStatistics.from_layer(qgis_point_layer, "id", "timestamp", "label")
+
+    assert statistics.feature_count == 6
+    assert statistics.min_timestamp == 100
+    assert statistics.max_timestamp == 700
+    assert statistics.id_count == 2
+    # the layer has no class field
+    assert statistics.class_values == ()
+    assert statistics.extent.toString(0) == "0,0 : 5,3"
+
+
+def test_layer_statistics_skip_nulls(qgis_point_layer: QgsVectorLayer):
+    qgis_point_layer.startEditing()
+
+    qgis_point_layer.addAttribute(QgsField("label", QVariant.String))
+
+    feature = QgsFeature(qgis_point_layer.fields())
+    feature.setAttributes([None, 800, 1, 1, 1, None])
+    feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(0, 0)))
+    qgis_point_layer.addFeature(feature)
+
+    qgis_point_layer.changeAttributeValue(1, qgis_point_layer.fields().indexOf("label"), "car")
+
+    qgis_point_layer.commitChanges()
+
+    statistics = LayerStatistics.from_layer(qgis_point_layer, "id", "timestamp", "label")
+
+    assert statistics.feature_count == 7
+    assert statistics.id_count == 2
+    assert statistics.class_values == ("car",)
+
+
+def test_layer_statistics_cache_is_invalidated_on_change(qgis_point_layer: QgsVectorLayer):
+    cache = LayerStatisticsCache()
+
+    statistics = cache.statistics(qgis_point_layer, "id", "timestamp")
+
+    assert cache.statistics(qgis_point_layer, "id", "timestamp") is statistics
+
+    qgis_point_layer.startEditing()
+
+    feature = QgsFeature(qgis_point_layer.fields())
+    feature.setAttributes([3, 800, 1, 1, 1])
+    feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(0, 0)))
+    qgis_point_layer.addFeature(feature)
+
+    qgis_point_layer.commitChanges()
+
+    changed_statistics = cache.statistics(qgis_point_layer, "id", "timestamp")
+
+    assert changed_statistics is not statistics
+    assert changed_statistics.feature_count == 7
+    assert changed_statistics.max_timestamp == 800
+    assert changed_statistics.id_count == 3
+
+
+def test_layer_statistics_cache_shares_entries_between_class_fields(qgis_point_layer: QgsVectorLayer):
+    cache = LayerStatisticsCache()
+
+    statistics = cache.statistics(qgis_point_layer, "id", "timestamp")
+    statistics_with_class = cache.statistics(qgis_point_layer, "id", "timestamp", "label")
+
+    assert statistics_with_class._replace(class_values=()) == statistics
+    assert cache.statistics(qgis_point_layer, "id", "timestamp") is statistics
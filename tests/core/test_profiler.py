@@ -0,0 +1,41 @@
+import json
+
+from fvh3t.core.profiler import Profiler
+
+
+def test_profiler_stages_and_counters(tmp_path):
+    profiler = Profiler(trace_memory=True)
+
+    with profiler.stage("first"):
+        profiler.count("items", 2)
+        data = [0] * 100_000  # noqa: F841
+
+    with profiler.stage("second"):
+        profiler.count("items")
+
+    stages = profiler.stages()
+
+    assert [stage.name for stage in stages] == ["first", "second"]
+    assert all(stage.duration_s >= 0 for stage in stages)
+    assert stages[0].peak_traced_bytes >= 100_000 * 8
+    # the growth of the process peak, not the peak itself
+    assert all(stage.rss_peak_growth_bytes is None or stage.rss_peak_growth_bytes >= 0 for stage in stages)
+    assert profiler.counters() == {"items": 3}
+
+    path = tmp_path / "profile.json"
+    profiler.write_json(str(path))
+
+    profile = json.loads(path.read_text())
+
+    assert profile["counters"] == {"items": 3}
+    assert "peak_rss_bytes" in profile
+    assert [stage["name"] for stage in profile["stages"]] == ["first", "second"]
+
+
+def test_profiler_does_not_trace_by_default():
+    profiler = Profiler()
+
+    with profiler.stage("stage"):
+        pass
+
+    assert profiler.stages()[0].peak_traced_bytes is None
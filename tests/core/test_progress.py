@@ -0,0 +1,38 @@
+from qgis.core import QgsFeedback
+
+from fvh3t.core.progress import ProgressReporter
+
+
+def test_progress_reporter_sets_whole_percentages():
+    feedback = QgsFeedback()
+    reported: list[float] = []
+    feedback.progressChanged.connect(reported.append)
+
+    progress = ProgressReporter(feedback, 400)
+
+    for _ in range(400):
+        progress.advance()
+
+    # only every fourth step changes the whole percentage
+    assert len(reported) == 100
+    assert reported[-1] == 100
+    assert feedback.progress() == 100
+
+
+def test_progress_reporter_without_feedback():
+    progress = ProgressReporter(None, 10)
+
+    progress.advance()
+
+    assert not progress.is_canceled()
+
+
+def test_progress_reporter_is_canceled():
+    feedback = QgsFeedback()
+    progress = ProgressReporter(feedback, 10)
+
+    assert not progress.is_canceled()
+
+    feedback.cancel()
+
+    assert progress.is_canceled()
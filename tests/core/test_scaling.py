@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from math import log
+from typing import Callable
+
+import pytest
+from qgis.core import QgsUnitTypes
+
+from fvh3t.core.area_layer import AreaLayer
+from fvh3t.core.gate_layer import GateLayer
+from fvh3t.core.profiler import Profiler
+from fvh3t.core.trajectory_layer import TrajectoryLayer
+from tests import synthetic
+
+# sampled sparsely to have more travelers with the same number of points
+SCENARIO = synthetic.IntersectionScenario(sampling_rate_hz=1.0)
+
+SIZES: tuple[int, ...] = (2_500, 5_000, 10_000)
+
+# the exponent of n log n between the sizes is about 1.1
+# and of anything quadratic about 2, the rest is left for
+# the variation in the synthetic traffic
+MAX_GROWTH_EXPONENT = 1.5
+
+# the tests made per trajectory depend on the gates it passes
+# near, not on the other trajectories, so they only vary with
+# the synthetic traffic between the sizes
+MAX_PER_TRAJECTORY_GROWTH = 1.5
+
+
+def growth_exponent(sizes: tuple[int, ...], counts: list[int]) -> float:
+    """
+    Return k in count ~ size ** k between the smallest and the
+    largest size.
+    """
+    return log(counts[-1] / counts[0]) / log(sizes[-1] / sizes[0])
+
+
+def create_trajectory_layer(scenario: synthetic.IntersectionScenario, profiler: Profiler) -> TrajectoryLayer:
+    return TrajectoryLayer(
+        synthetic.point_layer(scenario),
+        "id",
+        "timestamp",
+        "size_x",
+        "size_y",
+        "size_z",
+        QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
+        class_field="label",
+        profiler=profiler,
+    )
+
+
+@pytest.fixture(scope="module")
+def trajectory_layers() -> list[tuple[TrajectoryLayer, dict[str, int]]]:
+    layers: list[tuple[TrajectoryLayer, dict[str, int]]] = []
+
+    for n_points in SIZES:
+        profiler = Profiler()
+        trajectory_layer: TrajectoryLayer = create_trajectory_layer(SCENARIO._replace(n_points=n_points), profiler)
+        layers.append((trajectory_layer, profiler.counters()))
+
+    return layers
+
+
+def counts_per_size(
+    trajectory_layers: list[tuple[TrajectoryLayer, dict[str, int]]],
+    count: Callable[[TrajectoryLayer, Profiler], object],
+    counter: str,
+) -> list[int]:
+    counts: list[int] = []
+
+    for trajectory_layer, _ in trajectory_layers:
+        profiler = Profiler()
+        count(trajectory_layer, profiler)
+        counts.append(profiler.counters()[counter])
+
+    return counts
+
+
+def test_trajectories_are_created_in_one_request(trajectory_layers):
+    n_trajectories: list[int] = [len(trajectory_layer.trajectories()) for trajectory_layer, _ in trajectory_layers]
+
+    # more travelers are read with the same single request
+    # instead of one request for every traveler
+    assert n_trajectories[0] < n_trajectories[-1]
+    assert [counters["point requests"] for _, counters in trajectory_layers] == [1] * len(SIZES)
+
+
+@pytest.mark.parametrize("counter", ["gate crossing tests", "gate segment tests"])
+def test_gate_tests_per_trajectory_do_not_grow(trajectory_layers, counter):
+    gate_layer = GateLayer(synthetic.gate_layer(SCENARIO), "name", "counts_negative", "counts_positive")
+
+    counts = counts_per_size(
+        trajectory_layers,
+        lambda trajectory_layer, profiler: gate_layer.count_trajectories_from_layer(
+            trajectory_layer, profiler=profiler
+        ),
+        counter,
+    )
+
+    tests_per_trajectory: list[float] = [
+        count / len(trajectory_layer.trajectories()) for count, (trajectory_layer, _) in zip(counts, trajectory_layers)
+    ]
+
+    assert tests_per_trajectory[0] > 0
+    assert tests_per_trajectory[-1] <= MAX_PER_TRAJECTORY_GROWTH * tests_per_trajectory[0]
+
+
+def test_gate_counting_uses_the_index(trajectory_layers):
+    scenario = SCENARIO._replace(gate_distances_m=(30.0, 60.0, 90.0))
+    gate_layer = GateLayer(synthetic.gate_layer(scenario), "name", "counts_negative", "counts_positive")
+
+    trajectory_layer, _ = trajectory_layers[-1]
+    profiler = Profiler()
+
+    gate_layer.count_trajectories_from_layer(trajectory_layer, profiler=profiler)
+
+    counters = profiler.counters()
+
+    # a trajectory only passes the gates on two of the four arms
+    assert counters["gate crossing tests"] < len(gate_layer.gates()) * len(trajectory_layer.trajectories())
+    assert counters["gate crossing tests skipped by the index"] > 0
+
+
+def test_point_assignment_scales_linearly(trajectory_layers):
+    area_layer = AreaLayer(synthetic.area_layer(SCENARIO), "fid", "name")
+
+    counts = counts_per_size(
+        trajectory_layers,
+        lambda trajectory_layer, profiler: area_layer.assign_points(
+            [feature.geometry().asPoint() for feature in trajectory_layer.layer().getFeatures()], profiler=profiler
+        ),
+        "area containment tests",
+    )
+
+    assert counts[0] > 0
+    assert growth_exponent(SIZES, counts) <= MAX_GROWTH_EXPONENT
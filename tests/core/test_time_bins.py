@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+from qgis.PyQt.QtCore import QDateTime
+
+from fvh3t.core.time_bins import TimeBins
+
+
+def test_time_bins():
+    bins = TimeBins(QDateTime.fromMSecsSinceEpoch(0), QDateTime.fromMSecsSinceEpoch(25000), timedelta(seconds=10))
+
+    assert bins.count() == 3
+
+    assert bins.index(datetime.fromtimestamp(0, tz=timezone.utc)) == 0
+    assert bins.index(datetime.fromtimestamp(9.999, tz=timezone.utc)) == 0
+    assert bins.index(datetime.fromtimestamp(10, tz=timezone.utc)) == 1
+    assert bins.index(datetime.fromtimestamp(25, tz=timezone.utc)) == 2
+    assert bins.index(datetime.fromtimestamp(26, tz=timezone.utc)) is None
+
+    bin_start, bin_end = bins.bounds(2)
+
+    assert bin_start.toMSecsSinceEpoch() == 20000
+    assert bin_end.toMSecsSinceEpoch() == 25000
+
+
+def test_time_bins_without_interval():
+    start = QDateTime.fromMSecsSinceEpoch(0)
+    end = QDateTime.fromMSecsSinceEpoch(25000)
+
+    bins = TimeBins(start, end)
+
+    assert bins.count() == 1
+    assert bins.index(datetime.fromtimestamp(12, tz=timezone.utc)) == 0
+    assert bins.bounds(0) == (start, end)
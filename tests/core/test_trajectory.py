@@ -40,3 +40,17 @@ def test_trajectory_average_size(size_changing_trajectory: Trajectory):
 def test_invalid_trajectory():
     with pytest.raises(InvalidTrajectoryException, match="Trajectory must consist of at least two nodes."):
         Trajectory((TrajectoryNode.from_coordinates(0, 0, 100, 1, 1, 1),))
+
+
+def test_trajectory_segment_speeds(accelerating_three_node_trajectory: Trajectory):
+    speeds = accelerating_three_node_trajectory.segment_speeds()
+
+    assert speeds == (72.0, 96.0)
+    assert accelerating_three_node_trajectory.segment_speeds() is speeds
+
+
+def test_trajectory_movement_statistics_are_cached(three_node_trajectory: Trajectory):
+    movement = three_node_trajectory._movement_core()  # noqa: SLF001
+
+    assert three_node_trajectory.average_speed() == 36.0
+    assert three_node_trajectory._movement_core() is movement  # noqa: SLF001
@@ -2,7 +2,8 @@ import logging
 from typing import TYPE_CHECKING
 
 import pytest
-from qgis.core import QgsUnitTypes, QgsVectorLayer
+from qgis.core import QgsFeedback, QgsField, QgsUnitTypes, QgsVectorLayer, edit
+from qgis.PyQt.QtCore import QVariant
 
 from fvh3t.core.exceptions import InvalidLayerException
 from fvh3t.core.trajectory_layer import TrajectoryLayer
@@ -61,6 +62,19 @@ def test_trajectory_layer_create_line_layer(qgis_point_layer):
     assert feat2.attribute("average_speed (km/h)") == 36.0
 
 
+def test_trajectory_layer_line_layer_features(qgis_point_layer):
+    traj_layer = TrajectoryLayer(
+        qgis_point_layer, "id", "timestamp", "width", "length", "height", QgsUnitTypes.TemporalUnit.TemporalMilliseconds
+    )
+
+    features = list(traj_layer.line_layer_features())
+
+    assert len(features) == 2
+    assert features[0].fields().names() == TrajectoryLayer.line_layer_fields().names()
+    assert features[0].geometry().asWkt() == "LineString (0 0, 1 0, 2 0)"
+    assert features[1].attribute("average_speed (km/h)") == 36.0
+
+
 def test_trajectory_layer_node_ordering(qgis_point_layer_non_ordered):
     traj_layer = TrajectoryLayer(
         qgis_point_layer_non_ordered,
@@ -197,3 +211,142 @@ def test_create_trajectory_layer_single_trajectory_node(qgis_single_point_layer,
 
     assert len(layer.trajectories()) == 0
     assert 'Trajectory with id "1" has only one node, skipping...' in caplog.text
+
+
+def test_create_trajectory_layer_traveler_class(qgis_point_layer: QgsVectorLayer):
+    labels = ["car", "car", "bicycle", "pedestrian", "pedestrian", "pedestrian"]
+
+    with edit(qgis_point_layer):
+        qgis_point_layer.addAttribute(QgsField("label", QVariant.String))
+        label_idx: int = qgis_point_layer.fields().indexOf("label")
+
+        for feature, label in zip(qgis_point_layer.getFeatures(), labels):
+            qgis_point_layer.changeAttributeValue(feature.id(), label_idx, label)
+
+    layer = TrajectoryLayer(
+        qgis_point_layer,
+        "id",
+        "timestamp",
+        "width",
+        "length",
+        "height",
+        QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
+        class_field="label",
+    )
+
+    trajectories = layer.trajectories()
+
+    # the most common label of a trajectory is its class
+    assert trajectories[0].traveler_class() == "car"
+    assert trajectories[1].traveler_class() == "pedestrian"
+
+    assert layer.traveler_classes() == ("car", "pedestrian")
+
+    with pytest.raises(InvalidLayerException, match="Class field not found."):
+        TrajectoryLayer(qgis_point_layer, "id", "timestamp", "width", "length", "height", class_field="missing")
+
+
+def test_create_trajectory_layer_null_traveler_class(qgis_point_layer: QgsVectorLayer):
+    # nulls are written both as None and as a null QVariant
+    labels = [None, QVariant(), "car", None, QVariant(), None]
+
+    with edit(qgis_point_layer):
+        qgis_point_layer.addAttribute(QgsField("label", QVariant.String))
+        label_idx: int = qgis_point_layer.fields().indexOf("label")
+
+        for feature, label in zip(qgis_point_layer.getFeatures(), labels):
+            qgis_point_layer.changeAttributeValue(feature.id(), label_idx, label)
+
+    layer = TrajectoryLayer(
+        qgis_point_layer,
+        "id",
+        "timestamp",
+        "width",
+        "length",
+        "height",
+        QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
+        class_field="label",
+    )
+
+    trajectories = layer.trajectories()
+
+    # the nulls are not a class of their own
+    assert trajectories[0].traveler_class() == "car"
+    assert trajectories[1].traveler_class() is None
+
+    assert layer.traveler_classes() == ("car",)
+
+
+def test_create_trajectory_layer_point_groups(qgis_point_layer: QgsVectorLayer):
+    # feature ids of the first trajectory are 1-3 and of the second 4-6,
+    # the last point of the first trajectory is in another group
+    point_groups = {1: "a", 2: "a", 3: "b", 4: "a", 5: "a", 6: "a"}
+
+    layer = TrajectoryLayer(
+        qgis_point_layer,
+        "id",
+        "timestamp",
+        "width",
+        "length",
+        "height",
+        QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
+        point_groups=point_groups,
+    )
+
+    trajectories = layer.trajectories()
+
+    # (1, "b") has only one node and is skipped
+    assert len(trajectories) == 2
+    assert trajectories[0].identifier() == (1, "a")
+    assert trajectories[1].identifier() == (2, "a")
+
+    assert trajectories[0].as_geometry().asWkt() == "LineString (0 0, 1 0)"
+    assert trajectories[1].as_geometry().asWkt() == "LineString (5 1, 5 2, 5 3)"
+
+    # the layer itself is not modified
+    assert qgis_point_layer.fields().names() == ["id", "timestamp", "width", "length", "height"]
+
+
+def test_create_trajectory_layer_whole_trajectories(qgis_point_layer: QgsVectorLayer):
+    # the second point of the second trajectory is in no group
+    point_groups = {1: "a", 2: "a", 3: "b", 4: "a", 6: "a"}
+
+    layer = TrajectoryLayer(
+        qgis_point_layer,
+        "id",
+        "timestamp",
+        "width",
+        "length",
+        "height",
+        QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
+        point_groups=point_groups,
+        keep_whole_trajectories=True,
+    )
+
+    assert [trajectory.identifier() for trajectory in layer.trajectories()] == [(1, "a"), (2, "a")]
+
+    # built in the same pass with all of the points
+    # and the group of each point kept in its node
+    whole_trajectories = layer.whole_trajectories()
+
+    assert [trajectory.identifier() for trajectory in whole_trajectories] == [1, 2]
+    assert [node.group for node in whole_trajectories[0].nodes()] == ["a", "a", "b"]
+    assert [node.group for node in whole_trajectories[1].nodes()] == ["a", None, "a"]
+
+
+def test_create_trajectory_layer_canceled(qgis_point_layer: QgsVectorLayer):
+    feedback = QgsFeedback()
+    feedback.cancel()
+
+    traj_layer = TrajectoryLayer(
+        qgis_point_layer,
+        "id",
+        "timestamp",
+        "width",
+        "length",
+        "height",
+        QgsUnitTypes.TemporalUnit.TemporalMilliseconds,
+        feedback=feedback,
+    )
+
+    assert traj_layer.trajectories() == ()
@@ -3,6 +3,8 @@ try:
 except ImportError:
     from qgis import processing
 
+import json
+
 import pytest
 from qgis.core import QgsApplication, QgsFeature, QgsField, QgsGeometry, QgsPointXY, QgsVectorLayer
 from qgis.PyQt.QtCore import QDate, QDateTime, QTime, QTimeZone, QVariant
@@ -344,3 +346,221 @@ def test_count_trajectories_gate(
     assert case2traj3.geometry().asWkt() == "LineString (1.5 0.5, 1.5 1.5)"
 
     qgis_app.processingRegistry().removeProvider(provider.id())
+
+
+def test_count_trajectories_gate_crossings(
+    qgis_app: QgsApplication,
+    qgis_processing,  # noqa: ARG001
+    input_point_layer_for_algorithm: QgsVectorLayer,
+    input_gate_layer_for_algorithm: QgsVectorLayer,
+):
+    provider = TTTProvider()
+
+    qgis_app.processingRegistry().addProvider(provider)
+
+    params = {
+        "INPUT_POINTS": input_point_layer_for_algorithm,
+        "INPUT_LINES": input_gate_layer_for_algorithm,
+        "TRAVELER_CLASS": "car",
+        "START_TIME": None,
+        "END_TIME": None,
+        "OUTPUT_GATES": "TEMPORARY_OUTPUT",
+        "OUTPUT_TRAJECTORIES": "TEMPORARY_OUTPUT",
+        "OUTPUT_CROSSINGS": "TEMPORARY_OUTPUT",
+    }
+
+    result = processing.run(
+        "traffic_trajectory_toolkit:count_trajectories_gate",
+        params,
+    )
+
+    output_gates: QgsVectorLayer = result["OUTPUT_GATES"]
+    output_crossings: QgsVectorLayer = result["OUTPUT_CROSSINGS"]
+
+    assert output_crossings.featureCount() == sum(gate["vehicle_count"] for gate in output_gates.getFeatures())
+    assert output_crossings.crs() == input_point_layer_for_algorithm.crs()
+
+    for crossing in output_crossings.getFeatures():
+        assert crossing.attribute("class") == "car"
+        assert crossing.attribute("gate") in ("gate1", "gate2", "gate3")
+
+    qgis_app.processingRegistry().removeProvider(provider.id())
+
+
+def test_count_trajectories_gate_intervals(
+    qgis_app: QgsApplication,
+    qgis_processing,  # noqa: ARG001
+    input_point_layer_for_algorithm: QgsVectorLayer,
+    input_gate_layer_for_algorithm: QgsVectorLayer,
+):
+    provider = TTTProvider()
+
+    qgis_app.processingRegistry().addProvider(provider)
+
+    params = {
+        "INPUT_POINTS": input_point_layer_for_algorithm,
+        "INPUT_LINES": input_gate_layer_for_algorithm,
+        "TRAVELER_CLASS": "car",
+        "START_TIME": None,
+        "END_TIME": None,
+        "INTERVAL": 5,
+        "OUTPUT_GATES": "TEMPORARY_OUTPUT",
+        "OUTPUT_TRAJECTORIES": "TEMPORARY_OUTPUT",
+    }
+
+    result = processing.run(
+        "traffic_trajectory_toolkit:count_trajectories_gate",
+        params,
+    )
+
+    output_gates: QgsVectorLayer = result["OUTPUT_GATES"]
+
+    # two five minute intervals for each of the three gates
+    assert output_gates.featureCount() == 6
+
+    counts = [
+        (gate.attribute("name"), gate.attribute("interval_start").toMSecsSinceEpoch(), gate.attribute("vehicle_count"))
+        for gate in output_gates.getFeatures()
+    ]
+
+    assert counts == [
+        ("gate1", 0, 0),
+        ("gate1", 300000, 1),
+        ("gate2", 0, 1),
+        ("gate2", 300000, 0),
+        ("gate3", 0, 1),
+        ("gate3", 300000, 1),
+    ]
+
+    qgis_app.processingRegistry().removeProvider(provider.id())
+
+
+def test_count_trajectories_gate_od_matrix(
+    qgis_app: QgsApplication,
+    qgis_processing,  # noqa: ARG001
+    input_point_layer_for_algorithm: QgsVectorLayer,
+    input_gate_layer_for_algorithm: QgsVectorLayer,
+):
+    provider = TTTProvider()
+
+    qgis_app.processingRegistry().addProvider(provider)
+
+    # a trajectory crossing gate3 and then gate2, the
+    # other trajectories only cross one gate once
+    input_point_layer_for_algorithm.startEditing()
+
+    for x, timestamp in [(2.5, 0), (1.5, 1000), (-0.5, 2000)]:
+        feature = QgsFeature(input_point_layer_for_algorithm.fields())
+        feature.setAttributes([7, timestamp, 1, 1, 1, "car"])
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, 1.5)))
+        input_point_layer_for_algorithm.addFeature(feature)
+
+    input_point_layer_for_algorithm.commitChanges()
+
+    params = {
+        "INPUT_POINTS": input_point_layer_for_algorithm,
+        "INPUT_LINES": input_gate_layer_for_algorithm,
+        "TRAVELER_CLASS": "car",
+        "START_TIME": None,
+        "END_TIME": None,
+        "OUTPUT_GATES": "TEMPORARY_OUTPUT",
+        "OUTPUT_TRAJECTORIES": "TEMPORARY_OUTPUT",
+        "OUTPUT_OD_MATRIX": "TEMPORARY_OUTPUT",
+    }
+
+    result = processing.run(
+        "traffic_trajectory_toolkit:count_trajectories_gate",
+        params,
+    )
+
+    output_od_matrix: QgsVectorLayer = result["OUTPUT_OD_MATRIX"]
+
+    # the trajectories crossing only one gate have no destination
+    rows = [
+        (row.attribute("origin"), row.attribute("destination"), row.attribute("class"), row.attribute("vehicle_count"))
+        for row in output_od_matrix.getFeatures()
+    ]
+
+    assert rows == [("gate3", "gate2", "car", 1)]
+
+    qgis_app.processingRegistry().removeProvider(provider.id())
+
+
+def test_count_trajectories_gate_without_points(
+    qgis_app: QgsApplication,
+    qgis_processing,  # noqa: ARG001
+    input_point_layer_for_algorithm: QgsVectorLayer,
+    input_gate_layer_for_algorithm: QgsVectorLayer,
+):
+    provider = TTTProvider()
+
+    qgis_app.processingRegistry().addProvider(provider)
+
+    params = {
+        "INPUT_POINTS": input_point_layer_for_algorithm,
+        "INPUT_LINES": input_gate_layer_for_algorithm,
+        "TRAVELER_CLASS": "bus",
+        "START_TIME": None,
+        "END_TIME": None,
+        "OUTPUT_GATES": "TEMPORARY_OUTPUT",
+        "OUTPUT_TRAJECTORIES": "TEMPORARY_OUTPUT",
+    }
+
+    result = processing.run(
+        "traffic_trajectory_toolkit:count_trajectories_gate",
+        params,
+    )
+
+    # every gate is counted as zero when no points are left
+    assert result["OUTPUT_TRAJECTORIES"].featureCount() == 0
+    assert [feature["vehicle_count"] for feature in result["OUTPUT_GATES"].getFeatures()] == [0, 0, 0]
+
+    qgis_app.processingRegistry().removeProvider(provider.id())
+
+
+def test_count_trajectories_gate_profile(
+    qgis_app: QgsApplication,
+    qgis_processing,  # noqa: ARG001
+    input_point_layer_for_algorithm: QgsVectorLayer,
+    input_gate_layer_for_algorithm: QgsVectorLayer,
+    tmp_path,
+):
+    provider = TTTProvider()
+
+    qgis_app.processingRegistry().addProvider(provider)
+
+    profile_path = str(tmp_path / "profile.json")
+
+    params = {
+        "INPUT_POINTS": input_point_layer_for_algorithm,
+        "INPUT_LINES": input_gate_layer_for_algorithm,
+        "TRAVELER_CLASS": "car",
+        "START_TIME": None,
+        "END_TIME": None,
+        "OUTPUT_GATES": "TEMPORARY_OUTPUT",
+        "OUTPUT_TRAJECTORIES": "TEMPORARY_OUTPUT",
+        "PROFILE": profile_path,
+    }
+
+    result = processing.run(
+        "traffic_trajectory_toolkit:count_trajectories_gate",
+        params,
+    )
+
+    assert result["PROFILE"] == profile_path
+
+    with open(profile_path, encoding="utf-8") as file:
+        profile = json.load(file)
+
+    assert [stage["name"] for stage in profile["stages"]] == [
+        "read statistics",
+        "materialize",
+        "build trajectories",
+        "write trajectories",
+        "count gates",
+        "write outputs",
+    ]
+    assert profile["counters"]["trajectories built"] == result["OUTPUT_TRAJECTORIES"].featureCount()
+    assert profile["counters"]["gate crossing tests"] > 0
+
+    qgis_app.processingRegistry().removeProvider(provider.id())
@@ -0,0 +1,114 @@
+try:
+    import processing
+except ImportError:
+    from qgis import processing
+
+import pytest
+from qgis.core import QgsFeature, QgsField, QgsGeometry, QgsPointXY, QgsProject, QgsVectorLayer
+from qgis.PyQt.QtCore import QVariant
+
+from fvh3t.fvh3t_processing.traffic_trajectory_toolkit_provider import TTTProvider
+
+
+@pytest.fixture
+def input_point_layer_for_algorithm():
+    layer = QgsVectorLayer("Point?crs=EPSG:3857", "Point Layer", "memory")
+
+    layer.startEditing()
+
+    layer.addAttribute(QgsField("id", QVariant.Int))
+    layer.addAttribute(QgsField("timestamp", QVariant.Double))
+    layer.addAttribute(QgsField("size_x", QVariant.Int))
+    layer.addAttribute(QgsField("size_y", QVariant.Int))
+    layer.addAttribute(QgsField("size_z", QVariant.Int))
+    layer.addAttribute(QgsField("label", QVariant.String))
+
+    points = [
+        (1, 0, -0.5, 0, "car"),
+        (1, 0.25, 0.25, 1000, "car"),
+        (1, 0.5, 0.5, 2000, "car"),
+        (1, 0.75, 0.75, 3000, "car"),
+        (1, 1, 1.5, 4000, "car"),
+        (2, 0.5, -0.5, 6000000, "car"),
+        (2, 0.5, 0.25, 6001000, "car"),
+        (2, 0.5, 0.75, 6002000, "car"),
+        (2, 0.5, 1.5, 6003000, "car"),
+        (3, 0.75, 2.25, 6000000, "car"),
+        (3, 1.25, 2.25, 6001000, "car"),
+        (3, 1.5, 2.25, 6002000, "car"),
+        (3, 1.75, 2.25, 6003000, "car"),
+        (4, 1.5, 0.5, 1000, "pedestrian"),
+        (4, 1.5, 1, 2000, "pedestrian"),
+    ]
+
+    for traj_id, x, y, timestamp, label in points:
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([traj_id, timestamp, 1, 1, 1, label])
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+        layer.addFeature(feature)
+
+    layer.commitChanges()
+
+    return layer
+
+
+def test_count_trajectories_gate_area_matches_separate_algorithms(
+    qgis_app,
+    qgis_processing,  # noqa: ARG001
+    qgis_gate_line_layer: QgsVectorLayer,
+    qgis_area_polygon_layer: QgsVectorLayer,
+    input_point_layer_for_algorithm: QgsVectorLayer,
+):
+    provider = TTTProvider()
+
+    qgis_app.processingRegistry().addProvider(provider)
+
+    QgsProject.instance().addMapLayers([qgis_gate_line_layer, qgis_area_polygon_layer, input_point_layer_for_algorithm])
+
+    common_params = {
+        "INPUT_POINTS": input_point_layer_for_algorithm,
+        "TRAVELER_CLASS": None,
+        "START_TIME": None,
+        "END_TIME": None,
+        "OUTPUT_TRAJECTORIES": "TEMPORARY_OUTPUT",
+    }
+
+    result = processing.run(
+        "traffic_trajectory_toolkit:count_trajectories_gate_area",
+        {
+            **common_params,
+            "INPUT_LINES": qgis_gate_line_layer,
+            "INPUT_AREAS": qgis_area_polygon_layer,
+            "OUTPUT_GATES": "TEMPORARY_OUTPUT",
+            "OUTPUT_AREAS": "TEMPORARY_OUTPUT",
+        },
+    )
+
+    gate_result = processing.run(
+        "traffic_trajectory_toolkit:count_trajectories_gate",
+        {**common_params, "INPUT_LINES": qgis_gate_line_layer, "OUTPUT_GATES": "TEMPORARY_OUTPUT"},
+    )
+
+    area_result = processing.run(
+        "traffic_trajectory_toolkit:count_trajectories_area",
+        {**common_params, "INPUT_AREAS": qgis_area_polygon_layer, "OUTPUT_AREAS": "TEMPORARY_OUTPUT"},
+    )
+
+    output_gates: QgsVectorLayer = result["OUTPUT_GATES"]
+    output_areas: QgsVectorLayer = result["OUTPUT_AREAS"]
+    output_trajectories: QgsVectorLayer = result["OUTPUT_TRAJECTORIES"]
+
+    # the trajectories are the whole trajectories, not split by area
+    assert output_trajectories.featureCount() == 4
+
+    assert [feature["vehicle_count"] for feature in output_gates.getFeatures()] == [
+        feature["vehicle_count"] for feature in gate_result["OUTPUT_GATES"].getFeatures()
+    ]
+    assert [feature["vehicle_count"] for feature in output_areas.getFeatures()] == [
+        feature["vehicle_count"] for feature in area_result["OUTPUT_AREAS"].getFeatures()
+    ]
+    assert [round(feature["speed_avg (km/h)"], 2) for feature in output_areas.getFeatures()] == [
+        round(feature["speed_avg (km/h)"], 2) for feature in area_result["OUTPUT_AREAS"].getFeatures()
+    ]
+
+    qgis_app.processingRegistry().removeProvider(provider.id())
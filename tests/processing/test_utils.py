@@ -0,0 +1,113 @@
+import pytest
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsField,
+    QgsGeometry,
+    QgsPointXY,
+    QgsRectangle,
+    QgsVectorLayer,
+)
+from qgis.PyQt.QtCore import QDateTime, QVariant
+
+from fvh3t.fvh3t_processing.utils import ProcessingUtils
+
+
+@pytest.fixture
+def point_layer():
+    layer = QgsVectorLayer("Point?crs=EPSG:3067", "Point Layer", "memory")
+
+    layer.startEditing()
+
+    layer.addAttribute(QgsField("id", QVariant.Int))
+    layer.addAttribute(QgsField("timestamp", QVariant.Double))
+    layer.addAttribute(QgsField("label", QVariant.String))
+
+    points = [
+        # passes the extent
+        (1, -5, 0, 1000, "car"),
+        (1, 0, 0, 2000, "car"),
+        (1, 5, 0, 3000, "car"),
+        # passes the extent, but is of another class
+        (2, 0, 0.5, 1000, "pedestrian"),
+        (2, 0, 5, 2000, "pedestrian"),
+        # in the extent, but without an id
+        (None, 0, -0.5, 1000, "car"),
+        # far from the extent
+        (3, 100, 100, 1000, "car"),
+        (3, 100, 105, 2000, "car"),
+    ]
+
+    for traj_id, x, y, timestamp, label in points:
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([traj_id, timestamp, label])
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+        layer.addFeature(feature)
+
+    layer.commitChanges()
+
+    return layer
+
+
+def test_get_filter_expression_time_and_class():
+    assert ProcessingUtils.get_filter_expression_time_and_class(0, 10, None, 0, 10) is None
+    assert ProcessingUtils.get_filter_expression_time_and_class(2, 8, None, 0, 10) == (
+        '"timestamp" >= 2 AND "timestamp" <= 8'
+    )
+    assert ProcessingUtils.get_filter_expression_time_and_class(2, 8, "driver's car", 0, 10) == (
+        '"timestamp" >= 2 AND "timestamp" <= 8 AND "label" = \'driver\'\'s car\''
+    )
+
+
+def test_get_point_filter_defaults_to_time_range_of_points(point_layer: QgsVectorLayer):
+    expression, start_time, end_time = ProcessingUtils.get_point_filter(point_layer, "car", QDateTime(), QDateTime())
+
+    assert expression == "\"label\" = 'car'"
+    assert start_time == QDateTime.fromMSecsSinceEpoch(1000)
+    assert end_time == QDateTime.fromMSecsSinceEpoch(3000)
+
+
+def test_materialize_points_completes_trajectories_in_extent(point_layer: QgsVectorLayer):
+    extent = QgsRectangle(-1, -1, 1, 1)
+
+    layer: QgsVectorLayer = ProcessingUtils.materialize_points(point_layer, None, extent)
+    assert layer.crs() == point_layer.crs()
+    assert sorted((f["id"], f["timestamp"]) for f in layer.getFeatures()) == [
+        (1, 1000),
+        (1, 2000),
+        (1, 3000),
+        (2, 1000),
+        (2, 2000),
+    ]
+
+    layer = ProcessingUtils.materialize_points(point_layer, "\"label\" = 'car'", extent)
+    assert sorted((f["id"], f["timestamp"]) for f in layer.getFeatures()) == [
+        (1, 1000),
+        (1, 2000),
+        (1, 3000),
+    ]
+
+    layer = ProcessingUtils.materialize_points(point_layer, None, QgsRectangle(50, 50, 60, 60))
+    assert layer.featureCount() == 0
+
+    # without an extent, only the points without an id are left out
+    layer = ProcessingUtils.materialize_points(point_layer, None)
+    assert layer.featureCount() == 7
+
+
+def test_get_extent(point_layer: QgsVectorLayer, qgis_gate_line_layer: QgsVectorLayer):
+    extent: QgsRectangle = ProcessingUtils.get_extent([qgis_gate_line_layer], point_layer.crs(), 1)
+    gate_extent: QgsRectangle = qgis_gate_line_layer.extent()
+
+    assert extent.xMinimum() == gate_extent.xMinimum() - 1
+    assert extent.yMaximum() == gate_extent.yMaximum() + 1
+
+
+def test_get_extent_converts_buffer_from_metres(qgis_gate_line_layer: QgsVectorLayer):
+    crs = QgsCoordinateReferenceSystem("EPSG:4326")
+
+    extent: QgsRectangle = ProcessingUtils.get_extent([qgis_gate_line_layer], crs)
+    buffered_extent: QgsRectangle = ProcessingUtils.get_extent([qgis_gate_line_layer], crs, 1000)
+
+    # a kilometre is about 0.009 degrees
+    assert extent.xMinimum() - buffered_extent.xMinimum() == pytest.approx(0.009, abs=0.001)
@@ -0,0 +1,254 @@
+"""
+Seeded generator of synthetic traffic through a four-way intersection.
+
+Every traveler enters from one of the four arms, turns or goes straight
+through the center and leaves along another arm, sampled at a fixed
+rate with some noise in the positions. The same scenario always
+produces the same points, gates and areas.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+from typing import Iterator, NamedTuple
+
+from qgis.core import QgsFeature, QgsField, QgsGeometry, QgsPointXY, QgsRectangle, QgsVectorLayer
+from qgis.PyQt.QtCore import QVariant
+
+CRS = "EPSG:3067"
+
+# the center of the intersection, somewhere in Helsinki
+CENTER_X = 385_000.0
+CENTER_Y = 6_672_000.0
+
+# unit vectors pointing from the center outwards along the arms
+ARM_DIRECTIONS: tuple[tuple[float, float], ...] = ((0.0, 1.0), (1.0, 0.0), (0.0, -1.0), (-1.0, 0.0))
+
+# how many features are added to the layers at once
+BATCH_SIZE = 10_000
+
+
+class TravelerClass(NamedTuple):
+    name: str
+    weight: float
+    speed_m_per_s: float
+    size: tuple[float, float, float]
+    # distance of the path from the center line of the arm
+    lane_offset_m: float
+
+
+DEFAULT_CLASSES: tuple[TravelerClass, ...] = (
+    TravelerClass("car", 0.6, 10.0, (1.8, 4.5, 1.5), 3.0),
+    TravelerClass("bicycle", 0.25, 5.0, (0.6, 1.8, 1.7), 6.0),
+    TravelerClass("pedestrian", 0.15, 1.4, (0.5, 0.5, 1.7), 9.0),
+)
+
+
+class IntersectionScenario(NamedTuple):
+    """
+    Configuration of the generated traffic. The travelers are
+    generated until the layer has n_points points.
+    """
+
+    n_points: int = 10_000
+    seed: int = 0
+    sampling_rate_hz: float = 10.0
+    arm_length_m: float = 100.0
+    # one gate across every arm at each distance from the center
+    gate_distances_m: tuple[float, ...] = (30.0,)
+    # one area on every arm at each distance from the center,
+    # the distance 0 is a single area in the center
+    area_distances_m: tuple[float, ...] = (0.0, 50.0)
+    area_size_m: float = 20.0
+    classes: tuple[TravelerClass, ...] = DEFAULT_CLASSES
+    position_noise_m: float = 0.2
+    duration_s: float = 3600.0
+    start_timestamp_ms: int = 1_717_200_000_000
+
+
+def point_layer(scenario: IntersectionScenario) -> QgsVectorLayer:
+    layer = QgsVectorLayer(f"Point?crs={CRS}", "Synthetic points", "memory")
+
+    layer.dataProvider().addAttributes(
+        [
+            QgsField("id", QVariant.Int),
+            QgsField("timestamp", QVariant.Double),
+            QgsField("size_x", QVariant.Double),
+            QgsField("size_y", QVariant.Double),
+            QgsField("size_z", QVariant.Double),
+            QgsField("label", QVariant.String),
+        ]
+    )
+    layer.updateFields()
+
+    batch: list[QgsFeature] = []
+
+    for attributes, point in points(scenario):
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes(attributes)
+        feature.setGeometry(QgsGeometry.fromPointXY(point))
+        batch.append(feature)
+
+        if len(batch) >= BATCH_SIZE:
+            layer.dataProvider().addFeatures(batch)
+            batch = []
+
+    layer.dataProvider().addFeatures(batch)
+    layer.updateExtents()
+
+    return layer
+
+
+def points(scenario: IntersectionScenario) -> Iterator[tuple[list, QgsPointXY]]:
+    """
+    Generate the attributes and locations of the points, one
+    traveler at a time in the order of the traveler ids.
+    """
+    rng = random.Random(scenario.seed)
+    weights: list[float] = [traveler_class.weight for traveler_class in scenario.classes]
+    interval_s: float = 1 / scenario.sampling_rate_hz
+
+    n_points = 0
+    traveler_id = 0
+
+    while n_points < scenario.n_points:
+        traveler_id += 1
+
+        traveler_class: TravelerClass = rng.choices(scenario.classes, weights)[0]
+        entry, exit_ = rng.sample(range(len(ARM_DIRECTIONS)), 2)
+        path: list[tuple[float, float]] = traveler_path(entry, exit_, scenario.arm_length_m, traveler_class)
+
+        speed: float = traveler_class.speed_m_per_s * rng.uniform(0.8, 1.2)
+        start_ms: float = scenario.start_timestamp_ms + rng.uniform(0, scenario.duration_s * 1000)
+        width, length, height = traveler_class.size
+
+        for i, (x, y) in enumerate(sample_path(path, speed * interval_s)):
+            if n_points >= scenario.n_points:
+                break
+
+            n_points += 1
+
+            yield (
+                [traveler_id, start_ms + i * interval_s * 1000, width, length, height, traveler_class.name],
+                QgsPointXY(
+                    x + rng.gauss(0, scenario.position_noise_m),
+                    y + rng.gauss(0, scenario.position_noise_m),
+                ),
+            )
+
+
+def traveler_path(
+    entry: int, exit_: int, arm_length_m: float, traveler_class: TravelerClass
+) -> list[tuple[float, float]]:
+    """
+    Return the path from the end of the entry arm through the center
+    to the end of the exit arm, keeping to the right of the arms.
+    """
+    offset: float = traveler_class.lane_offset_m
+
+    entry_dx, entry_dy = ARM_DIRECTIONS[entry]
+    exit_dx, exit_dy = ARM_DIRECTIONS[exit_]
+
+    # coming in, the right hand side is to the left of the arm
+    # direction, and going out it is to the right of it
+    entry_x, entry_y = CENTER_X - entry_dy * offset, CENTER_Y + entry_dx * offset
+    exit_x, exit_y = CENTER_X + exit_dy * offset, CENTER_Y - exit_dx * offset
+
+    return [
+        (entry_x + entry_dx * arm_length_m, entry_y + entry_dy * arm_length_m),
+        (entry_x + entry_dx * offset, entry_y + entry_dy * offset),
+        (exit_x + exit_dx * offset, exit_y + exit_dy * offset),
+        (exit_x + exit_dx * arm_length_m, exit_y + exit_dy * arm_length_m),
+    ]
+
+
+def sample_path(path: list[tuple[float, float]], step_m: float) -> Iterator[tuple[float, float]]:
+    """
+    Return the points at every step_m along the path.
+    """
+    distance_to_next = 0.0
+
+    for (x1, y1), (x2, y2) in zip(path, path[1:]):
+        segment_length: float = math.hypot(x2 - x1, y2 - y1)
+
+        while distance_to_next <= segment_length:
+            fraction: float = distance_to_next / segment_length if segment_length else 0.0
+            yield x1 + (x2 - x1) * fraction, y1 + (y2 - y1) * fraction
+            distance_to_next += step_m
+
+        distance_to_next -= segment_length
+
+
+def gate_layer(scenario: IntersectionScenario) -> QgsVectorLayer:
+    layer = QgsVectorLayer(f"LineString?crs={CRS}", "Synthetic gates", "memory")
+
+    layer.dataProvider().addAttributes(
+        [
+            QgsField("name", QVariant.String),
+            QgsField("counts_negative", QVariant.Bool),
+            QgsField("counts_positive", QVariant.Bool),
+        ]
+    )
+    layer.updateFields()
+
+    # wide enough to cover the lanes and the sidewalks on both sides
+    half_width: float = max(traveler_class.lane_offset_m for traveler_class in scenario.classes) + 3.0
+
+    features: list[QgsFeature] = []
+
+    for arm, (dx, dy) in enumerate(ARM_DIRECTIONS):
+        for distance in scenario.gate_distances_m:
+            x, y = CENTER_X + dx * distance, CENTER_Y + dy * distance
+
+            feature = QgsFeature(layer.fields())
+            feature.setAttributes([f"arm{arm}_{distance:g}m", True, True])
+            feature.setGeometry(
+                QgsGeometry.fromPolylineXY(
+                    [
+                        QgsPointXY(x - dy * half_width, y + dx * half_width),
+                        QgsPointXY(x + dy * half_width, y - dx * half_width),
+                    ]
+                )
+            )
+            features.append(feature)
+
+    layer.dataProvider().addFeatures(features)
+    layer.updateExtents()
+
+    return layer
+
+
+def area_layer(scenario: IntersectionScenario) -> QgsVectorLayer:
+    layer = QgsVectorLayer(f"Polygon?crs={CRS}", "Synthetic areas", "memory")
+
+    layer.dataProvider().addAttributes([QgsField("fid", QVariant.Int), QgsField("name", QVariant.String)])
+    layer.updateFields()
+
+    centers: list[tuple[str, float, float]] = []
+
+    for distance in scenario.area_distances_m:
+        if distance == 0:
+            centers.append(("center", CENTER_X, CENTER_Y))
+            continue
+
+        centers.extend(
+            (f"arm{arm}_{distance:g}m", CENTER_X + dx * distance, CENTER_Y + dy * distance)
+            for arm, (dx, dy) in enumerate(ARM_DIRECTIONS)
+        )
+
+    half_size: float = scenario.area_size_m / 2
+    features: list[QgsFeature] = []
+
+    for fid, (name, x, y) in enumerate(centers, 1):
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([fid, name])
+        feature.setGeometry(
+            QgsGeometry.fromRect(QgsRectangle(x - half_size, y - half_size, x + half_size, y + half_size))
+        )
+        features.append(feature)
+
+    layer.dataProvider().addFeatures(features)
+    layer.updateExtents()
+
+    return layer
@@ -0,0 +1,171 @@
+import json
+
+import pytest
+from qgis.core import (
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsField,
+    QgsGeometry,
+    QgsPointXY,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from fvh3t.cli import BatchRunner, Job, read_jobs
+
+
+def write_gpkg(layer: QgsVectorLayer, path: str) -> None:
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = "GPKG"
+
+    QgsVectorFileWriter.writeAsVectorFormatV2(layer, path, QgsCoordinateTransformContext(), options)
+
+
+@pytest.fixture
+def point_file(tmp_path):
+    layer = QgsVectorLayer("Point?crs=EPSG:3067", "points", "memory")
+
+    layer.startEditing()
+
+    layer.addAttribute(QgsField("id", QVariant.Int))
+    layer.addAttribute(QgsField("timestamp", QVariant.Double))
+    layer.addAttribute(QgsField("size_x", QVariant.Double))
+    layer.addAttribute(QgsField("size_y", QVariant.Double))
+    layer.addAttribute(QgsField("size_z", QVariant.Double))
+    layer.addAttribute(QgsField("label", QVariant.String))
+
+    for traj_id, x, y, timestamp in [(1, 0.5, -1, 1000), (1, 0.5, 1, 2000), (2, 0.5, 1, 3000), (2, 0.5, -1, 4000)]:
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([traj_id, timestamp, 1.0, 1.0, 1.0, "car"])
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+        layer.addFeature(feature)
+
+    layer.commitChanges()
+
+    path = str(tmp_path / "points.gpkg")
+    write_gpkg(layer, path)
+
+    return path
+
+
+@pytest.fixture
+def gate_file(tmp_path):
+    layer = QgsVectorLayer("LineString?crs=EPSG:3067", "gates", "memory")
+
+    layer.startEditing()
+
+    layer.addAttribute(QgsField("name", QVariant.String))
+    layer.addAttribute(QgsField("counts_negative", QVariant.Bool))
+    layer.addAttribute(QgsField("counts_positive", QVariant.Bool))
+
+    gate = QgsFeature(layer.fields())
+    gate.setAttributes(["gate", True, True])
+    gate.setGeometry(QgsGeometry.fromPolylineXY([QgsPointXY(0, 0), QgsPointXY(1, 0)]))
+    layer.addFeature(gate)
+
+    layer.commitChanges()
+
+    path = str(tmp_path / "gates.gpkg")
+    write_gpkg(layer, path)
+
+    return path
+
+
+@pytest.fixture
+def area_file(tmp_path):
+    layer = QgsVectorLayer("Polygon?crs=EPSG:3067", "areas", "memory")
+
+    layer.startEditing()
+
+    layer.addAttribute(QgsField("fid", QVariant.Int))
+    layer.addAttribute(QgsField("name", QVariant.String))
+
+    area = QgsFeature(layer.fields())
+    area.setAttributes([1, "area"])
+    area.setGeometry(
+        QgsGeometry.fromPolygonXY([[QgsPointXY(0, 0), QgsPointXY(1, 0), QgsPointXY(1, 2), QgsPointXY(0, 2)]])
+    )
+    layer.addFeature(area)
+
+    layer.commitChanges()
+
+    path = str(tmp_path / "areas.gpkg")
+    write_gpkg(layer, path)
+
+    return path
+
+
+def test_batch_runner_reuses_trajectories(tmp_path, point_file, gate_file):
+    output = str(tmp_path / "gates_out.gpkg")
+
+    jobs = [
+        Job("first", point_file, gates=gate_file),
+        Job("second", point_file, gates=gate_file, outputs={"gates": output}),
+        Job("missing", str(tmp_path / "missing.gpkg")),
+    ]
+
+    reports = BatchRunner().run(jobs)
+
+    assert [report.status for report in reports] == ["ok", "ok", "failed"]
+    assert [report.trajectories_cached for report in reports] == [False, True, False]
+    assert reports[1].trajectory_count == 2
+    assert reports[1].gate_count == 1
+    assert reports[2].error is not None
+
+    output_layer = QgsVectorLayer(output, "gates_out", "ogr")
+
+    assert output_layer.featureCount() == 1
+    assert next(output_layer.getFeatures())["vehicle_count"] == 2
+
+
+def test_batch_runner_counts_gates_from_whole_trajectories(tmp_path, point_file, gate_file, area_file):
+    output = str(tmp_path / "gates_out.gpkg")
+
+    jobs = [
+        Job("gates", point_file, gates=gate_file),
+        Job("gates and areas", point_file, gates=gate_file, areas=area_file, outputs={"gates": output}),
+    ]
+
+    reports = BatchRunner().run(jobs)
+
+    assert [report.status for report in reports] == ["ok", "ok"]
+    # the trajectories split by area are not shared with the job without areas
+    assert [report.trajectories_cached for report in reports] == [False, False]
+    assert reports[1].trajectory_count == 2
+    assert reports[1].area_count == 1
+
+    output_layer = QgsVectorLayer(output, "gates_out", "ogr")
+
+    # only one point of each trajectory is in the area,
+    # but the whole trajectories cross the gate
+    assert next(output_layer.getFeatures())["vehicle_count"] == 2
+
+
+def test_batch_runner_evicts_least_recently_used_trajectories(point_file):
+    jobs = [
+        Job("all", point_file),
+        Job("cars", point_file, traveler_class="car"),
+        Job("cars again", point_file, traveler_class="car"),
+        Job("all again", point_file),
+    ]
+
+    reports = BatchRunner(trajectory_cache_size=1).run(jobs)
+
+    assert [report.status for report in reports] == ["ok", "ok", "ok", "ok"]
+    # only the trajectories of the previous filter are kept
+    assert [report.trajectories_cached for report in reports] == [False, False, True, False]
+
+
+def test_read_jobs(tmp_path):
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps({"jobs": [{"points": "points.gpkg", "interval": 15}]}))
+
+    jobs = read_jobs(str(path))
+
+    assert jobs == [Job("job1", "points.gpkg", interval=15)]
+
+    path.write_text(json.dumps({"jobs": [{"points": "points.gpkg", "bins": 15}]}))
+
+    with pytest.raises(ValueError, match="Unknown job keys: bins."):
+        read_jobs(str(path))
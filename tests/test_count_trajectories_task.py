@@ -0,0 +1,90 @@
+import pytest
+from qgis.core import QgsFeature, QgsField, QgsGeometry, QgsPointXY, QgsProject, QgsVectorLayer
+from qgis.PyQt.QtCore import QVariant
+
+from fvh3t.count_trajectories_task import CountTrajectoriesTask
+from fvh3t.fvh3t_processing.traffic_trajectory_toolkit_provider import TTTProvider
+
+
+@pytest.fixture
+def input_point_layer_for_algorithm():
+    layer = QgsVectorLayer("Point?crs=EPSG:3067", "Point Layer", "memory")
+
+    layer.startEditing()
+
+    layer.addAttribute(QgsField("id", QVariant.Int))
+    layer.addAttribute(QgsField("timestamp", QVariant.Double))
+    layer.addAttribute(QgsField("size_x", QVariant.Double))
+    layer.addAttribute(QgsField("size_y", QVariant.Double))
+    layer.addAttribute(QgsField("size_z", QVariant.Double))
+    layer.addAttribute(QgsField("label", QVariant.String))
+
+    for traj_id, x, y, timestamp in [(1, 0.5, -1, 1000), (1, 0.5, 1, 2000), (2, 0.5, 1, 3000), (2, 0.5, -1, 4000)]:
+        feature = QgsFeature(layer.fields())
+        feature.setAttributes([traj_id, timestamp, 1.0, 1.0, 1.0, "car"])
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+        layer.addFeature(feature)
+
+    layer.commitChanges()
+
+    return layer
+
+
+def test_count_trajectories_task_unknown_algorithm(qgis_app, qgis_processing):  # noqa: ARG001
+    with pytest.raises(ValueError, match='Algorithm "traffic_trajectory_toolkit:missing" not found.'):
+        CountTrajectoriesTask("traffic_trajectory_toolkit:missing", {})
+
+
+def test_count_trajectories_task_adds_results_to_project(
+    qgis_app,
+    qgis_processing,  # noqa: ARG001
+    input_point_layer_for_algorithm: QgsVectorLayer,
+    qgis_gate_line_layer: QgsVectorLayer,
+):
+    provider = TTTProvider()
+
+    qgis_app.processingRegistry().addProvider(provider)
+
+    task = CountTrajectoriesTask(
+        "traffic_trajectory_toolkit:count_trajectories_gate",
+        {"INPUT_POINTS": input_point_layer_for_algorithm, "INPUT_LINES": qgis_gate_line_layer},
+    )
+
+    layer_count: int = QgsProject.instance().count()
+
+    # run the task in this thread instead of the task manager
+    task.finished(task.run())
+
+    # the gates and the trajectories, the optional outputs are skipped
+    assert QgsProject.instance().count() == layer_count + 2
+    assert {layer.name() for layer in QgsProject.instance().mapLayers().values()} >= {"Gates", "Trajectories - Gates"}
+
+    qgis_app.processingRegistry().removeProvider(provider.id())
+
+
+def test_count_trajectories_task_reads_inputs_when_created(
+    qgis_app,
+    qgis_processing,  # noqa: ARG001
+    input_point_layer_for_algorithm: QgsVectorLayer,
+    qgis_gate_line_layer: QgsVectorLayer,
+):
+    provider = TTTProvider()
+
+    qgis_app.processingRegistry().addProvider(provider)
+
+    task = CountTrajectoriesTask(
+        "traffic_trajectory_toolkit:count_trajectories_gate",
+        {"INPUT_POINTS": input_point_layer_for_algorithm, "INPUT_LINES": qgis_gate_line_layer},
+    )
+
+    results: dict = {}
+    task.executed.connect(lambda _successful, task_results: results.update(task_results))
+
+    # the worker thread only uses the points copied when the task was created
+    input_point_layer_for_algorithm.dataProvider().truncate()
+
+    task.finished(task.run())
+
+    assert QgsProject.instance().mapLayer(results["OUTPUT_TRAJECTORIES"]).featureCount() == 2
+
+    qgis_app.processingRegistry().removeProvider(provider.id())